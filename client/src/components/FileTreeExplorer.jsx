@@ -9,10 +9,14 @@ import {
   Stack,
   Title,
   Loader,
+  TextInput,
 } from "@mantine/core";
-import { IconChevronDown, IconChevronRight } from "@tabler/icons-react";
+import { IconChevronDown, IconChevronRight, IconSearch } from "@tabler/icons-react";
 import { useSearchParams } from "react-router-dom";
 
+// Only the keys the tree renders; the full GitHub entries are much larger.
+const LIST_FILES_FIELDS = "name,path,type";
+
 const FileTreeExplorer = () => {
   const [searchParams] = useSearchParams();
   const repoFullName = searchParams.get('repo'); // e.g. "owner/repo"
@@ -29,11 +33,14 @@ const FileTreeExplorer = () => {
   const [analysisByPath, setAnalysisByPath] = useState({});
   // Track loading state for file analysis
   const [loadingPaths, setLoadingPaths] = useState({});
+  // Quick-open: the path query and its matches, shown instead of the tree
+  const [pathQuery, setPathQuery] = useState("");
+  const [pathMatches, setPathMatches] = useState([]);
 
   // Fetch repository root contents on mount
   useEffect(() => {
     if (owner && repo) {
-      fetch(`/api/github/list-files/${owner}/${repo}?path=`)
+      fetch(`/api/github/list-files/${owner}/${repo}?path=&fields=${LIST_FILES_FIELDS}`)
         .then(async (response) => {
           if (!response.ok) {
             const error = await response.json();
@@ -53,6 +60,38 @@ const FileTreeExplorer = () => {
     }
   }, [owner, repo]);
 
+  // Fuzzy-find paths as the user types, shortly after they stop typing
+  useEffect(() => {
+    const query = pathQuery.trim();
+    if (!owner || !repo || !query) {
+      setPathMatches([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      fetch(`/api/github/find-path/${owner}/${repo}?q=${encodeURIComponent(query)}`, {
+        signal: controller.signal,
+      })
+        .then((response) => (response.ok ? response.json() : { results: [] }))
+        .then((data) =>
+          setPathMatches(
+            data.results.map((match) => ({
+              name: match.path,
+              path: match.path,
+              type: match.type === "tree" ? "dir" : "file",
+            }))
+          )
+        )
+        .catch((error) => {
+          if (error.name !== "AbortError") console.error("Error finding paths:", error);
+        });
+    }, 150);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [owner, repo, pathQuery]);
+
   // Expand or collapse a directory. If expanding for the first time, fetch its children.
   const toggleDirectory = async (node) => {
     // If not yet expanded, fetch children
@@ -60,7 +99,7 @@ const FileTreeExplorer = () => {
     if (!isCurrentlyExpanded && !childrenByPath[node.path]) {
       try {
         const response = await fetch(
-          `/api/github/list-files/${owner}/${repo}?path=${encodeURIComponent(node.path)}`
+          `/api/github/list-files/${owner}/${repo}?path=${encodeURIComponent(node.path)}&fields=${LIST_FILES_FIELDS}`
         );
         if (!response.ok) {
           const error = await response.json();
@@ -84,6 +123,29 @@ const FileTreeExplorer = () => {
     }));
   };
 
+  // Read a Server-Sent Events response, calling onEvent(type, data) per event
+  const readEventStream = async (response, onEvent) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const rawEvents = buffer.split("\n\n");
+      buffer = rawEvents.pop();
+      for (const rawEvent of rawEvents) {
+        let type = "message";
+        let data = "";
+        for (const line of rawEvent.split("\n")) {
+          if (line.startsWith("event: ")) type = line.slice(7);
+          else if (line.startsWith("data: ")) data += line.slice(6);
+        }
+        onEvent(type, data ? JSON.parse(data) : null);
+      }
+    }
+  };
+
   // Fetch file analysis if we haven't yet, then toggle "expanded" for the file
   const toggleFile = async (node) => {
     const isCurrentlyExpanded = expandedPaths[node.path];
@@ -102,16 +164,29 @@ const FileTreeExplorer = () => {
           throw new Error(error.error || 'Failed to fetch file content');
         }
         const fileContent = await fileRes.text();
-        const analysisRes = await fetch("/api/analyze/file", {
+        const analysisRes = await fetch("/api/analyze/file/stream", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ file_content: fileContent }),
+          body: JSON.stringify({ file_content: fileContent, path: node.path }),
         });
         if (!analysisRes.ok) {
           throw new Error('Failed to analyze file');
         }
-        const analysisData = await analysisRes.json();
-        setAnalysisByPath((prev) => ({ ...prev, [node.path]: analysisData }));
+        // Expand now so fields render as they stream in
+        setExpandedPaths((prev) => ({ ...prev, [node.path]: true }));
+        await readEventStream(analysisRes, (type, data) => {
+          if (type === "field") {
+            setAnalysisByPath((prev) => ({
+              ...prev,
+              [node.path]: { ...(prev[node.path] || {}), [data.key]: data.value },
+            }));
+          } else if (type === "done" || type === "skipped") {
+            setAnalysisByPath((prev) => ({ ...prev, [node.path]: data }));
+          } else if (type === "error") {
+            throw new Error(data.error || 'Failed to analyze file');
+          }
+        });
+        return;
       } catch (error) {
         console.error("Error fetching file analysis:", error);
       } finally {
@@ -222,8 +297,20 @@ const FileTreeExplorer = () => {
   return (
     <Stack p="md">
       <Title order={2}>Repository File Tree</Title>
+      {repoFullName && (
+        <TextInput
+          placeholder="Go to file..."
+          leftSection={<IconSearch size={16} />}
+          value={pathQuery}
+          onChange={(event) => setPathQuery(event.currentTarget.value)}
+        />
+      )}
       {!repoFullName ? (
         <Text>Please select a repository first</Text>
+      ) : pathQuery.trim() ? (
+        pathMatches.map((node) => (
+          <TreeNode key={node.path} node={node} level={0} />
+        ))
       ) : rootNodes.length > 0 ? (
         rootNodes.map((node) => (
           <TreeNode key={node.path} node={node} level={0} />
@@ -48,6 +48,19 @@ ChartJS.register(
   zoomPlugin
 );
 
+// Only the contributor keys the dashboard renders.
+const CONTRIBUTOR_FIELDS = [
+  "login",
+  "name",
+  "avatar_url",
+  "contributions",
+  "total_commits",
+  "total_additions",
+  "total_deletions",
+  "commit_history.date",
+  "commit_history.commits",
+].join(",");
+
 const Dashboard = () => {
   const navigate = useNavigate();
   const [searchParams] = useSearchParams();
@@ -121,9 +134,21 @@ const Dashboard = () => {
     // Fetch contributors data for selected repository
     const fetchContributors = async () => {
       try {
-        const response = await fetch(`/api/contributors/${owner}/${repo}`);
+        const response = await fetch(
+          `/api/contributors/${owner}/${repo}?fields=${CONTRIBUTOR_FIELDS}`
+        );
         if (!response.ok) throw new Error("Failed to fetch contributors");
         const data = await response.json();
+        if (response.status === 202) {
+          // The repository is being mirrored; ask again once the job is done.
+          let job = data;
+          while (job.status === "queued" || job.status === "running") {
+            await new Promise((resolve) => setTimeout(resolve, 2000));
+            job = await (await fetch(`/api/jobs/${job.id}`)).json();
+          }
+          if (job.status === "succeeded") fetchContributors();
+          return;
+        }
         if (!Array.isArray(data)) {
           console.error("Expected array of contributors, received:", data);
           setContributorsData([]);
@@ -132,7 +157,9 @@ const Dashboard = () => {
         const formattedData = data.map((contributor) => {
           const commitHistory = contributor.commit_history || [];
           return {
-            username: contributor.login,
+            // Contributors computed from git have no login unless their
+            // email is a GitHub noreply address; show the author name then.
+            username: contributor.login || contributor.name,
             commits: contributor.total_commits || contributor.contributions,
             avatarUrl: contributor.avatar_url,
             additions: contributor.total_additions || 0,
@@ -8,6 +8,8 @@ const Home = () => {
   const [repositories, setRepositories] = useState([]);
   const [groupedRepos, setGroupedRepos] = useState({});
   const [loading, setLoading] = useState(false);
+  // Stars and commit counts per "owner/name", fetched for all repos at once
+  const [overviews, setOverviews] = useState({});
   const [searchParams] = useSearchParams();
   const [selectedRepo, setSelectedRepo] = useState(
     searchParams.get("repo") || ""
@@ -34,6 +36,7 @@ const Home = () => {
           }, {});
           setGroupedRepos(grouped);
           setRepositories(data);
+          fetchOverviews(data.map((repo) => `${repo.owner}/${repo.name}`));
         } else if (response.status === 401) {
           setRepositories([]);
           setGroupedRepos({});
@@ -47,6 +50,25 @@ const Home = () => {
       }
     };
 
+    // Best effort: the picker works without the stats.
+    const fetchOverviews = async (fullNames) => {
+      try {
+        const response = await fetch(
+          "/api/overview/batch?fields=stars,total_commits",
+          {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ repositories: fullNames }),
+          }
+        );
+        if (response.ok) {
+          setOverviews(await response.json());
+        }
+      } catch (error) {
+        console.error("Error fetching repository overviews:", error);
+      }
+    };
+
     fetchRepositories();
   }, []);
 
@@ -229,6 +251,12 @@ const Home = () => {
                                     <Text size="xs" color="dimmed">
                                       {repo.description}
                                     </Text>
+                                    {overviews[repo.value] && (
+                                      <Text size="xs" color="dimmed">
+                                        ★ {overviews[repo.value].stars} ·{" "}
+                                        {overviews[repo.value].total_commits ?? "?"} commits
+                                      </Text>
+                                    )}
                                   </div>
                                 </Menu.Item>
                               ))}
@@ -0,0 +1,49 @@
+"""Gunicorn configuration for serving the backend in production.
+
+Run with:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker and thread counts come from server.config so that the SQLAlchemy pool
+sizing there stays in step with the number of processes actually forked.
+"""
+
+from server.config import WEB_CONCURRENCY, WEB_THREADS
+
+bind = "0.0.0.0:2000"
+
+# Pre-forking workers; each one serves WEB_THREADS requests concurrently.
+workers = WEB_CONCURRENCY
+threads = WEB_THREADS
+worker_class = "gthread" if WEB_THREADS > 1 else "sync"
+
+# Import the app once in the master so workers fork with it already loaded.
+preload_app = True
+
+# Recycle workers periodically to bound memory growth; the jitter keeps them
+# from all restarting at the same moment.
+max_requests = 1000
+max_requests_jitter = 100
+
+# GitHub and OpenAI calls can be slow, so allow long requests and give
+# in-flight requests time to finish on reload (SIGHUP) or shutdown.
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """Drop DB connections inherited from the master after forking.
+
+    With preload_app the master opens connections while creating the app
+    (db.create_all). Sockets must not be shared between processes, so each
+    worker discards the inherited pool and opens its own on first use.
+    """
+    from server import db
+    from wsgi import app
+
+    with app.app_context():
+        db.engine.dispose(close=False)
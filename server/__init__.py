@@ -10,6 +10,7 @@ from flask import redirect, render_template
 from flask_cors import CORS
 
 from server.db import db, init_db
+from server.json_provider import OrjsonProvider
 
 STATIC_FOLDER = "../client/dist"
 
@@ -26,6 +27,7 @@ def create_app(config_filename="config.py"):
         static_url_path="",
     )
 
+    app.json = OrjsonProvider(app)
     app.config.from_pyfile(config_filename)
 
     app.secret_key = app.config["SECRET_KEY"]
@@ -48,8 +50,19 @@ def create_app(config_filename="config.py"):
         from server.controllers.api import api
         app.register_blueprint(api)
 
+        from server.controllers.webhooks import webhooks
+        app.register_blueprint(webhooks)
+
         init_db(db)
 
+        from server.leaderboard import create_missing_indexes
+
+        create_missing_indexes(db.engine)
+
+        from server.resilience import install_db_deadline
+
+        install_db_deadline(db.engine)
+
         @app.errorhandler(404)
         def _default(_error):
             # Return react frontend
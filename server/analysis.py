@@ -0,0 +1,301 @@
+"""Repository and folder analysis shared by API endpoints and background jobs."""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from flask import current_app
+
+from server.cache import get_cache
+from server.controllers.ai_insights import analyze_file
+from server.duplicates import SOURCE_EXTENSIONS, DuplicateDetector, describe_duplicate
+from server.github import compare_commits, get_blob, get_file_content
+from server.heavy_hitters import IssueAggregator
+from server.llm_scheduler import BULK, llm_context
+from server.metrics import blob_metrics, git_blob_sha
+from server.resilience import propagate_deadline
+from server.result_store import get_result, put_result
+from server.triage import (
+    LOW,
+    SKIP,
+    GitAttributes,
+    TriageStats,
+    is_skipped_directory,
+    triage_content,
+    triage_path,
+    triage_totals,
+)
+
+FILE_ANALYSIS_KIND = "file_analysis"
+# Most frequent issues and suggestions returned by a folder analysis.
+TOP_ISSUES = 50
+# GitHub lists at most this many changed files in a comparison.
+MAX_COMPARE_FILES = 300
+
+# Blob SHA of a path at a commit, for files whose old version is fetched by
+# path; commits are immutable, so entries never go stale.
+_blob_shas_at_commit = get_cache("blob_shas_at_commit")
+
+
+def file_analysis_key(file_content: str) -> str:
+    """Cache key of a file's analysis: the SHA-256 of its content."""
+    return hashlib.sha256(file_content.encode("utf-8")).hexdigest()
+
+
+def analyze_file_cached(file_content: str) -> dict:
+    """analyze_file, memoized by a hash of the file content.
+
+    Results are stored in the database, so analyses pre-computed by background
+    workers (or other web workers) are served without calling the model.
+    """
+    key = file_analysis_key(file_content)
+    cached = get_result(FILE_ANALYSIS_KIND, key)
+    if cached is not None:
+        return cached
+    result = analyze_file(file_content)
+    if "error" not in result:
+        put_result(FILE_ANALYSIS_KIND, key, result)
+    return result
+
+
+def analyze_folder_path(
+    folder_path: str, on_progress: Callable[[float, str], None] | None = None
+) -> dict:
+    """Aggregate analysis statistics for all .py files in a local folder.
+
+    Files are triaged first (see server/triage.py): vendored and virtualenv
+    directories aren't walked, generated, minified and binary files are
+    skipped, and low-priority ones such as migrations are analyzed last. What
+    was avoided is reported under "triage".
+
+    Issues and suggestions are counted across files in bounded memory (see
+    server/heavy_hitters.py); the TOP_ISSUES most frequent of each are
+    returned, with counts and example files in top_issues/top_suggestions.
+
+    on_progress, when given, is called with the fraction of files done and a
+    short message before each file is analyzed.
+    """
+    aggregate = {
+        "total_files_analyzed": 0,
+        "total_lines_of_code": 0,
+        "sum_cyclomatic_complexity": 0,
+        "sum_maintainability_index": 0,
+        "sum_halstead_metrics": {
+            "length": 0,
+            "vocabulary": 0,
+            "difficulty": 0,
+            "volume": 0,
+            "effort": 0
+        },
+        "files_with_complexity": 0,
+    }
+    issues = IssueAggregator()
+    suggestions = IssueAggregator()
+    duplicates = DuplicateDetector()
+
+    attributes = GitAttributes.from_directory(folder_path)
+    triage = TriageStats(parent=triage_totals)
+
+    file_paths = []
+    for root, dirs, files in os.walk(folder_path):
+        kept = []
+        for directory in dirs:
+            relative_dir = os.path.relpath(os.path.join(root, directory), folder_path)
+            if is_skipped_directory(directory, at_root=root == folder_path) and attributes.linguist(
+                f"{relative_dir}/"
+            ).get("linguist-vendored") is not False:
+                triage.record_pruned_directory(directory)
+            else:
+                kept.append(directory)
+        dirs[:] = kept
+        for file in files:
+            if file.endswith(".py"):
+                file_path = os.path.join(root, file)
+                file_paths.append((file_path, triage_path(os.path.relpath(file_path, folder_path), attributes)))
+    # Low-priority files go last; sorted() is stable, so the walk order stays otherwise.
+    file_paths.sort(key=lambda entry: entry[1].decision == LOW)
+
+    for index, (file_path, by_path) in enumerate(file_paths):
+        relative_path = os.path.relpath(file_path, folder_path)
+        if on_progress is not None:
+            on_progress(index / len(file_paths), f"Analyzing {relative_path}")
+        try:
+            with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+                content = f.read()
+        except Exception as e:
+            current_app.logger.error(f"Error reading file {file_path}: {e}")
+            continue
+
+        verdict = by_path if by_path.decision == SKIP else triage_content(content)
+        if verdict.decision == SKIP:
+            triage.record(verdict, content)
+            current_app.logger.info(f"Skipping {file_path}: {verdict.reason}")
+            continue
+        triage.record(by_path)
+        current_app.logger.info(f"Analyzing file: {file_path}")
+        duplicates.add_file(relative_path, content)
+        # A folder is bulk work even when requested interactively.
+        with llm_context(lane=BULK):
+            result = analyze_file_cached(content)
+        if "error" in result:
+            current_app.logger.error(f"Error analyzing file {file_path}: {result['error']}")
+            continue
+
+        aggregate["total_files_analyzed"] += 1
+        aggregate["total_lines_of_code"] += result.get("lines_of_code", 0)
+
+        comp = result.get("complexity_metrics", {})
+        if comp:
+            cyclo = comp.get("cyclomatic_complexity") or 0
+            mi = comp.get("maintainability_index") or 0
+            halstead = comp.get("halstead_metrics", {})
+            length = halstead.get("length") or 0
+            vocabulary = halstead.get("vocabulary") or 0
+            difficulty = halstead.get("difficulty") or 0
+            volume = halstead.get("volume") or 0
+            effort = halstead.get("effort") or 0
+
+            aggregate["sum_cyclomatic_complexity"] += cyclo
+            aggregate["sum_maintainability_index"] += mi
+            aggregate["sum_halstead_metrics"]["length"] += length
+            aggregate["sum_halstead_metrics"]["vocabulary"] += vocabulary
+            aggregate["sum_halstead_metrics"]["difficulty"] += difficulty
+            aggregate["sum_halstead_metrics"]["volume"] += volume
+            aggregate["sum_halstead_metrics"]["effort"] += effort
+            aggregate["files_with_complexity"] += 1
+
+        for issue in result.get("issues", []):
+            issues.add(issue, relative_path)
+        for suggestion in result.get("suggestions", []):
+            suggestions.add(suggestion, relative_path)
+
+    # Cross-file duplication can't be seen by per-file analysis, so detect it locally.
+    for pair in duplicates.find():
+        issues.add(describe_duplicate(pair), pair["first"]["path"])
+
+    if aggregate["files_with_complexity"] > 0:
+        avg_cyclo = aggregate["sum_cyclomatic_complexity"] / aggregate["files_with_complexity"]
+        avg_mi = aggregate["sum_maintainability_index"] / aggregate["files_with_complexity"]
+        avg_halstead = {k: v / aggregate["files_with_complexity"] for k, v in aggregate["sum_halstead_metrics"].items()}
+    else:
+        avg_cyclo = None
+        avg_mi = None
+        avg_halstead = None
+
+    top_issues = issues.top(TOP_ISSUES)
+    top_suggestions = suggestions.top(TOP_ISSUES)
+    aggregate_results = {
+        "total_files_analyzed": aggregate["total_files_analyzed"],
+        "total_lines_of_code": aggregate["total_lines_of_code"],
+        "average_cyclomatic_complexity": avg_cyclo,
+        "average_maintainability_index": avg_mi,
+        "average_halstead_metrics": avg_halstead,
+        "issues": [issue["text"] for issue in top_issues],
+        "suggestions": [suggestion["text"] for suggestion in top_suggestions],
+        "top_issues": top_issues,
+        "top_suggestions": top_suggestions,
+        "triage": triage.to_dict(),
+    }
+
+    current_app.logger.info(f"Aggregate analysis completed for {aggregate['total_files_analyzed']} files.")
+    return aggregate_results
+
+
+def _metrics_at_commit(repo_owner: str, repo_name: str, path: str, commit: str, token: str) -> dict:
+    key = f"{repo_owner}/{repo_name}@{commit}:{path}"
+    sha = _blob_shas_at_commit.get(key)
+    if sha is not None:
+        return blob_metrics(path, sha, lambda: get_blob(repo_owner, repo_name, sha, token))
+    content = get_file_content(repo_owner, repo_name, path, token, ref=commit)
+    sha = git_blob_sha(content)
+    _blob_shas_at_commit.set(key, sha)
+    return blob_metrics(path, sha, lambda: content)
+
+
+def _metric_totals(metrics: list[dict]) -> dict:
+    lines = sum(m["lines_of_code"] for m in metrics)
+    return {
+        "files": len(metrics),
+        "lines_of_code": lines,
+        "cyclomatic_complexity": sum(m["cyclomatic_complexity"] for m in metrics),
+        # Weighted by size, so a one-line file doesn't count as much as a big one.
+        "maintainability_index": (
+            round(sum(m["maintainability_index"] * m["lines_of_code"] for m in metrics) / lines, 2)
+            if lines else None
+        ),
+    }
+
+
+def _metric_delta(base: dict | None, head: dict | None) -> dict:
+    """head minus base; a missing side counts as an empty file for LOC and complexity."""
+    delta = {
+        key: (head[key] if head else 0) - (base[key] if base else 0)
+        for key in ("lines_of_code", "cyclomatic_complexity")
+    }
+    delta["maintainability_index"] = (
+        round(head["maintainability_index"] - base["maintainability_index"], 2)
+        if base and head and head["maintainability_index"] is not None
+        and base["maintainability_index"] is not None
+        else None
+    )
+    return delta
+
+
+def compare_analysis(repo_owner: str, repo_name: str, base: str, head: str, token: str) -> dict:
+    """Code metrics before and after the changes between base and head.
+
+    Only source files changed between the merge base of base and head, and
+    head, are fetched and measured (see server/metrics.py), so the cost
+    follows the size of the change. Metrics are cached per blob, so files
+    seen in earlier comparisons aren't fetched again. Raises
+    requests.exceptions.RequestException if GitHub can't be reached or a ref
+    doesn't exist.
+    """
+    comparison = compare_commits(repo_owner, repo_name, base, head, token)
+    merge_base = comparison["merge_base_commit"]["sha"]
+    changed = comparison.get("files", [])
+    source_files = [f for f in changed if os.path.splitext(f["filename"])[1] in SOURCE_EXTENSIONS]
+
+    def measure(changed_file: dict) -> dict:
+        status = changed_file["status"]
+        path = changed_file["filename"]
+        base_path = changed_file.get("previous_filename", path)
+        base_metrics = head_metrics = None
+        if status != "added":
+            base_metrics = _metrics_at_commit(repo_owner, repo_name, base_path, merge_base, token)
+        if status != "removed":
+            sha = changed_file["sha"]
+            head_metrics = blob_metrics(
+                path, sha, lambda: get_blob(repo_owner, repo_name, sha, token)
+            )
+        return {
+            "path": path,
+            "previous_path": base_path if base_path != path else None,
+            "status": status,
+            "base": base_metrics,
+            "head": head_metrics,
+            "delta": _metric_delta(base_metrics, head_metrics),
+        }
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        files = list(executor.map(propagate_deadline(measure), source_files))
+
+    base_totals = _metric_totals([f["base"] for f in files if f["base"]])
+    head_totals = _metric_totals([f["head"] for f in files if f["head"]])
+    return {
+        "base": base,
+        "head": head,
+        "merge_base": merge_base,
+        "total_commits": comparison.get("total_commits"),
+        "files_changed": len(changed),
+        "files_analyzed": len(files),
+        # GitHub stops listing files past MAX_COMPARE_FILES.
+        "truncated": len(changed) >= MAX_COMPARE_FILES,
+        "files": files,
+        "aggregate": {
+            "base": base_totals,
+            "head": head_totals,
+            "delta": _metric_delta(base_totals, head_totals),
+        },
+    }
@@ -0,0 +1,323 @@
+"""Commit-activity time series for the dashboard.
+
+Per-commit timestamps and authors are kept in NumPy columns, and per-day
+commit and churn counts are precomputed from them whenever new commits arrive.
+Queries slice the daily arrays and roll them up to weeks or months with
+vectorized reductions, so even years of history aggregate in milliseconds.
+
+Churn comes from GitHub's weekly code frequency statistics and is attributed to
+the first day (Sunday) of each week.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable
+
+import numpy as np
+
+GRANULARITIES = ("day", "week", "month")
+
+# How often a repository's series is refreshed from GitHub at most.
+REFRESH_INTERVAL_SECONDS = 60
+# Pages of 100 commits fetched per refresh when backfilling old history.
+BACKFILL_PAGES_PER_REFRESH = 20
+# Series kept in each process; the least recently viewed is dropped first.
+MAX_CACHED_SERIES = 64
+
+_SECONDS_PER_DAY = 86400
+
+
+def _day_to_bucket(days: np.ndarray, granularity: str) -> np.ndarray:
+    """Map day numbers (days since the Unix epoch) to bucket numbers."""
+    if granularity == "day":
+        return days
+    if granularity == "week":
+        # 1970-01-01 was a Thursday; shift so weeks start on Sunday like GitHub's.
+        return (days + 4) // 7
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+
+def _bucket_start_dates(buckets: np.ndarray, granularity: str) -> list[str]:
+    if granularity == "day":
+        days = buckets
+    elif granularity == "week":
+        days = buckets * 7 - 4
+    else:
+        days = buckets.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    return [str(day) for day in days.astype("datetime64[D]")]
+
+
+def parse_day(value: str | None) -> int | None:
+    """Parse an ISO date or timestamp (e.g. a query parameter) into a day number."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp()) // _SECONDS_PER_DAY
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """Columns and daily arrays of a series at one point in time.
+
+    Writers build a new snapshot and swap it in with one assignment, so readers
+    that took a snapshot never see the arrays of two different versions.
+    """
+
+    timestamps: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    authors: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    author_count: int = 0
+    # Daily arrays covering [first_day, first_day + len).
+    first_day: int = 0
+    daily_commits: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    daily_additions: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    daily_deletions: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+
+
+class CommitSeries:
+    """Commit history of one repository, stored column-wise.
+
+    Writes (add_commits, set_weekly_churn) must be serialized by the caller;
+    reads may run concurrently with them.
+    """
+
+    def __init__(self):
+        self.author_names: list[str] = []
+        self._author_ids: dict[str, int] = {}
+        self._shas: set[str] = set()
+        self._weekly_churn = np.empty((0, 3), dtype=np.int64)
+        self._snapshot = _Snapshot()
+
+        self.history_complete = False
+        self.refreshed_at = 0.0
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._snapshot.timestamps
+
+    @property
+    def newest_timestamp(self) -> int | None:
+        timestamps = self.timestamps
+        return int(timestamps[-1]) if len(timestamps) else None
+
+    @property
+    def oldest_timestamp(self) -> int | None:
+        timestamps = self.timestamps
+        return int(timestamps[0]) if len(timestamps) else None
+
+    def add_commits(self, commits: list[tuple[str, int, str]]):
+        """Add (sha, unix timestamp, author) tuples; already-known SHAs are ignored."""
+        new = [commit for commit in commits if commit[0] not in self._shas]
+        if not new:
+            return
+        for sha, _, author in new:
+            self._shas.add(sha)
+            if author not in self._author_ids:
+                self._author_ids[author] = len(self.author_names)
+                self.author_names.append(author)
+
+        timestamps = np.fromiter((c[1] for c in new), dtype=np.int64, count=len(new))
+        authors = np.fromiter(
+            (self._author_ids[c[2]] for c in new), dtype=np.int32, count=len(new)
+        )
+        timestamps = np.concatenate([self._snapshot.timestamps, timestamps])
+        authors = np.concatenate([self._snapshot.authors, authors])
+        order = np.argsort(timestamps, kind="stable")
+        self._snapshot = self._build_snapshot(timestamps[order], authors[order])
+
+    def set_weekly_churn(self, rows: list[list[int]]):
+        """Replace churn with GitHub code frequency rows [week_start, additions, deletions]."""
+        self._weekly_churn = np.array(rows, dtype=np.int64).reshape(-1, 3)
+        self._snapshot = self._build_snapshot(self._snapshot.timestamps, self._snapshot.authors)
+
+    def _build_snapshot(self, timestamps: np.ndarray, authors: np.ndarray) -> _Snapshot:
+        commit_days = timestamps // _SECONDS_PER_DAY
+        churn_days = self._weekly_churn[:, 0] // _SECONDS_PER_DAY
+        all_days = np.concatenate([commit_days, churn_days])
+        if len(all_days) == 0:
+            return _Snapshot(timestamps, authors, len(self.author_names))
+        first_day = int(all_days.min())
+        length = int(all_days.max()) - first_day + 1
+
+        churn_index = churn_days - first_day
+        return _Snapshot(
+            timestamps=timestamps,
+            authors=authors,
+            author_count=len(self.author_names),
+            first_day=first_day,
+            daily_commits=np.bincount(commit_days - first_day, minlength=length),
+            daily_additions=np.bincount(
+                churn_index, weights=self._weekly_churn[:, 1], minlength=length
+            ).astype(np.int64),
+            daily_deletions=np.bincount(
+                churn_index, weights=np.abs(self._weekly_churn[:, 2]), minlength=length
+            ).astype(np.int64),
+        )
+
+    def rollup(
+        self,
+        granularity: str = "week",
+        start_day: int | None = None,
+        end_day: int | None = None,
+        max_points: int | None = None,
+    ) -> dict:
+        """Aggregate the series into buckets over an inclusive day range.
+
+        When the range holds more than max_points buckets, adjacent buckets are
+        merged so that at most max_points are returned; bucket_size reports
+        how many buckets were merged into each point.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {GRANULARITIES}")
+        empty = {"start": [], "commits": [], "authors": [], "additions": [], "deletions": []}
+        snapshot = self._snapshot
+        if len(snapshot.daily_commits) == 0:
+            return {"bucket_size": 1, "series": empty}
+
+        first_day = snapshot.first_day
+        last_day = first_day + len(snapshot.daily_commits) - 1
+        start_day = max(first_day, start_day if start_day is not None else first_day)
+        end_day = min(last_day, end_day if end_day is not None else last_day)
+        if start_day > end_day:
+            return {"bucket_size": 1, "series": empty}
+
+        days = np.arange(start_day, end_day + 1, dtype=np.int64)
+        day_buckets = _day_to_bucket(days, granularity)
+        first_bucket = day_buckets[0]
+        n_buckets = int(day_buckets[-1] - first_bucket) + 1
+        bucket_size = 1
+        if max_points and n_buckets > max_points:
+            bucket_size = -(-n_buckets // max_points)
+        day_points = (day_buckets - first_bucket) // bucket_size
+        n_points = int(day_points[-1]) + 1
+
+        window = slice(start_day - first_day, end_day - first_day + 1)
+        commits = np.bincount(day_points, weights=snapshot.daily_commits[window], minlength=n_points)
+        additions = np.bincount(day_points, weights=snapshot.daily_additions[window], minlength=n_points)
+        deletions = np.bincount(day_points, weights=snapshot.daily_deletions[window], minlength=n_points)
+
+        # Distinct authors can't be summed across days, so count unique
+        # (point, author) pairs over the commits in range instead.
+        lo, hi = np.searchsorted(
+            snapshot.timestamps,
+            [start_day * _SECONDS_PER_DAY, (end_day + 1) * _SECONDS_PER_DAY],
+        )
+        commit_points = (
+            _day_to_bucket(snapshot.timestamps[lo:hi] // _SECONDS_PER_DAY, granularity) - first_bucket
+        ) // bucket_size
+        author_count = max(1, snapshot.author_count)
+        pairs = np.unique(commit_points * author_count + snapshot.authors[lo:hi])
+        authors = np.bincount(pairs // author_count, minlength=n_points)
+
+        point_buckets = first_bucket + np.arange(n_points, dtype=np.int64) * bucket_size
+        return {
+            "bucket_size": bucket_size,
+            "series": {
+                "start": _bucket_start_dates(point_buckets, granularity),
+                "commits": commits.astype(np.int64).tolist(),
+                "authors": authors.astype(np.int64).tolist(),
+                "additions": additions.astype(np.int64).tolist(),
+                "deletions": deletions.astype(np.int64).tolist(),
+            },
+        }
+
+    def totals(self) -> dict:
+        snapshot = self._snapshot
+        additions = int(snapshot.daily_additions.sum())
+        deletions = int(snapshot.daily_deletions.sum())
+        commit_days = _bucket_start_dates(snapshot.timestamps[[0, -1]] // _SECONDS_PER_DAY, "day") \
+            if len(snapshot.timestamps) else [None, None]
+        return {
+            "total_commits": int(len(snapshot.timestamps)),
+            "total_authors": int(len(np.unique(snapshot.authors))),
+            "total_additions": additions,
+            "total_deletions": deletions,
+            "total_lines": additions - deletions,
+            "first_commit": commit_days[0],
+            "last_commit": commit_days[-1],
+            "history_complete": self.history_complete,
+        }
+
+
+def _to_iso(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_commit(commit_obj: dict) -> tuple[str, int, str]:
+    commit = commit_obj.get("commit", {})
+    committer = commit.get("committer") or {}
+    author = commit_obj.get("author") or {}
+    timestamp = datetime.fromisoformat(committer["date"].replace("Z", "+00:00")).timestamp()
+    name = author.get("login") or (commit.get("author") or {}).get("email") or "unknown"
+    return commit_obj["sha"], int(timestamp), name
+
+
+def refresh_series(
+    series: CommitSeries,
+    fetch_commits: Callable[..., list[dict]],
+    fetch_churn: Callable[[], list[list[int]] | None],
+):
+    """Pull new commits (and backfill old ones) into a series.
+
+    fetch_commits(since=, until=, page=) returns one page of GitHub commit
+    objects, newest first; fetch_churn() returns code frequency rows or None.
+    """
+    newest = series.newest_timestamp
+    if newest is not None:
+        page = 1
+        while True:
+            commits = fetch_commits(since=_to_iso(newest), until=None, page=page)
+            series.add_commits([_parse_commit(c) for c in commits])
+            if len(commits) < 100:
+                break
+            page += 1
+
+    if not series.history_complete:
+        oldest = series.oldest_timestamp
+        until = _to_iso(oldest) if oldest is not None else None
+        for page in range(1, BACKFILL_PAGES_PER_REFRESH + 1):
+            commits = fetch_commits(since=None, until=until, page=page)
+            series.add_commits([_parse_commit(c) for c in commits])
+            if len(commits) < 100:
+                series.history_complete = True
+                break
+
+    churn = fetch_churn()
+    if churn is not None:
+        series.set_weekly_churn(churn)
+    series.refreshed_at = time.time()
+
+
+# Each entry is a series and the lock that serializes its refreshes.
+_series: OrderedDict[str, tuple[CommitSeries, threading.Lock]] = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def get_series(
+    key: str,
+    fetch_commits: Callable[..., list[dict]],
+    fetch_churn: Callable[[], list[list[int]] | None],
+) -> CommitSeries:
+    """Return the series for a repository key, refreshing it if it is stale.
+
+    Series are shared by every caller in the process; check the caller's
+    access to the repository first (see github.check_repo_access).
+    """
+    with _registry_lock:
+        entry = _series.get(key)
+        if entry is None:
+            entry = _series[key] = (CommitSeries(), threading.Lock())
+            while len(_series) > MAX_CACHED_SERIES:
+                _series.popitem(last=False)
+        else:
+            _series.move_to_end(key)
+    series, lock = entry
+    with lock:
+        if time.time() - series.refreshed_at >= REFRESH_INTERVAL_SECONDS:
+            refresh_series(series, fetch_commits, fetch_churn)
+    return series
+
@@ -0,0 +1,358 @@
+"""Two-tier cache shared by all worker processes on a host.
+
+Each process keeps a small in-memory LRU in front of a SQLite database under
+DATA_DIR that every worker on the host opens (in WAL mode, so readers don't
+block each other or the writer). A value fetched by one worker is then a local
+hit for the others, and survives restarts.
+
+    trees = get_cache("trees", ttl=3600)
+    tree = trees.get_or_set(key, lambda: fetch_tree(...))
+
+Values are pickled and, above a small size, zlib-compressed. The shared tier is
+trimmed to CACHE_MAX_BYTES, least recently used first; entries past their TTL
+are never returned. Both tiers count hits and misses, see cache_stats().
+
+Only this application writes the cache file; don't point CACHE_DIR at a
+directory other users can write to, as values are unpickled on read.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, TypeVar
+
+from server.config import CACHE_DIR, CACHE_LRU_ENTRIES, CACHE_MAX_BYTES
+
+T = TypeVar("T")
+
+# Serialized values at least this large are compressed.
+COMPRESS_MIN_BYTES = 1024
+# Evicting trims the shared tier to this fraction of its limit, so it isn't
+# re-run on every write once full.
+EVICT_TARGET = 0.9
+# A process checks the shared tier's size once it has written this fraction
+# of the room eviction leaves, so the limit is overshot by at most that much
+# per process (plus the value that crossed the threshold).
+EVICT_CHECK_FRACTION = 0.5
+# Reads refresh an entry's access time at most this often, to keep reads from
+# turning into writes.
+TOUCH_INTERVAL_SECONDS = 60
+
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+_MISSING = object()
+
+
+def dumps(value: Any) -> bytes:
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(data, 1)
+        if len(compressed) < len(data):
+            return _ZLIB + compressed
+    return _RAW + data
+
+
+def loads(data: bytes) -> Any:
+    if data[:1] == _ZLIB:
+        return pickle.loads(zlib.decompress(data[1:]))
+    return pickle.loads(data[1:])
+
+
+class TierStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class CacheBackend(ABC):
+    """A key-value tier.
+
+    get returns (value, expires_at), or _MISSING for absent or expired keys.
+    expires_at is a time.time() timestamp, or None for no expiry.
+    """
+
+    def __init__(self):
+        self.stats = TierStats()
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, expires_at: float | None):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    def info(self) -> dict:
+        return self.stats.to_dict()
+
+
+class MemoryLRU(CacheBackend):
+    """Per-process LRU holding at most max_entries values."""
+
+    def __init__(self, max_entries: int = CACHE_LRU_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[Any, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self.stats.misses += 1
+            return _MISSING
+
+    def set(self, key: str, value: Any, expires_at: float | None):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def info(self) -> dict:
+        return {**super().info(), "entries": len(self._entries), "max_entries": self.max_entries}
+
+
+class SQLiteStore(CacheBackend):
+    """Host-wide tier in a SQLite file, bounded to max_bytes of values.
+
+    Connections are per thread and per process, so the store is safe to create
+    before a pre-forking server forks its workers.
+    """
+
+    def __init__(self, path: str, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.errors = 0
+        self._local = threading.local()
+        # Bytes written since this process last checked the size; starting
+        # at the threshold checks on the first write, as other processes may
+        # have filled the file.
+        self._check_after_bytes = max_bytes * (1 - EVICT_TARGET) * EVICT_CHECK_FRACTION
+        self._unchecked_bytes = self._check_after_bytes
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+                " expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[2] >= TOUCH_INTERVAL_SECONDS:
+                connection.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            # A locked or unreadable cache is a miss, never a failed request.
+            self.errors += 1
+            row = None
+        if row is None or (row[1] is not None and row[1] <= now):
+            self.stats.misses += 1
+            return _MISSING
+        try:
+            value = loads(row[0])
+        except Exception:
+            # A corrupt or unreadable value is a miss too.
+            self.errors += 1
+            self.stats.misses += 1
+            self.delete(key)
+            return _MISSING
+        self.stats.hits += 1
+        return value, row[1]
+
+    def set(self, key: str, value: Any, expires_at: float | None):
+        data = dumps(value)
+        if len(data) > self.max_bytes * (1 - EVICT_TARGET):
+            # A single value this large would flush most of the cache.
+            return
+        with self._lock:
+            self._unchecked_bytes += len(data)
+            check = self._unchecked_bytes >= self._check_after_bytes
+            if check:
+                self._unchecked_bytes = 0
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), expires_at, time.time()),
+            )
+            if check:
+                self.evict()
+        except sqlite3.Error:
+            self.errors += 1
+
+    def delete(self, key: str):
+        try:
+            self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error:
+            self.errors += 1
+
+    def evict(self):
+        """Drop expired entries, then the least recently used if near the limit."""
+        connection = self._connection()
+        connection.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        # Leave room for the writes before the next check.
+        if total <= self.max_bytes - self._check_after_bytes:
+            return
+        excess = total - int(self.max_bytes * EVICT_TARGET)
+        removed = 0
+        doomed = []
+        for key, size in connection.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            if removed >= excess:
+                break
+            doomed.append((key,))
+            removed += size
+        connection.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def info(self) -> dict:
+        try:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        except sqlite3.Error:
+            entries = size = None
+        return {
+            **super().info(),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+class TieredCache:
+    """A namespace of keys looked up in each tier in turn.
+
+    A hit in a lower tier is copied into the tiers above it. Values from the
+    in-memory tier are shared between callers, who must not modify them.
+    """
+
+    def __init__(self, namespace: str, tiers: list[CacheBackend], ttl: float | None = None):
+        self.namespace = namespace
+        self.tiers = tiers
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        full_key = self._key(key)
+        for index, tier in enumerate(self.tiers):
+            entry = tier.get(full_key)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                for upper in self.tiers[:index]:
+                    upper.set(full_key, value, expires_at)
+                return value
+        return default
+
+    def set(self, key: str, value: Any, ttl: float | None = None):
+        full_key = self._key(key)
+        expires_at = self._expires_at(ttl)
+        for tier in self.tiers:
+            tier.set(full_key, value, expires_at)
+
+    def delete(self, key: str):
+        full_key = self._key(key)
+        for tier in self.tiers:
+            tier.delete(full_key)
+
+    def get_or_set(self, key: str, compute: Callable[[], T], ttl: float | None = None) -> T:
+        """The cached value for key, computing and storing it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, ttl)
+        return value
+
+    def _expires_at(self, ttl: float | None) -> float | None:
+        ttl = ttl if ttl is not None else self.ttl
+        return time.time() + ttl if ttl is not None else None
+
+
+_shared_store = SQLiteStore(os.path.join(CACHE_DIR, "cache.sqlite3"))
+_caches: dict[str, TieredCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(
+    namespace: str,
+    ttl: float | None = None,
+    lru_entries: int = CACHE_LRU_ENTRIES,
+    shared: bool = True,
+) -> TieredCache:
+    """The process-wide cache for namespace, created on first use.
+
+    ttl is the default lifetime of entries in seconds (None: until evicted).
+    With shared false, values stay in this process's LRU only, e.g. for
+    values that don't pickle.
+    """
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            tiers: list[CacheBackend] = [MemoryLRU(lru_entries)]
+            if shared and CACHE_MAX_BYTES > 0:
+                tiers.append(_shared_store)
+            cache = _caches[namespace] = TieredCache(namespace, tiers, ttl)
+        return cache
+
+
+def cache_stats() -> dict:
+    """Hit/miss counts per namespace's LRU and for the shared tier, in this process."""
+    with _caches_lock:
+        caches = dict(_caches)
+    stats = {"memory": {name: cache.tiers[0].info() for name, cache in caches.items()}}
+    if CACHE_MAX_BYTES > 0:
+        stats["shared"] = {"path": _shared_store.path, **_shared_store.info()}
+    return stats
@@ -0,0 +1,259 @@
+"""Prompt compaction for source code sent to the LLM.
+
+Source files carry many tokens that don't help the model analyze them: license
+headers, long docstrings, runs of blank lines and long encoded literals.
+compact_source strips or condenses those while keeping a line map from the
+compacted text back to the original file, so line numbers the model reports
+can be translated back with remap_line_references.
+"""
+
+import ast
+import functools
+import re
+from dataclasses import dataclass, field
+
+# Docstrings and doc comments longer than this are condensed to their summary line.
+MAX_DOC_LINES = 3
+# Runs of non-whitespace longer than this are treated as encoded data.
+MAX_DATA_RUN_LENGTH = 200
+# Only the top of a file is checked for a license header.
+LICENSE_SCAN_LINES = 60
+
+_LICENSE_RE = re.compile(
+    r"licen[cs]e|copyright|\(c\)|spdx-license-identifier|permission is hereby granted|"
+    r"all rights reserved|warranty",
+    re.IGNORECASE,
+)
+_PREAMBLE_RE = re.compile(r"^#!|^#.*coding[:=]")
+_COMMENT_LINE_RE = re.compile(r"^\s*(#|//|\*|/\*|\*/|--|;)")
+_DOC_COMMENT_START_RE = re.compile(r"^\s*/\*\*")
+_DATA_RUN_RE = re.compile(r"\S{%d,}" % MAX_DATA_RUN_LENGTH)
+_LINE_REFERENCE_RE = re.compile(
+    r"\b(lines?|L)(\s*)(\d+)(?:(\s*(?:-|–|to)\s*)(\d+))?", re.IGNORECASE
+)
+
+
+@functools.cache
+def _get_encoding():
+    # Loaded on first use rather than at import: the first load may download
+    # the encoding, which mustn't hold up importing the app.
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:  # not installed, or the encoding can't be downloaded
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Number of model tokens in text (estimated if tiktoken is unavailable)."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4) if text else 0
+
+
+@dataclass
+class CompactedSource:
+    """Compacted source text plus the bookkeeping to interpret it."""
+
+    text: str
+    # line_map[i] is the original (1-based) line number of compacted line i + 1
+    line_map: list[int]
+    tokens_before: int
+    tokens_after: int
+    removed: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def original_line(self, line: int) -> int:
+        """Translate a compacted line number to the original file's numbering."""
+        if not self.line_map:
+            return line
+        return self.line_map[min(max(line, 1), len(self.line_map)) - 1]
+
+    def stats(self) -> dict:
+        return {
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_saved,
+            "removed": self.removed,
+        }
+
+
+def _preamble_end(lines: list[str]) -> int:
+    """Index just past shebang and encoding lines, which are always kept."""
+    end = 0
+    while end < min(len(lines), 2) and _PREAMBLE_RE.match(lines[end]):
+        end += 1
+    return end
+
+
+def _license_header_end(lines: list[str]) -> int:
+    """Index just past a leading license comment block, or 0 if there is none."""
+    start = _preamble_end(lines)
+
+    end = start
+    in_block = False
+    quote = None
+    while end < min(len(lines), LICENSE_SCAN_LINES):
+        stripped = lines[end].strip()
+        if quote:
+            end += 1
+            if quote in stripped:
+                break
+            continue
+        if end == start and stripped[:3] in ('"""', "'''"):
+            quote = stripped[:3]
+            end += 1
+            if stripped.count(quote) >= 2:
+                break
+            continue
+        if stripped.startswith("/*"):
+            in_block = "*/" not in stripped
+        elif in_block:
+            in_block = "*/" not in stripped
+        elif not stripped or not _COMMENT_LINE_RE.match(lines[end]):
+            break
+        end += 1
+
+    header = "\n".join(lines[start:end])
+    return end if end > start and _LICENSE_RE.search(header) else 0
+
+
+def _python_docstring_spans(source: str, lines: list[str]) -> list[tuple[int, int]]:
+    """0-based inclusive (start, end) line spans of long, standalone docstrings."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    spans = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        if not node.body:
+            continue
+        first = node.body[0]
+        if not (
+            isinstance(first, ast.Expr)
+            and isinstance(first.value, ast.Constant)
+            and isinstance(first.value.value, str)
+            and first.end_lineno is not None
+        ):
+            continue
+        start, end = first.lineno - 1, first.end_lineno - 1
+        if end - start + 1 <= MAX_DOC_LINES:
+            continue
+        # Only rewrite docstrings that occupy whole lines by themselves.
+        if lines[start][:first.col_offset].strip() or lines[end][first.end_col_offset:].strip():
+            continue
+        spans.append((start, end))
+    return spans
+
+
+def _doc_comment_spans(lines: list[str]) -> list[tuple[int, int]]:
+    """0-based inclusive spans of long /** ... */ doc comments."""
+    spans = []
+    i = 0
+    while i < len(lines):
+        if _DOC_COMMENT_START_RE.match(lines[i]) and "*/" not in lines[i]:
+            j = i + 1
+            while j < len(lines) and "*/" not in lines[j]:
+                j += 1
+            if j < len(lines) and j - i + 1 > MAX_DOC_LINES:
+                spans.append((i, j))
+            i = j + 1
+        else:
+            i += 1
+    return spans
+
+
+def _summary_line(doc_lines: list[str]) -> str:
+    for line in doc_lines:
+        text = line.strip().strip('"\'').lstrip("/*").strip()
+        if text:
+            return text
+    return ""
+
+
+def compact_source(source: str) -> CompactedSource:
+    """Strip license headers, condense docs, collapse blank runs and elide data."""
+    lines = source.splitlines()
+    removed = {"license_lines": 0, "doc_lines": 0, "blank_lines": 0, "data_lines": 0}
+    # replacements[i] = (last original index covered, replacement lines)
+    replacements: dict[int, tuple[int, list[str]]] = {}
+
+    header_end = _license_header_end(lines)
+    if header_end:
+        first = _preamble_end(lines)
+        comment = "//" if lines[first].lstrip().startswith(("/", "*")) else "#"
+        replacements[first] = (header_end - 1, [f"{comment} [license header omitted]"])
+        removed["license_lines"] += header_end - first - 1
+
+    for start, end in _python_docstring_spans(source, lines) + _doc_comment_spans(lines):
+        if start in replacements or any(s <= start <= e for s, (e, _) in replacements.items()):
+            continue
+        indent = lines[start][: len(lines[start]) - len(lines[start].lstrip())]
+        summary = _summary_line(lines[start:end + 1])
+        if lines[start].lstrip().startswith("/**"):
+            condensed = f"{indent}/** {summary} [...] */"
+        else:
+            quote = lines[start].lstrip()[:3] if lines[start].lstrip()[:3] in ('"""', "'''") else '"""'
+            prefix = lines[start].lstrip()[: lines[start].lstrip().find(quote)]
+            condensed = f"{indent}{prefix}{quote}{summary} [...]{quote}"
+        replacements[start] = (end, [condensed])
+        removed["doc_lines"] += end - start
+
+    out_lines: list[str] = []
+    line_map: list[int] = []
+    previous_blank = False
+    i = 0
+    while i < len(lines):
+        if i in replacements:
+            end, new_lines = replacements[i]
+            out_lines.extend(new_lines)
+            line_map.extend([i + 1] * len(new_lines))
+            previous_blank = False
+            i = end + 1
+            continue
+
+        line = lines[i].rstrip()
+        if not line:
+            if previous_blank or not out_lines:
+                removed["blank_lines"] += 1
+                i += 1
+                continue
+            previous_blank = True
+        else:
+            previous_blank = False
+            line, elided = _DATA_RUN_RE.subn(
+                lambda m: f"{m.group()[:40]}...[{len(m.group()) - 40} characters omitted]", line
+            )
+            removed["data_lines"] += min(elided, 1)
+        out_lines.append(line)
+        line_map.append(i + 1)
+        i += 1
+
+    text = "\n".join(out_lines)
+    return CompactedSource(
+        text=text,
+        line_map=line_map,
+        tokens_before=count_tokens(source),
+        tokens_after=count_tokens(text),
+        removed={k: v for k, v in removed.items() if v},
+    )
+
+
+def remap_line_references(text: str, compacted: CompactedSource) -> str:
+    """Rewrite "line N" / "lines N-M" references from compacted to original numbering."""
+
+    def replace(match: re.Match) -> str:
+        word, space, first, separator, last = match.groups()
+        result = f"{word}{space}{compacted.original_line(int(first))}"
+        if last is not None:
+            result += f"{separator}{compacted.original_line(int(last))}"
+        return result
+
+    return _LINE_REFERENCE_RE.sub(replace, text)
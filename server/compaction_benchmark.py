@@ -0,0 +1,140 @@
+"""Benchmark prompt compaction for analyze_file.
+
+For each file, runs analyze_file with and without compaction and reports token
+savings, latency and how closely the two analyses agree:
+
+    python3 -m server.compaction_benchmark server/ client/src
+    python3 -m server.compaction_benchmark --tokens-only server/
+
+--tokens-only skips the model calls and only reports token savings.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import time
+
+from server.compaction import compact_source
+from server.controllers.ai_insights import analyze_file
+from server.duplicates import SOURCE_EXTENSIONS
+
+_WORD_RE = re.compile(r"[a-z]{3,}")
+
+
+def _collect_files(paths: list[str]) -> list[str]:
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs[:] = [d for d in dirs if not d.startswith(".") and d not in ("node_modules", "venv")]
+            files.extend(
+                os.path.join(root, name) for name in names
+                if os.path.splitext(name)[1] in SOURCE_EXTENSIONS
+            )
+    return sorted(files)
+
+
+def _issue_overlap(a: list[str], b: list[str]) -> float:
+    """Jaccard similarity of the words used in two issue lists."""
+    words_a = set(_WORD_RE.findall(" ".join(a).lower()))
+    words_b = set(_WORD_RE.findall(" ".join(b).lower()))
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def _metric(result: dict, *path: str) -> float | None:
+    value = result
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value if isinstance(value, (int, float)) else None
+
+
+def _timed_analysis(content: str, compact: bool) -> tuple[float, dict]:
+    start = time.perf_counter()
+    result = analyze_file(content, compact=compact)
+    return time.perf_counter() - start, result
+
+
+def benchmark(files: list[str], tokens_only: bool = False):
+    rows = []
+    for path in files:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            content = f.read()
+        compacted = compact_source(content)
+        row = {
+            "path": path,
+            "tokens_before": compacted.tokens_before,
+            "tokens_after": compacted.tokens_after,
+        }
+        if not tokens_only:
+            row["raw_seconds"], raw = _timed_analysis(content, compact=False)
+            row["compact_seconds"], compact = _timed_analysis(content, compact=True)
+            if "error" in raw or "error" in compact:
+                row["error"] = raw.get("error") or compact.get("error")
+            else:
+                for name, keys in (
+                    ("loc", ("lines_of_code",)),
+                    ("cyclomatic", ("complexity_metrics", "cyclomatic_complexity")),
+                    ("maintainability", ("complexity_metrics", "maintainability_index")),
+                ):
+                    before, after = _metric(raw, *keys), _metric(compact, *keys)
+                    row[f"{name}_delta"] = None if before is None or after is None else after - before
+                row["issue_overlap"] = _issue_overlap(raw.get("issues", []), compact.get("issues", []))
+        rows.append(row)
+        print(_format_row(row))
+
+    _print_summary(rows, tokens_only)
+
+
+def _format_row(row: dict) -> str:
+    saved = row["tokens_before"] - row["tokens_after"]
+    pct = saved / row["tokens_before"] if row["tokens_before"] else 0
+    line = f"{row['path']}: {row['tokens_before']} -> {row['tokens_after']} tokens ({pct:.0%} saved)"
+    if "raw_seconds" in row:
+        line += f", {row['raw_seconds']:.2f}s -> {row['compact_seconds']:.2f}s"
+    if "error" in row:
+        line += f", error: {row['error']}"
+    elif "issue_overlap" in row:
+        line += (
+            f", LOC delta {row['loc_delta']}, cyclomatic delta {row['cyclomatic_delta']}, "
+            f"issue overlap {row['issue_overlap']:.2f}"
+        )
+    return line
+
+
+def _print_summary(rows: list[dict], tokens_only: bool):
+    if not rows:
+        print("No files to benchmark.")
+        return
+    before = sum(row["tokens_before"] for row in rows)
+    after = sum(row["tokens_after"] for row in rows)
+    print(f"\n{len(rows)} files: {before} -> {after} prompt tokens ({(before - after) / max(before, 1):.1%} saved)")
+    if tokens_only:
+        return
+    ok = [row for row in rows if "error" not in row]
+    if not ok:
+        print("All analyses failed.")
+        return
+    print(
+        f"Median latency: {statistics.median(r['raw_seconds'] for r in ok):.2f}s raw, "
+        f"{statistics.median(r['compact_seconds'] for r in ok):.2f}s compacted"
+    )
+    for name in ("loc", "cyclomatic", "maintainability"):
+        deltas = [abs(r[f"{name}_delta"]) for r in ok if r[f"{name}_delta"] is not None]
+        if deltas:
+            print(f"Median |{name} delta|: {statistics.median(deltas):.2f}")
+    print(f"Mean issue overlap: {statistics.mean(r['issue_overlap'] for r in ok):.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark prompt compaction for analyze_file.")
+    parser.add_argument("paths", nargs="+", help="files or directories to analyze")
+    parser.add_argument("--tokens-only", action="store_true", help="skip model calls")
+    args = parser.parse_args()
+    benchmark(_collect_files(args.paths), tokens_only=args.tokens_only)
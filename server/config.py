@@ -50,5 +50,65 @@ SQLALCHEMY_DATABASE_URI = _get_config_option(
     "DATABASE_URL", "postgresql://postgres@localhost/rebasedb"
 )
 
+# Production serving (see gunicorn.conf.py)
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+WEB_THREADS = int(os.environ.get("WEB_THREADS", 4))
+# Upper bound on Postgres connections held by all workers on this host together.
+DB_MAX_CONNECTIONS = int(os.environ.get("DB_MAX_CONNECTIONS", 40))
+
+# Each worker gets an equal share of DB_MAX_CONNECTIONS. A worker never needs
+# more connections than it has threads, so the share is capped there too.
+_db_connections_per_worker = max(1, DB_MAX_CONNECTIONS // max(1, WEB_CONCURRENCY))
+_db_pool_size = min(WEB_THREADS, _db_connections_per_worker)
+
+SQLALCHEMY_ENGINE_OPTIONS = {
+    "pool_size": _db_pool_size,
+    "max_overflow": _db_connections_per_worker - _db_pool_size,
+    "pool_timeout": 10,
+    "pool_pre_ping": True,
+    "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+}
+
+# Local storage for indexes and other derived data
+DATA_DIR = os.environ.get(
+    "DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "data")
+)
+
+# Cache shared by the workers on a host (see server/cache.py): a SQLite file
+# under CACHE_DIR holding up to CACHE_MAX_BYTES (0 disables it), plus an LRU
+# of CACHE_LRU_ENTRIES values per namespace in each process.
+CACHE_DIR = os.environ.get("CACHE_DIR", os.path.join(DATA_DIR, "cache"))
+CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CACHE_LRU_ENTRIES = int(os.environ.get("CACHE_LRU_ENTRIES", 256))
+
+# Where contributor stats come from: "github" (the REST stats API) or "git"
+# (a local mirror clone, see server/git_mirror.py).
+CONTRIBUTORS_SOURCE = os.environ.get("CONTRIBUTORS_SOURCE", "github")
+GITHUB_GRAPHQL_URL = os.environ.get("GITHUB_GRAPHQL_URL", "https://api.github.com/graphql")
+
 GITHUB_CLIENT_ID = _get_config_option("GITHUB_CLIENT_ID")
 GITHUB_CLIENT_SECRET = _get_config_option("GITHUB_CLIENT_SECRET")
+# Shared secret configured on the repository's push webhook
+GITHUB_WEBHOOK_SECRET = os.environ.get("GITHUB_WEBHOOK_SECRET", "")
+
+# Upstream resilience (see server/resilience.py)
+# Total time an API request may spend, including all upstream calls.
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", 60))
+# Per-call caps; a call never waits longer than the request has left either.
+GITHUB_TIMEOUT_SECONDS = float(os.environ.get("GITHUB_TIMEOUT_SECONDS", 10))
+OPENAI_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_TIMEOUT_SECONDS", 45))
+# Send a duplicate GitHub GET when the first hasn't answered in this many
+# seconds. Unset disables hedging; it costs extra rate limit when it fires.
+GITHUB_HEDGE_AFTER_SECONDS = (
+    float(os.environ["GITHUB_HEDGE_AFTER_SECONDS"])
+    if os.environ.get("GITHUB_HEDGE_AFTER_SECONDS")
+    else None
+)
+
+# LLM admission control (see server/llm_scheduler.py); enforced per process.
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))
+LLM_USER_RPM = float(os.environ.get("LLM_USER_RPM", 60))
+LLM_USER_TPM = float(os.environ.get("LLM_USER_TPM", 200000))
+# Relative share of LLM capacity for interactive vs bulk work when both wait.
+LLM_INTERACTIVE_WEIGHT = float(os.environ.get("LLM_INTERACTIVE_WEIGHT", 4))
+LLM_BULK_WEIGHT = float(os.environ.get("LLM_BULK_WEIGHT", 1))
@@ -3,14 +3,67 @@
 import os
 import logging
 import json
-from openai import OpenAI
+from openai import APITimeoutError, BadRequestError, OpenAI
 from dotenv import load_dotenv
 
+from server.config import OPENAI_TIMEOUT_SECONDS
+from server.compaction import CompactedSource, compact_source, count_tokens, remap_line_references
+from server.llm_scheduler import scheduler as llm_scheduler
+from server.partial_json import JsonFieldStream
+from server.resilience import (
+    CircuitBreaker,
+    DeadlineExceeded,
+    UpstreamUnavailable,
+    bounded_call,
+    remaining_time,
+)
+
 load_dotenv()
 
 # Instantiate the client (it automatically picks up the OPENAI_API_KEY env variable)
 client = OpenAI()
 
+# Fails fast while OpenAI is erroring instead of tying up workers.
+openai_breaker = CircuitBreaker("OpenAI")
+
+def _estimate_tokens(request: dict) -> int:
+    """Prompt tokens plus the completion budget, for the LLM scheduler's quotas."""
+    prompt = sum(count_tokens(message.get("content") or "") for message in request.get("messages", []))
+    return prompt + request.get("max_tokens", 1000)
+
+def _create_completion(**kwargs):
+    """client.chat.completions.create, admitted by the LLM scheduler and
+    bounded by the request deadline.
+
+    Under a deadline the client's own retries are disabled, since each retry
+    would get the full timeout again. Streams hold their scheduler slot until
+    they have been consumed.
+    """
+    ticket = llm_scheduler.acquire(_estimate_tokens(kwargs))
+    try:
+        api = client if remaining_time() is None else client.with_options(max_retries=0)
+        response = openai_breaker.call(
+            lambda: bounded_call(
+                lambda timeout: api.chat.completions.create(**kwargs, timeout=timeout),
+                OPENAI_TIMEOUT_SECONDS,
+                (APITimeoutError,),
+            ),
+            ignore=(BadRequestError, DeadlineExceeded),
+        )
+    except BaseException:
+        ticket.release()
+        raise
+    if kwargs.get("stream"):
+        return _release_when_consumed(response, ticket)
+    ticket.release(response.usage.total_tokens if response.usage else None)
+    return response
+
+def _release_when_consumed(stream, ticket):
+    try:
+        yield from stream
+    finally:
+        ticket.release()
+
 # Define a schema for complexity_metrics that must be adhered to.
 _complexity_metrics_schema = {
     "type": "object",
@@ -34,7 +87,49 @@ _complexity_metrics_schema = {
     "additionalProperties": False
 }
 
-def analyze_code_quality(code: str) -> dict:
+# Schema shared by summarize_pr and combine_pr_summaries.
+_summarize_pr_schema = {
+    "type": "object",
+    "properties": {
+        "key_changes": {"type": "string"},
+        "potential_impacts": {"type": "array", "items": {"type": "string"}},
+        "improvement_suggestions": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["key_changes", "potential_impacts", "improvement_suggestions"],
+    "additionalProperties": False
+}
+
+def _compact_for_prompt(code: str, compact: bool) -> tuple[str, CompactedSource | None]:
+    """Return the code to embed in a prompt, compacted unless compact is False."""
+    if not compact:
+        return code, None
+    compacted = compact_source(code)
+    logging.info(
+        f"Prompt compaction saved {compacted.tokens_saved} of {compacted.tokens_before} tokens"
+    )
+    return compacted.text, compacted
+
+def _remap_lines(value, compacted: CompactedSource | None):
+    """Map line numbers in a string (or list of strings) back to the original file."""
+    if compacted is None:
+        return value
+    if isinstance(value, str):
+        return remap_line_references(value, compacted)
+    if isinstance(value, list):
+        return [_remap_lines(item, compacted) for item in value]
+    return value
+
+def _restore_line_numbers(result: dict, compacted: CompactedSource | None, keys: list[str]) -> dict:
+    """Map line numbers in the model's answer back to the original file and attach compaction stats."""
+    if compacted is None or "error" in result:
+        return result
+    for key in keys:
+        if key in result:
+            result[key] = _remap_lines(result[key], compacted)
+    result["prompt_compaction"] = compacted.stats()
+    return result
+
+def analyze_code_quality(code: str, compact: bool = True) -> dict:
     """
     Analyze code quality using GPT with Structured Outputs.
     
@@ -43,7 +138,11 @@ def analyze_code_quality(code: str) -> dict:
       - 'complexity_metrics': an object (with cyclomatic complexity, Halstead metrics, and maintainability index)
       - 'issues': list of identified code issues
       - 'suggestions': list of improvement suggestions
+
+    With compact=True (the default) license headers, long docstrings and blank
+    runs are condensed before the code is sent; see server/compaction.py.
     """
+    code, compacted = _compact_for_prompt(code, compact)
     prompt = (
         "You are a code analysis expert. Analyze the following code snippet in detail. "
         "Calculate the following metrics where applicable:\n"
@@ -61,7 +160,7 @@ def analyze_code_quality(code: str) -> dict:
         f"Code:\n{code}\n\nAnalysis:"
     )
     try:
-        response = client.chat.completions.create(
+        response = _create_completion(
             model="gpt-4o-2024-08-06",  # Model that supports Structured Outputs
             messages=[
                 {"role": "system", "content": "You are a code quality analysis assistant."},
@@ -90,12 +189,15 @@ def analyze_code_quality(code: str) -> dict:
         )
         analysis_str = response.choices[0].message.content.strip()
         analysis_json = json.loads(analysis_str)
-        return analysis_json
+        return _restore_line_numbers(analysis_json, compacted, ["issues", "suggestions"])
+    except UpstreamUnavailable:
+        # Quota, breaker and deadline errors become 429/503/504 responses.
+        raise
     except Exception as e:
         logging.error(f"OpenAI API error in analyze_code_quality: {e}")
         return {"error": str(e)}
 
-def explain_code(code: str) -> dict:
+def explain_code(code: str, compact: bool = True) -> dict:
     """
     Explain what a code snippet does using GPT with Structured Outputs.
     
@@ -104,6 +206,7 @@ def explain_code(code: str) -> dict:
       - 'potential_pitfalls': list of potential issues
       - 'improvements': list of improvement suggestions
     """
+    code, compacted = _compact_for_prompt(code, compact)
     prompt = (
         "Explain what the following code does in simple terms, including its functionality and any potential pitfalls. "
         "Return your answer as a JSON object with the following keys:\n"
@@ -114,7 +217,7 @@ def explain_code(code: str) -> dict:
         f"Code:\n{code}\n\nExplanation:"
     )
     try:
-        response = client.chat.completions.create(
+        response = _create_completion(
             model="gpt-4o-2024-08-06",
             messages=[
                 {"role": "system", "content": "You are a helpful coding assistant."},
@@ -142,7 +245,11 @@ def explain_code(code: str) -> dict:
         )
         explanation_str = response.choices[0].message.content.strip()
         explanation_json = json.loads(explanation_str)
-        return explanation_json
+        return _restore_line_numbers(
+            explanation_json, compacted, ["explanation", "potential_pitfalls", "improvements"]
+        )
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         logging.error(f"OpenAI API error in explain_code: {e}")
         return {"error": str(e)}
@@ -167,7 +274,7 @@ def summarize_pr(diff: str) -> dict:
         f"Diff:\n{diff}\n\nSummary:"
     )
     try:
-        response = client.chat.completions.create(
+        response = _create_completion(
             model="gpt-4o-2024-08-06",
             messages=[
                 {"role": "system", "content": "You are an expert code reviewer and summarizer."},
@@ -180,81 +287,180 @@ def summarize_pr(diff: str) -> dict:
                 "json_schema": {
                     "name": "summarize_pr_schema",
                     "strict": True,
-                    "schema": {
-                        "type": "object",
-                        "properties": {
-                            "key_changes": {"type": "string"},
-                            "potential_impacts": {"type": "array", "items": {"type": "string"}},
-                            "improvement_suggestions": {"type": "array", "items": {"type": "string"}}
-                        },
-                        "required": ["key_changes", "potential_impacts", "improvement_suggestions"],
-                        "additionalProperties": False
-                    }
+                    "schema": _summarize_pr_schema
                 }
             }
         )
         summary_str = response.choices[0].message.content.strip()
         summary_json = json.loads(summary_str)
         return summary_json
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         logging.error(f"OpenAI API error in summarize_pr: {e}")
         return {"error": str(e)}
 
-def analyze_file(file_content: str) -> dict:
-    MAX_FILE_LENGTH = 30000  # Maximum allowed characters (adjust as needed)
-    if len(file_content) > MAX_FILE_LENGTH:
-        logging.error("File too large to analyze.")
-        return {"error": "File is too large to analyze."}
+def combine_pr_summaries(summaries: list[dict]) -> dict:
+    """
+    Merge partial pull request summaries (one per file or hunk) into one summary.
     
+    Each input has the summarize_pr keys; the output has the same keys, with
+    duplicate impacts and suggestions merged.
+    """
+    partials = "\n\n".join(json.dumps(summary) for summary in summaries)
     prompt = (
-        "You are a code analysis and documentation expert. Given the following code file, please perform a comprehensive analysis. "
-        "Your response must be a JSON object with the following keys:\n"
-        "  - 'lines_of_code': total number of lines of code (excluding comments and blank lines, if possible)\n"
-        "  - 'complexity_metrics': an object that includes metrics such as 'cyclomatic_complexity', "
-        "      'halstead_metrics' (with 'length', 'vocabulary', 'difficulty', 'volume', 'effort'), "
-        "      and 'maintainability_index'\n"
-        "  - 'issues': a list of identified issues, code smells, or duplicated code sections\n"
-        "  - 'explanation': a brief explanation of the file's purpose and functionality\n"
-        "  - 'suggestions': a list of suggestions for improvement\n\n"
-        "Return only valid JSON with no additional commentary.\n\n"
-        f"File Content:\n{file_content}\n\nAnalysis:"
+        "You are an expert code reviewer. The following JSON objects each summarize one part "
+        "of the same pull request diff. Combine them into a single concise summary of the whole "
+        "pull request. Merge duplicate or overlapping points and keep the most important ones. "
+        "Return your answer as a JSON object with the following keys:\n"
+        "  - 'key_changes': a summary of the main changes made\n"
+        "  - 'potential_impacts': a list of potential impacts or risks\n"
+        "  - 'improvement_suggestions': a list of suggestions for improvement\n\n"
+        "Ensure that the response is valid JSON with no additional commentary.\n\n"
+        f"Partial summaries:\n{partials}\n\nSummary:"
     )
     try:
-        response = client.chat.completions.create(
+        response = _create_completion(
             model="gpt-4o-2024-08-06",
             messages=[
-                {"role": "system", "content": "You are a code analysis and documentation assistant."},
+                {"role": "system", "content": "You are an expert code reviewer and summarizer."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.3,
-            max_tokens=800,
+            max_tokens=600,
             response_format={
                 "type": "json_schema",
                 "json_schema": {
-                    "name": "analyze_file_schema",
+                    "name": "summarize_pr_schema",
                     "strict": True,
-                    "schema": {
-                        "type": "object",
-                        "properties": {
-                            "lines_of_code": {"type": "number"},
-                            "complexity_metrics": _complexity_metrics_schema,
-                            "issues": {"type": "array", "items": {"type": "string"}},
-                            "explanation": {"type": "string"},
-                            "suggestions": {"type": "array", "items": {"type": "string"}}
-                        },
-                        "required": ["lines_of_code", "complexity_metrics", "issues", "explanation", "suggestions"],
-                        "additionalProperties": False
-                    }
+                    "schema": _summarize_pr_schema
                 }
             }
         )
+        summary_str = response.choices[0].message.content.strip()
+        summary_json = json.loads(summary_str)
+        return summary_json
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logging.error(f"OpenAI API error in combine_pr_summaries: {e}")
+        return {"error": str(e)}
+
+MAX_FILE_LENGTH = 30000  # Maximum allowed characters (adjust as needed)
+
+def _analyze_file_request(file_content: str) -> dict:
+    """Chat completion arguments shared by analyze_file and stream_analyze_file."""
+    prompt = (
+        "You are a code analysis and documentation expert. Given the following code file, please perform a comprehensive analysis. "
+        "Your response must be a JSON object with the following keys:\n"
+        "  - 'lines_of_code': total number of lines of code (excluding comments and blank lines, if possible)\n"
+        "  - 'complexity_metrics': an object that includes metrics such as 'cyclomatic_complexity', "
+        "      'halstead_metrics' (with 'length', 'vocabulary', 'difficulty', 'volume', 'effort'), "
+        "      and 'maintainability_index'\n"
+        "  - 'issues': a list of identified issues, code smells, or duplicated code sections\n"
+        "  - 'explanation': a brief explanation of the file's purpose and functionality\n"
+        "  - 'suggestions': a list of suggestions for improvement\n\n"
+        "Return only valid JSON with no additional commentary.\n\n"
+        f"File Content:\n{file_content}\n\nAnalysis:"
+    )
+    return {
+        "model": "gpt-4o-2024-08-06",
+        "messages": [
+            {"role": "system", "content": "You are a code analysis and documentation assistant."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 800,
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "analyze_file_schema",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    # Structured outputs are generated in property order, so the
+                    # explanation comes first for streaming clients.
+                    "properties": {
+                        "explanation": {"type": "string"},
+                        "lines_of_code": {"type": "number"},
+                        "complexity_metrics": _complexity_metrics_schema,
+                        "issues": {"type": "array", "items": {"type": "string"}},
+                        "suggestions": {"type": "array", "items": {"type": "string"}}
+                    },
+                    "required": ["explanation", "lines_of_code", "complexity_metrics", "issues", "suggestions"],
+                    "additionalProperties": False
+                }
+            }
+        }
+    }
+
+_ANALYZE_FILE_TEXT_KEYS = ["issues", "explanation", "suggestions"]
+
+def analyze_file(file_content: str, compact: bool = True) -> dict:
+    # The limit applies to what is sent, so compaction lets larger files through.
+    file_content, compacted = _compact_for_prompt(file_content, compact)
+    if len(file_content) > MAX_FILE_LENGTH:
+        logging.error("File too large to analyze.")
+        return {"error": "File is too large to analyze."}
+    
+    try:
+        response = _create_completion(**_analyze_file_request(file_content))
         analysis_str = response.choices[0].message.content.strip()
         analysis_json = json.loads(analysis_str)
-        return analysis_json
+        return _restore_line_numbers(analysis_json, compacted, _ANALYZE_FILE_TEXT_KEYS)
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
         logging.error(f"OpenAI API error in analyze_file: {e}")
         return {"error": str(e)}
 
+def stream_analyze_file(file_content: str, compact: bool = True):
+    """
+    Streaming variant of analyze_file.
+    
+    Returns an iterator of (event, data) tuples:
+      - ("field", {"key": ..., "value": ...}) as soon as each top-level key of
+        the analysis has been fully generated
+      - ("done", analysis) at the end, with the same result analyze_file returns
+      - ("error", {"error": ...}) instead of "done" if the analysis failed
+    The model call is started before returning, so UpstreamUnavailable is
+    raised here, while the caller can still answer with an error status.
+    """
+    file_content, compacted = _compact_for_prompt(file_content, compact)
+    if len(file_content) > MAX_FILE_LENGTH:
+        logging.error("File too large to analyze.")
+        return iter([("error", {"error": "File is too large to analyze."})])
+
+    try:
+        stream = _create_completion(**_analyze_file_request(file_content), stream=True)
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logging.error(f"OpenAI API error in stream_analyze_file: {e}")
+        return iter([("error", {"error": str(e)})])
+    return _stream_analysis_events(stream, compacted)
+
+def _stream_analysis_events(stream, compacted: CompactedSource | None):
+    fields = JsonFieldStream()
+    chunks = []
+    try:
+        for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            delta = chunk.choices[0].delta.content
+            chunks.append(delta)
+            for key, value in fields.feed(delta):
+                if key in _ANALYZE_FILE_TEXT_KEYS:
+                    value = _remap_lines(value, compacted)
+                yield "field", {"key": key, "value": value}
+        analysis_json = json.loads("".join(chunks))
+    except Exception as e:
+        # Too late for an error status; the client gets an "error" event.
+        logging.error(f"OpenAI API error in stream_analyze_file: {e}")
+        yield "error", {"error": str(e)}
+        return
+    yield "done", _restore_line_numbers(analysis_json, compacted, _ANALYZE_FILE_TEXT_KEYS)
+
 # For testing the functions without setting up API routes.
 if __name__ == '__main__':
     sample_code = """
@@ -1,29 +1,87 @@
 """API endpoints."""
 
+import json
 import os
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Any, cast
 
 from apiflask import APIBlueprint
-from flask import current_app, jsonify, request, session
+from flask import Response, current_app, g, jsonify, request, session, stream_with_context
 import requests
 from sqlalchemy import select
 
 from server import db
 from server.controllers.ai_insights import (
     analyze_code_quality,
-    analyze_file,
     explain_code,
+    stream_analyze_file,
     summarize_pr,
 )
+from server.analysis import (
+    FILE_ANALYSIS_KIND,
+    analyze_file_cached,
+    analyze_folder_path,
+    compare_analysis,
+    file_analysis_key,
+)
+from server.analytics import GRANULARITIES, get_series, parse_day
+from server.cache import cache_stats
+from server.duplicates import SOURCE_EXTENSIONS, DuplicateDetector
+from server.git_mirror import GitError, get_contributor_stats, has_mirror
+from server.github import (
+    check_repo_access,
+    get_blob,
+    get_code_frequency,
+    get_pull_request_diff,
+    get_tree,
+    github_get,
+    list_commits,
+)
+from server.jobs import enqueue, enqueue_once, validate_submitted_payload
+from server.leaderboard import DEFAULT_PAGE_SIZE, get_leaderboard
+from server.llm_scheduler import (
+    INTERACTIVE,
+    LLMRateLimited,
+    end_llm_context,
+    scheduler as llm_scheduler,
+    start_llm_context,
+)
+from server.json_provider import parse_fields, project, wants
+from server.models.Job import Job
 from server.models.User import User
+from server.overview import get_overviews
+from server.path_index import get_path_index
+from server.pr_summary import DiffTooLarge, summarize_diff
+from server.resilience import (
+    CircuitOpenError,
+    UpstreamUnavailable,
+    end_deadline,
+    has_time_for,
+    propagate_deadline,
+    start_deadline,
+)
+from server.result_store import get_result, put_result
+from server.search import get_index, refresh_index
+from server.trends import DEFAULT_POINTS, get_trend
+from server.triage import SKIP, triage_file, triage_totals
+import server.tasks  # noqa: F401  (registers job handlers)
 
 api = APIBlueprint("api", __name__, url_prefix="/api", tag="api")
 
 
 ### API Endpoints ###
 
+def requested_fields():
+    """Projection spec from the ?fields= parameter of GitHub proxy endpoints.
+
+    fields is a comma-separated list of keys to return, with dots for nested
+    keys (e.g. "login,commit_history.date"). Without it, all keys are returned.
+    """
+    return parse_fields(request.args.get("fields"))
+
 def get_user_token():
     """Helper function to get the GitHub access token for the current user."""
     if "user" not in session:
@@ -38,6 +96,38 @@ def get_user_token():
         
     return user.github_access_token
 
+@api.before_request
+def start_request_deadline():
+    """Give the request a time budget shared by all of its upstream calls."""
+    g.deadline_token = start_deadline(current_app.config["REQUEST_DEADLINE_SECONDS"])
+
+@api.teardown_request
+def end_request_deadline(_exc):
+    token = g.pop("deadline_token", None)
+    if token is not None:
+        end_deadline(token)
+
+@api.before_request
+def start_request_llm_context():
+    """Attribute LLM calls made by the request to the signed-in user."""
+    g.llm_context_token = start_llm_context(session.get("user", {}).get("login"), INTERACTIVE)
+
+@api.teardown_request
+def end_request_llm_context(_exc):
+    token = g.pop("llm_context_token", None)
+    if token is not None:
+        end_llm_context(token)
+
+@api.errorhandler(UpstreamUnavailable)
+def upstream_unavailable(e):
+    """Deadline, circuit breaker and LLM quota errors not handled by the endpoint itself."""
+    current_app.logger.warning(f"Upstream unavailable: {e}")
+    if isinstance(e, LLMRateLimited):
+        return jsonify({"error": str(e)}), 429, {"Retry-After": str(max(1, round(e.retry_after)))}
+    if isinstance(e, CircuitOpenError):
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(max(1, round(e.retry_after)))}
+    return jsonify({"error": str(e)}), 504
+
 @api.before_request
 def check_auth():
     """Verify user is authenticated before accessing API endpoints."""
@@ -50,7 +140,9 @@ def check_auth():
 
 @api.route("/github/repositories", methods=["GET"])
 def get_repositories():
-    """Get list of repositories the authenticated user has access to."""
+    """Get list of repositories the authenticated user has access to.
+    Supports ?fields= projection.
+    """
     token = get_user_token()
     
     headers = {
@@ -63,9 +155,9 @@ def get_repositories():
     current_app.logger.info("Fetching user repositories")
     
     try:
-        response = requests.get(
+        response = github_get(
             repos_url,
-            headers=headers,
+            headers,
             params={
                 "sort": "updated",
                 "per_page": 100,
@@ -85,19 +177,60 @@ def get_repositories():
         } for repo in repos]
         
         current_app.logger.info(f"Found {len(formatted_repos)} repositories")
-        return jsonify(formatted_repos)
+        return jsonify(project(formatted_repos, requested_fields()))
 
+    except UpstreamUnavailable:
+        raise
     except requests.exceptions.RequestException as e:
         current_app.logger.error(f"GitHub API request failed: {str(e)}")
         return jsonify({"error": "Failed to fetch repositories"}), 500
 
+def _is_not_found(e: requests.exceptions.RequestException) -> bool:
+    """Whether GitHub answered 404, e.g. for a private repository the token can't read."""
+    return (
+        isinstance(e, requests.exceptions.HTTPError)
+        and e.response is not None
+        and e.response.status_code == 404
+    )
+
 @api.route("/contributors/<repo_owner>/<repo_name>", methods=["GET"])
 def get_contributors(repo_owner, repo_name):
+    """
+    Contributors enriched with weekly stats. Supports ?fields= projection.
+    ?source=git computes the stats from a local mirror clone instead of
+    GitHub's stats API (the default comes from CONTRIBUTORS_SOURCE). The
+    first request for a repository queues the clone and returns 202 with the
+    job, which can be polled at /api/jobs/<id>.
+    """
+    fields = requested_fields()
     if not repo_owner or not repo_name:
         current_app.logger.error("Missing owner or repo in request")
         return jsonify({"error": "Missing owner or repo"}), 400
 
     token = get_user_token()
+    if request.args.get("source", current_app.config["CONTRIBUTORS_SOURCE"]) == "git":
+        try:
+            if not has_mirror(repo_owner, repo_name):
+                # A first clone can outlast the request deadline; a worker makes it.
+                check_repo_access(repo_owner, repo_name, token)
+                job = enqueue_once(
+                    "git_contributors",
+                    {"owner": repo_owner, "repo": repo_name},
+                    user_id=session["user"]["login"],
+                )
+                return jsonify(job.to_dict()), 202
+            contributors = get_contributor_stats(repo_owner, repo_name, token)
+        except UpstreamUnavailable:
+            raise
+        except requests.exceptions.RequestException as e:
+            if _is_not_found(e):
+                return jsonify({"error": "Repository not found"}), 404
+            current_app.logger.error(f"Access check failed for {repo_owner}/{repo_name}: {e}")
+            return jsonify({"error": "Could not fetch repository info"}), 502
+        except GitError as e:
+            current_app.logger.error(f"Git mirror failed for {repo_owner}/{repo_name}: {e}")
+            return jsonify({"error": "Failed to compute contributor statistics"}), 502
+        return jsonify(project(contributors, fields))
     headers = {
         "Accept": "application/vnd.github.v3+json",
         "Authorization": f"token {token}"
@@ -105,7 +238,7 @@ def get_contributors(repo_owner, repo_name):
 
     contributors_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contributors"
     current_app.logger.info(f"Fetching contributors from {contributors_url}")
-    contributors_response = requests.get(contributors_url, headers=headers)
+    contributors_response = github_get(contributors_url, headers)
     current_app.logger.info(f"Contributors response status: {contributors_response.status_code}")
 
     if contributors_response.status_code != 200:
@@ -119,11 +252,16 @@ def get_contributors(repo_owner, repo_name):
     max_retries = 3
     retry_delay = 1
     for attempt in range(max_retries):
-        stats_response = requests.get(stats_url, headers=headers)
+        stats_response = github_get(stats_url, headers)
         current_app.logger.info(f"Stats attempt {attempt+1} status: {stats_response.status_code}")
         if stats_response.status_code == 200:
             break
-        elif stats_response.status_code == 202 and attempt < max_retries - 1:
+        elif (
+            stats_response.status_code == 202
+            and attempt < max_retries - 1
+            # Don't sleep past the request deadline; fail now instead.
+            and has_time_for(retry_delay + 1)
+        ):
             current_app.logger.warning("GitHub is processing stats; retrying...")
             time.sleep(retry_delay)
             retry_delay *= 2
@@ -141,7 +279,7 @@ def get_contributors(repo_owner, repo_name):
             total_deletions = sum(week["d"] for week in contributor_stats["weeks"])
             total_commits = sum(week["c"] for week in contributor_stats["weeks"])
             commit_history = []
-            for week in contributor_stats["weeks"]:
+            for week in contributor_stats["weeks"] if wants(fields, "commit_history") else []:
                 week_date = datetime.fromtimestamp(week["w"]).isoformat()
                 commit_history.append({
                     "date": week_date,
@@ -161,13 +299,14 @@ def get_contributors(repo_owner, repo_name):
             enriched_contributors.append(contributor)
 
     current_app.logger.info(f"Returning data for {len(enriched_contributors)} contributors.")
-    return jsonify(enriched_contributors)
+    return jsonify(project(enriched_contributors, fields))
 
 @api.route("/commits/<repo_owner>/<repo_name>", methods=["GET"])
 def get_commits(repo_owner, repo_name):
     """
     Fetch recent commits for the specified repository.
-    Optionally accept query parameters like 'branch', 'per_page', 'page'.
+    Optionally accept query parameters like 'branch', 'per_page', 'page'
+    and 'fields'.
     """
     token = get_user_token()
     if not token:
@@ -191,7 +330,7 @@ def get_commits(repo_owner, repo_name):
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = github_get(url, headers, params=params)
         response.raise_for_status()
         commits_data = response.json()
 
@@ -212,8 +351,10 @@ def get_commits(repo_owner, repo_name):
                 "committer_avatar_url": committer.get("avatar_url"),
             })
 
-        return jsonify(formatted_commits)
+        return jsonify(project(formatted_commits, requested_fields()))
 
+    except UpstreamUnavailable:
+        raise
     except requests.exceptions.RequestException as e:
         return jsonify({"error": str(e)}), 500
     
@@ -224,88 +365,189 @@ def get_overview(repo_owner, repo_name):
       - Basic GitHub info (stars, forks, watchers, open issues)
       - Possibly code analysis stats (code complexity, lines of code, etc.)
       - Possibly total commits or other local computed metrics
+    Supports ?fields= projection.
     """
     token = get_user_token()
     if not token:
         return jsonify({"error": "GitHub token not found"}), 401
 
-    headers = {
-        "Accept": "application/vnd.github.v3+json",
-        "Authorization": f"token {token}"
-    }
+    full_name = f"{repo_owner}/{repo_name}"
+    try:
+        overview_data = get_overviews([full_name], token)[full_name]
+    except UpstreamUnavailable:
+        raise
+    except requests.exceptions.RequestException as e:
+        current_app.logger.error(f"Failed to fetch overview for {full_name}: {e}")
+        return jsonify({"error": "Could not fetch repository info"}), 502
+    if overview_data is None:
+        return jsonify({"error": "Repository not found"}), 404
 
-    # 1. Basic repo info: GET /repos/{owner}/{repo}
-    repo_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}"
-    repo_info_res = requests.get(repo_url, headers=headers)
-    if repo_info_res.status_code != 200:
-        return jsonify({"error": "Could not fetch repository info"}), repo_info_res.status_code
-    repo_info = repo_info_res.json()
-
-    # 2. Total commits: GET /repos/{owner}/{repo}/commits?per_page=1
-    #    Use 'Link' header to find the last page or do a HEAD request
-    commits_url = f"{repo_url}/commits"
-    params = {"per_page": 1}
-    commits_res = requests.get(commits_url, headers=headers, params=params)
-    if commits_res.status_code != 200:
-        total_commits = None
-    else:
-        # Extract from the 'Link' header if present
-        # e.g.: <https://api.github.com/repositories/xxx/commits?per_page=1&page=65>; rel="last"
-        links = commits_res.headers.get("Link", "")
-        total_commits = None
-        if 'rel="last"' in links:
-            # Extract the page number
-            # Typically: <...&page=123>; rel="last"
-            parts = links.split(",")
-            for part in parts:
-                if 'rel="last"' in part:
-                    # find ?page=X
-                    start = part.find("page=")
-                    end = part.find(">;", start)
-                    if start != -1 and end != -1:
-                        total_commits = part[start+5:end]  # the page number
-                        break
-
-    # 3. Example local code analysis (optional)
-    #    Suppose you already store or can compute average code complexity, lines of code, etc.
-    #    For demonstration, we'll fake these values:
-    code_analysis_data = {
-        "average_complexity": 4.3/10,
-        "total_lines_of_code": 1442
-    }
+    return jsonify(project(overview_data, requested_fields()))
 
-    # 4. Combine data into a single JSON
-    overview_data = {
-        "name": repo_info.get("name"),
-        "description": repo_info.get("description"),
-        "stars": repo_info.get("stargazers_count"),
-        "forks": repo_info.get("forks_count"),
-        "watchers": repo_info.get("watchers_count"),
-        "open_issues": repo_info.get("open_issues_count"),
-        "total_commits": total_commits,  # or None if unavailable
-        "average_complexity": code_analysis_data["average_complexity"],
-        "total_lines_of_code": code_analysis_data["total_lines_of_code"],
-    }
+# Upper bound on repositories in one batch overview request.
+MAX_BATCH_OVERVIEWS = 200
+_FULL_NAME_RE = re.compile(r"[\w.-]+/[\w.-]+")
+
+@api.route("/overview/batch", methods=["POST"])
+def get_overview_batch():
+    """
+    Overviews for many repositories at once, e.g. the whole repository list.
+    Expects JSON with:
+      - repositories: a list of "owner/name" strings
+    Returns {"owner/name": overview or null if not found}. Uncached
+    repositories are fetched with one GraphQL query per 50. Supports ?fields=
+    projection, applied to each overview.
+    """
+    data = request.get_json(silent=True) or {}
+    repositories = data.get("repositories")
+    if not isinstance(repositories, list) or not all(
+        isinstance(repo, str) and _FULL_NAME_RE.fullmatch(repo) for repo in repositories
+    ):
+        return jsonify({"error": "repositories must be a list of \"owner/name\" strings"}), 400
+    if len(repositories) > MAX_BATCH_OVERVIEWS:
+        return jsonify({"error": f"At most {MAX_BATCH_OVERVIEWS} repositories per request"}), 400
 
-    return jsonify(overview_data)
+    try:
+        overviews = get_overviews(repositories, get_user_token())
+    except UpstreamUnavailable:
+        raise
+    except requests.exceptions.RequestException as e:
+        current_app.logger.error(f"Failed to fetch batch overview: {e}")
+        return jsonify({"error": "Could not fetch repository info"}), 502
+
+    fields = requested_fields()
+    return jsonify({repo: project(overview, fields) for repo, overview in overviews.items()})
 
 
+@api.route("/analytics/<repo_owner>/<repo_name>", methods=["GET"])
+def get_analytics(repo_owner, repo_name):
+    """
+    Returns commit-activity totals and a time series for the default branch.
+    Query parameters:
+      - granularity: "day", "week" (default) or "month"
+      - start, end: optional ISO dates bounding the series (inclusive)
+      - max_points: merge adjacent buckets so at most this many points are
+        returned (default 500)
+    Each series point has commits, distinct authors, additions and deletions.
+    """
+    granularity = request.args.get("granularity", "week")
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {list(GRANULARITIES)}"}), 400
+    try:
+        start_day = parse_day(request.args.get("start"))
+        end_day = parse_day(request.args.get("end"))
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO dates"}), 400
+    max_points = request.args.get("max_points", 500, type=int)
+
+    token = get_user_token()
+    try:
+        # Series are shared between users; a cached one mustn't reach a
+        # caller who can't read the repository.
+        check_repo_access(repo_owner, repo_name, token)
+        series = get_series(
+            f"{repo_owner}/{repo_name}",
+            lambda **kwargs: list_commits(repo_owner, repo_name, token, **kwargs),
+            lambda: get_code_frequency(repo_owner, repo_name, token),
+        )
+    except UpstreamUnavailable:
+        raise
+    except requests.exceptions.RequestException as e:
+        if _is_not_found(e):
+            return jsonify({"error": "Repository not found"}), 404
+        current_app.logger.error(f"Failed to load commit history for {repo_owner}/{repo_name}: {e}")
+        return jsonify({"error": "Failed to fetch commit history"}), 502
+
+    return jsonify({
+        **series.totals(),
+        "granularity": granularity,
+        **series.rollup(granularity, start_day, end_day, max_points),
+    })
+
+def _triage_skip(data: dict) -> dict | None:
+    """The response for a file triage rules out, or None to analyze it."""
+    if data.get("force"):
+        return None
+    file_content = data["file_content"]
+    verdict = triage_file(data.get("path"), file_content)
+    if verdict.decision != SKIP:
+        return None
+    tokens = triage_totals.record(verdict, file_content)
+    current_app.logger.info(f"Not analyzing {data.get('path') or 'file'}: {verdict.reason}")
+    return {"skipped": True, "reason": verdict.reason, "tokens_avoided": tokens}
+
 @api.route("/analyze/file", methods=["POST"])
 def analyze_single_file():
     """
     Expects JSON with:
       - file_content: The content of a single file to analyze.
-    Returns the structured analysis output from analyze_file().
+      - path (optional): the file's path, used to recognize generated and
+        vendored files.
+      - force (optional): analyze even if triage would skip the file.
+    Returns the structured analysis output from analyze_file(), or
+    {"skipped": true, "reason", "tokens_avoided"} for files that are
+    generated, vendored, minified or binary.
     """
     data = request.get_json()
     if not data or 'file_content' not in data:
         current_app.logger.error("Missing file_content in request")
         return jsonify({"error": "Missing file_content in request"}), 400
     file_content = data['file_content']
+    skipped = _triage_skip(data)
+    if skipped is not None:
+        return jsonify(skipped)
     current_app.logger.info("Analyzing single file content.")
-    analysis = analyze_file(file_content)
+    analysis = analyze_file_cached(file_content)
     return jsonify(analysis)
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api.route("/analyze/file/stream", methods=["POST"])
+def analyze_single_file_stream():
+    """
+    Streaming variant of /api/analyze/file, as Server-Sent Events.
+    Expects the same JSON body. Emits:
+      - "field" events ({"key", "value"}) as each top-level key of the
+        analysis is completed, so the explanation can render early
+      - a final "done" event with the full analysis, or an "error" event
+      - or only a "skipped" event, with the same body as /api/analyze/file
+        returns for skipped files
+    """
+    data = request.get_json()
+    if not data or 'file_content' not in data:
+        current_app.logger.error("Missing file_content in request")
+        return jsonify({"error": "Missing file_content in request"}), 400
+    file_content = data['file_content']
+    key = file_analysis_key(file_content)
+    skipped = _triage_skip(data)
+    cached = get_result(FILE_ANALYSIS_KIND, key) if skipped is None else None
+    # Started before the response, so quota, breaker and deadline errors
+    # still get their status codes from upstream_unavailable.
+    events = stream_analyze_file(file_content) if skipped is None and cached is None else None
+
+    def generate():
+        if skipped is not None:
+            yield _sse("skipped", skipped)
+            return
+        if cached is not None:
+            for field, value in cached.items():
+                yield _sse("field", {"key": field, "value": value})
+            yield _sse("done", cached)
+            return
+
+        for event, payload in events:
+            if event == "done":
+                put_result(FILE_ANALYSIS_KIND, key, payload)
+            yield _sse(event, payload)
+
+    current_app.logger.info("Streaming analysis of single file content.")
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @api.route("/analyze/folder", methods=["POST"])
 def analyze_folder():
     """
@@ -323,86 +565,7 @@ def analyze_folder():
         current_app.logger.error(f"Invalid folder path: {folder_path}")
         return jsonify({"error": f"Invalid folder path: {folder_path}"}), 400
 
-    aggregate = {
-        "total_files_analyzed": 0,
-        "total_lines_of_code": 0,
-        "sum_cyclomatic_complexity": 0,
-        "sum_maintainability_index": 0,
-        "sum_halstead_metrics": {
-            "length": 0,
-            "vocabulary": 0,
-            "difficulty": 0,
-            "volume": 0,
-            "effort": 0
-        },
-        "files_with_complexity": 0,
-        "issues": [],
-        "suggestions": []
-    }
-
-    for root, dirs, files in os.walk(folder_path):
-        for file in files:
-            if file.endswith(".py"):
-                file_path = os.path.join(root, file)
-                current_app.logger.info(f"Analyzing file: {file_path}")
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        content = f.read()
-                except Exception as e:
-                    current_app.logger.error(f"Error reading file {file_path}: {e}")
-                    continue
-
-                result = analyze_file(content)
-                if "error" in result:
-                    current_app.logger.error(f"Error analyzing file {file_path}: {result['error']}")
-                    continue
-
-                aggregate["total_files_analyzed"] += 1
-                aggregate["total_lines_of_code"] += result.get("lines_of_code", 0)
-
-                comp = result.get("complexity_metrics", {})
-                if comp:
-                    cyclo = comp.get("cyclomatic_complexity") or 0
-                    mi = comp.get("maintainability_index") or 0
-                    halstead = comp.get("halstead_metrics", {})
-                    length = halstead.get("length") or 0
-                    vocabulary = halstead.get("vocabulary") or 0
-                    difficulty = halstead.get("difficulty") or 0
-                    volume = halstead.get("volume") or 0
-                    effort = halstead.get("effort") or 0
-
-                    aggregate["sum_cyclomatic_complexity"] += cyclo
-                    aggregate["sum_maintainability_index"] += mi
-                    aggregate["sum_halstead_metrics"]["length"] += length
-                    aggregate["sum_halstead_metrics"]["vocabulary"] += vocabulary
-                    aggregate["sum_halstead_metrics"]["difficulty"] += difficulty
-                    aggregate["sum_halstead_metrics"]["volume"] += volume
-                    aggregate["sum_halstead_metrics"]["effort"] += effort
-                    aggregate["files_with_complexity"] += 1
-
-                aggregate["issues"].extend(result.get("issues", []))
-                aggregate["suggestions"].extend(result.get("suggestions", []))
-
-    if aggregate["files_with_complexity"] > 0:
-        avg_cyclo = aggregate["sum_cyclomatic_complexity"] / aggregate["files_with_complexity"]
-        avg_mi = aggregate["sum_maintainability_index"] / aggregate["files_with_complexity"]
-        avg_halstead = {k: v / aggregate["files_with_complexity"] for k, v in aggregate["sum_halstead_metrics"].items()}
-    else:
-        avg_cyclo = None
-        avg_mi = None
-        avg_halstead = None
-
-    aggregate_results = {
-        "total_files_analyzed": aggregate["total_files_analyzed"],
-        "total_lines_of_code": aggregate["total_lines_of_code"],
-        "average_cyclomatic_complexity": avg_cyclo,
-        "average_maintainability_index": avg_mi,
-        "average_halstead_metrics": avg_halstead,
-        "issues": list(set(aggregate["issues"])),
-        "suggestions": list(set(aggregate["suggestions"]))
-    }
-
-    current_app.logger.info(f"Aggregate analysis completed for {aggregate['total_files_analyzed']} files.")
+    aggregate_results = analyze_folder_path(folder_path)
     return jsonify(aggregate_results)
 
 # -------------------------------
@@ -411,7 +574,7 @@ def analyze_folder():
 
 @api.route("/github/list-files/<repo_owner>/<repo_name>", methods=["GET"])
 def github_list_files(repo_owner, repo_name):
-    """Lists files in a GitHub repository folder."""
+    """Lists files in a GitHub repository folder. Supports ?fields= projection."""
     path = request.args.get("path", "")
     token = get_user_token()
     headers = {
@@ -420,11 +583,11 @@ def github_list_files(repo_owner, repo_name):
     }
     url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents/{path}"
     current_app.logger.info(f"Fetching GitHub repository contents from {url}")
-    response = requests.get(url, headers=headers)
+    response = github_get(url, headers)
     if response.status_code != 200:
         current_app.logger.error(f"GitHub API error: {response.json()}")
         return jsonify({"error": "Failed to fetch repository contents", "details": response.json()}), response.status_code
-    return jsonify(response.json())
+    return jsonify(project(response.json(), requested_fields()))
 
 @api.route("/github/get-file/<repo_owner>/<repo_name>", methods=["GET"])
 def github_get_file(repo_owner, repo_name):
@@ -437,8 +600,352 @@ def github_get_file(repo_owner, repo_name):
     }
     url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents/{path}"
     current_app.logger.info(f"Fetching file content from GitHub: {url}")
-    response = requests.get(url, headers=headers)
+    response = github_get(url, headers)
     if response.status_code != 200:
         current_app.logger.error(f"GitHub API error: {response.json()}")
         return jsonify({"error": "Failed to fetch file content", "details": response.json()}), response.status_code
     return response.text
+
+@api.route("/github/find-path/<repo_owner>/<repo_name>", methods=["GET"])
+def github_find_path(repo_owner, repo_name):
+    """
+    Fuzzy-finds files and folders by path, like an editor's quick-open.
+    Query parameters:
+      - q: characters to look for, in order (e.g. "fltrex" for FileTreeExplorer)
+      - ref: branch, tag or commit (defaults to HEAD)
+      - limit: maximum number of results (default 20)
+    Each result has path, type ("blob" or "tree"), score and the positions of
+    the matched characters in the path.
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Missing q parameter"}), 400
+    ref = request.args.get("ref", "HEAD")
+    limit = request.args.get("limit", 20, type=int)
+    token = get_user_token()
+
+    try:
+        tree = get_tree(repo_owner, repo_name, token, ref)
+    except UpstreamUnavailable:
+        raise
+    except requests.exceptions.RequestException as e:
+        current_app.logger.error(f"Failed to fetch tree of {repo_owner}/{repo_name}: {e}")
+        return jsonify({"error": "Failed to fetch repository contents"}), 502
+
+    index = get_path_index(tree)
+    return jsonify({
+        "query": query,
+        "tree_sha": index.tree_sha,
+        "truncated": tree.get("truncated", False),
+        "results": index.find(query, limit=limit),
+    })
+
+# -------------------------------
+# Code search
+# -------------------------------
+
+@api.route("/search/<repo_owner>/<repo_name>/index", methods=["POST"])
+def build_search_index(repo_owner, repo_name):
+    """
+    Builds or incrementally refreshes the search index for a repository.
+    Accepts optional JSON with:
+      - ref: branch, tag or commit to index (defaults to HEAD).
+    Only files whose blob SHA changed since the last refresh are fetched.
+    """
+    data = request.get_json(silent=True) or {}
+    ref = data.get("ref", "HEAD")
+    token = get_user_token()
+
+    try:
+        tree = get_tree(repo_owner, repo_name, token, ref)
+        stats = refresh_index(
+            repo_owner,
+            repo_name,
+            tree,
+            lambda sha: get_blob(repo_owner, repo_name, sha, token),
+        )
+    except UpstreamUnavailable:
+        raise
+    except requests.exceptions.RequestException as e:
+        current_app.logger.error(f"Failed to index {repo_owner}/{repo_name}: {e}")
+        return jsonify({"error": "Failed to fetch repository contents"}), 502
+
+    if tree.get("truncated"):
+        current_app.logger.warning(f"Tree for {repo_owner}/{repo_name} was truncated by GitHub")
+    current_app.logger.info(f"Search index for {repo_owner}/{repo_name}: {stats}")
+    return jsonify({**stats, "tree_sha": tree.get("sha"), "truncated": tree.get("truncated", False)})
+
+@api.route("/search/<repo_owner>/<repo_name>", methods=["GET"])
+def search_repository(repo_owner, repo_name):
+    """
+    Full-text search over a repository's indexed files, ranked with BM25.
+    Query parameters:
+      - q: the search query
+      - limit: maximum number of results (default 20)
+    Indexes are shared between users, so the caller's access to the
+    repository is checked first.
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Missing q parameter"}), 400
+    limit = request.args.get("limit", 20, type=int)
+
+    try:
+        check_repo_access(repo_owner, repo_name, get_user_token())
+    except UpstreamUnavailable:
+        raise
+    except requests.exceptions.RequestException as e:
+        if _is_not_found(e):
+            return jsonify({"error": "Repository not found"}), 404
+        current_app.logger.error(f"Access check failed for {repo_owner}/{repo_name}: {e}")
+        return jsonify({"error": "Could not fetch repository info"}), 502
+
+    index = get_index(repo_owner, repo_name)
+    if index is None:
+        return jsonify({"error": "Repository has not been indexed yet"}), 404
+
+    return jsonify({
+        "query": query,
+        "tree_sha": index.tree_sha,
+        "results": index.search(query, limit=limit),
+    })
+
+# -------------------------------
+# Duplicate code detection
+# -------------------------------
+
+@api.route("/duplicates/<repo_owner>/<repo_name>", methods=["GET"])
+def find_duplicate_code(repo_owner, repo_name):
+    """
+    Finds near-duplicate functions across all source files of a repository.
+    Query parameters:
+      - ref: branch, tag or commit to scan (defaults to HEAD)
+      - threshold: minimum estimated similarity between 0 and 1 (default 0.8)
+      - limit: maximum number of pairs to return (default 100)
+    """
+    ref = request.args.get("ref", "HEAD")
+    threshold = request.args.get("threshold", 0.8, type=float)
+    limit = request.args.get("limit", 100, type=int)
+    token = get_user_token()
+
+    try:
+        tree = get_tree(repo_owner, repo_name, token, ref)
+        entries = [
+            entry for entry in tree.get("tree", [])
+            if entry.get("type") == "blob"
+            and os.path.splitext(entry["path"])[1] in SOURCE_EXTENSIONS
+        ]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            blobs = list(executor.map(
+                propagate_deadline(
+                    lambda entry: get_blob(repo_owner, repo_name, entry["sha"], token)
+                ),
+                entries,
+            ))
+    except UpstreamUnavailable:
+        raise
+    except requests.exceptions.RequestException as e:
+        current_app.logger.error(f"Failed to fetch {repo_owner}/{repo_name} for duplicate scan: {e}")
+        return jsonify({"error": "Failed to fetch repository contents"}), 502
+
+    detector = DuplicateDetector(threshold=threshold)
+    for entry, blob in zip(entries, blobs):
+        detector.add_file(entry["path"], blob.decode("utf-8", errors="replace"))
+    pairs = detector.find()
+
+    current_app.logger.info(
+        f"Found {len(pairs)} duplicate pairs across {len(entries)} files in {repo_owner}/{repo_name}"
+    )
+    return jsonify({
+        "files_scanned": len(entries),
+        "units_compared": len(detector.units),
+        "total_pairs": len(pairs),
+        "duplicates": pairs[:limit],
+    })
+
+# -------------------------------
+# Change analysis
+# -------------------------------
+
+@api.route("/compare-analysis/<repo_owner>/<repo_name>", methods=["GET"])
+def get_compare_analysis(repo_owner, repo_name):
+    """
+    Compares code metrics (lines of code, cyclomatic complexity,
+    maintainability index) of the source files changed between two refs.
+    Query parameters:
+      - base: branch, tag or commit to compare from
+      - head: branch, tag or commit to compare to
+    Returns per-file base/head metrics and deltas, and totals over the changed
+    files. Only changed files are fetched, measured locally without the model.
+    """
+    base = request.args.get("base", "").strip()
+    head = request.args.get("head", "").strip()
+    if not base or not head:
+        return jsonify({"error": "Missing base or head parameter"}), 400
+    token = get_user_token()
+
+    try:
+        result = compare_analysis(repo_owner, repo_name, base, head, token)
+    except UpstreamUnavailable:
+        raise
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return jsonify({"error": "Repository, base or head not found"}), 404
+        current_app.logger.error(f"Failed to compare {repo_owner}/{repo_name} {base}...{head}: {e}")
+        return jsonify({"error": "Failed to fetch the comparison"}), 502
+    except requests.exceptions.RequestException as e:
+        current_app.logger.error(f"Failed to compare {repo_owner}/{repo_name} {base}...{head}: {e}")
+        return jsonify({"error": "Failed to fetch the comparison"}), 502
+
+    return jsonify(project(result, requested_fields()))
+
+@api.route("/trends/<repo_owner>/<repo_name>", methods=["GET"])
+def get_code_trends(repo_owner, repo_name):
+    """
+    Lines of code, cyclomatic complexity and maintainability index of a
+    branch's source files after each commit, oldest first, as columns (sha,
+    timestamp, files, lines_of_code, cyclomatic_complexity,
+    maintainability_index).
+    Query parameters:
+      - branch: branch to follow (defaults to the default branch)
+      - points: maximum number of commits returned, evenly spaced (default 500)
+    The series is built once from the repository's mirror and extended with
+    new commits; if the first build outlasts the request, complete is false and
+    the next request continues it.
+    """
+    branch = request.args.get("branch") or None
+    points = request.args.get("points", DEFAULT_POINTS, type=int)
+    token = get_user_token()
+
+    try:
+        table, head, complete = get_trend(repo_owner, repo_name, token, branch)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except UpstreamUnavailable:
+        raise
+    except requests.exceptions.RequestException as e:
+        if _is_not_found(e):
+            return jsonify({"error": "Repository not found"}), 404
+        current_app.logger.error(f"Access check failed for {repo_owner}/{repo_name}: {e}")
+        return jsonify({"error": "Could not fetch repository info"}), 502
+    except GitError as e:
+        current_app.logger.error(f"Trend update failed for {repo_owner}/{repo_name}: {e}")
+        return jsonify({"error": "Failed to compute code trends"}), 502
+
+    return jsonify({
+        "branch": branch,
+        "head": head,
+        "complete": complete,
+        "commits": table.size,
+        "series": table.series(points),
+    })
+
+# -------------------------------
+# Puzzle leaderboard
+# -------------------------------
+
+@api.route("/leaderboard", methods=["GET"])
+def get_leaderboard_page():
+    """
+    Returns one page of the puzzle leaderboard, best first.
+    Query parameters:
+      - page: 1-based page number (default 1)
+      - page_size: entries per page (default 50, at most 200)
+    Each entry has rank, user_id, solved_count, last_solve_time and
+    evan_adam_score; total is the number of ranked users. Ranks are
+    precomputed as submissions are recorded (see server/leaderboard.py).
+    """
+    page = request.args.get("page", 1, type=int)
+    page_size = request.args.get("page_size", DEFAULT_PAGE_SIZE, type=int)
+    return jsonify(get_leaderboard(page, page_size))
+
+# -------------------------------
+# Pull request summaries
+# -------------------------------
+
+@api.route("/pr/<repo_owner>/<repo_name>/<int:number>/summary", methods=["GET"])
+def get_pr_summary(repo_owner, repo_name, number):
+    """
+    Summarizes a pull request with the summarize_pr keys:
+      - key_changes, potential_impacts, improvement_suggestions
+    The diff is summarized in chunks of hunks and the results merged; chunks
+    that were already summarized are served from cache. Diffs too large to
+    summarize in one request get 413.
+    """
+    token = get_user_token()
+    try:
+        diff = get_pull_request_diff(repo_owner, repo_name, number, token)
+    except UpstreamUnavailable:
+        raise
+    except requests.exceptions.RequestException as e:
+        current_app.logger.error(f"Failed to fetch diff for {repo_owner}/{repo_name}#{number}: {e}")
+        return jsonify({"error": "Failed to fetch pull request diff"}), 502
+
+    try:
+        summary = summarize_diff(diff)
+    except DiffTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    if "error" in summary:
+        return jsonify(summary), 502
+    current_app.logger.info(
+        f"Summarized {repo_owner}/{repo_name}#{number}: "
+        f"{summary['chunks']} chunks, {summary['cached_chunks']} from cache"
+    )
+    return jsonify(summary)
+
+# -------------------------------
+# Background jobs
+# -------------------------------
+
+@api.route("/jobs", methods=["POST"])
+def submit_job():
+    """
+    Queues a long-running analysis to be run by a worker process.
+    Expects JSON with:
+      - kind: the job kind, one of "search_index", "git_contributors" or
+        "code_trends"; other kinds are queued by the server itself
+      - payload: the job's parameters, e.g. {"owner", "repo", "ref"?}
+    Returns the job, whose status can be polled at /api/jobs/<id>.
+    """
+    data = request.get_json(silent=True) or {}
+    kind = data.get("kind")
+    try:
+        payload = validate_submitted_payload(kind, data.get("payload") or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    job = enqueue(kind, payload, user_id=session["user"]["login"])
+    current_app.logger.info(f"Queued job {job.id} ({kind})")
+    return jsonify(job.to_dict()), 202
+
+@api.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Returns a job's status, progress and, once finished, its result or error."""
+    job = db.session.get(Job, job_id)
+    if job is None or job.user_id != session["user"]["login"]:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+# -------------------------------
+# LLM scheduling
+# -------------------------------
+
+@api.route("/llm/metrics", methods=["GET"])
+def get_llm_metrics():
+    """
+    Returns this process's LLM scheduler state: per-lane queue depth, running
+    calls, dispatch and rate-limit counts, tokens used and wait-time
+    percentiles, and under "triage" the files and tokens kept from the model
+    by pre-LLM triage.
+    """
+    return jsonify({**llm_scheduler.metrics(), "triage": triage_totals.to_dict()})
+
+
+@api.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    """
+    Returns this process's cache hit/miss counts and hit ratios, per namespace
+    for the in-memory tier and overall for the tier shared across workers,
+    plus the shared tier's size and evictions.
+    """
+    return jsonify(cache_stats())
@@ -0,0 +1,51 @@
+"""GitHub webhook endpoints."""
+
+import hashlib
+import hmac
+
+from apiflask import APIBlueprint
+from flask import current_app, jsonify, request
+
+from server.config import GITHUB_WEBHOOK_SECRET
+from server.prewarm import enqueue_prewarm_jobs
+import server.tasks  # noqa: F401  (registers job handlers)
+
+webhooks = APIBlueprint("webhooks", __name__, url_prefix="/api/webhooks", tag="Webhooks")
+
+
+def verify_signature(body: bytes, signature: str | None, secret: str) -> bool:
+    """Check a GitHub X-Hub-Signature-256 header against the request body."""
+    if not secret or not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256="):])
+
+
+@webhooks.post("/github")
+def github_webhook():
+    """Receive GitHub webhook deliveries.
+
+    Push events to a repository's default branch queue pre-computation of
+    file analyses, the tree snapshot and overview stats for the new head.
+    """
+    if not verify_signature(
+        request.get_data(), request.headers.get("X-Hub-Signature-256"), GITHUB_WEBHOOK_SECRET
+    ):
+        current_app.logger.warning("Rejected webhook delivery with invalid signature")
+        return jsonify({"error": "Invalid signature"}), 401
+
+    event = request.headers.get("X-GitHub-Event", "")
+    if event == "ping":
+        return jsonify({"status": "pong"})
+    if event != "push":
+        return jsonify({"status": "ignored", "reason": f"unhandled event {event}"}), 202
+
+    payload = request.get_json(silent=True) or {}
+    jobs, reason = enqueue_prewarm_jobs(payload)
+    repo = (payload.get("repository") or {}).get("full_name")
+    if not jobs:
+        current_app.logger.info(f"Not pre-warming push to {repo}: {reason}")
+        return jsonify({"status": "ignored", "reason": reason}), 202
+
+    current_app.logger.info(f"Queued {len(jobs)} pre-warm jobs for {repo}@{payload.get('after')}")
+    return jsonify({"status": "queued", "jobs": [job.id for job in jobs]}), 202
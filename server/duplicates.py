@@ -0,0 +1,225 @@
+"""Near-duplicate code detection with MinHash and locality-sensitive hashing.
+
+Files are split into units (functions for Python, fixed line windows for other
+languages). Each unit's token stream is normalized so that renamed identifiers
+and changed literals still match, shingled, and summarized by a MinHash
+signature. LSH banding then buckets similar signatures together, so only units
+that share a bucket are ever compared instead of every pair.
+"""
+
+import ast
+import keyword
+import os
+import re
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+
+SOURCE_EXTENSIONS = {
+    ".py", ".js", ".jsx", ".ts", ".tsx", ".java", ".go", ".rb", ".rs", ".c",
+    ".h", ".cc", ".cpp", ".hpp", ".cs", ".php", ".swift", ".kt", ".scala",
+}
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 8
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+DEFAULT_THRESHOLD = 0.8
+
+# Units shorter than this many tokens are too small to be worth reporting.
+MIN_UNIT_TOKENS = 40
+# Line windows used for files that aren't parsed into functions.
+WINDOW_LINES = 30
+WINDOW_STEP = 15
+# Buckets bigger than this are almost always boilerplate; cap their pairs.
+MAX_BUCKET_SIZE = 100
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(seed=20250215)
+_PERM_A = _rng.integers(1, 1 << 31, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 31, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+_HASH_COMMENT = r"\#[^\n]*"
+_C_COMMENT = r"//[^\n]*|/\*.*?\*/"
+# Languages whose only comments start with "#"; in them "//" is an operator.
+_HASH_ONLY_EXTENSIONS = {".py", ".rb"}
+# PHP accepts both comment styles.
+_HASH_COMMENT_EXTENSIONS = _HASH_ONLY_EXTENSIONS | {".php"}
+
+
+def _token_re(comment: str) -> re.Pattern:
+    return re.compile(
+        rf"""(?P<comment>{comment})"""
+        r"""|(?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)"""
+        r"""|(?P<number>\b\d[\w.]*)"""
+        r"""|(?P<word>[A-Za-z_$][\w$]*)"""
+        r"""|(?P<op>[^\s\w])""",
+        re.DOTALL,
+    )
+
+
+_HASH_TOKEN_RE = _token_re(_HASH_COMMENT)
+_MIXED_TOKEN_RE = _token_re(f"{_HASH_COMMENT}|{_C_COMMENT}")
+_C_TOKEN_RE = _token_re(_C_COMMENT)
+
+_KEYWORDS = set(keyword.kwlist) | {
+    "function", "var", "let", "const", "new", "this", "switch", "case",
+    "default", "do", "typeof", "instanceof", "public", "private", "protected",
+    "static", "void", "int", "long", "float", "double", "char", "bool",
+    "boolean", "struct", "enum", "interface", "extends", "implements", "func",
+    "fn", "impl", "match", "mut", "self", "package", "throw", "throws",
+    "catch", "then", "end", "begin", "goto", "null", "nil", "true", "false",
+}
+
+
+@dataclass
+class CodeUnit:
+    """A function or window of lines that is compared for duplication."""
+
+    path: str
+    name: str
+    start_line: int
+    end_line: int
+    signature: np.ndarray
+
+    def location(self) -> dict:
+        return {
+            "path": self.path,
+            "name": self.name,
+            "start_line": self.start_line,
+            "end_line": self.end_line,
+        }
+
+
+def _token_re_for(extension: str) -> re.Pattern:
+    if extension in _HASH_ONLY_EXTENSIONS:
+        return _HASH_TOKEN_RE
+    if extension in _HASH_COMMENT_EXTENSIONS:
+        return _MIXED_TOKEN_RE
+    return _C_TOKEN_RE
+
+
+def normalize_tokens(code: str, extension: str = ".py") -> list[str]:
+    """Tokenize code, dropping comments and abstracting identifiers and literals.
+
+    The comment syntax is chosen by file extension, so Python's ``//`` floor
+    division is kept while C-style ``//`` comments are dropped.
+    """
+    tokens = []
+    for match in _token_re_for(extension).finditer(code):
+        kind = match.lastgroup
+        if kind == "comment":
+            continue
+        if kind == "string":
+            tokens.append("STR")
+        elif kind == "number":
+            tokens.append("NUM")
+        elif kind == "word":
+            word = match.group()
+            tokens.append(word if word in _KEYWORDS else "ID")
+        else:
+            tokens.append(match.group())
+    return tokens
+
+
+def minhash_signature(tokens: list[str]) -> np.ndarray | None:
+    """MinHash signature of a token stream's shingles, or None if too short."""
+    if len(tokens) < max(MIN_UNIT_TOKENS, SHINGLE_SIZE):
+        return None
+    shingles = {
+        zlib.crc32(" ".join(tokens[i:i + SHINGLE_SIZE]).encode())
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    }
+    hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return permuted.min(axis=1)
+
+
+def _python_units(source: str) -> list[tuple[str, int, int, str]] | None:
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    lines = source.splitlines()
+    units = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            end = node.end_lineno or node.lineno
+            units.append((node.name, node.lineno, end, "\n".join(lines[node.lineno - 1:end])))
+    return units
+
+
+def _window_units(source: str) -> list[tuple[str, int, int, str]]:
+    lines = source.splitlines()
+    units = []
+    for start in range(0, max(1, len(lines) - WINDOW_STEP), WINDOW_STEP):
+        end = min(start + WINDOW_LINES, len(lines))
+        units.append((f"lines {start + 1}-{end}", start + 1, end, "\n".join(lines[start:end])))
+    return units
+
+
+class DuplicateDetector:
+    """Collects code units from many files and reports near-duplicate pairs."""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.units: list[CodeUnit] = []
+
+    def add_file(self, path: str, source: str):
+        """Split a file into units and compute their signatures."""
+        extension = os.path.splitext(path)[1].lower()
+        units = _python_units(source) if extension == ".py" else None
+        if units is None:
+            units = _window_units(source)
+        for name, start, end, code in units:
+            signature = minhash_signature(normalize_tokens(code, extension))
+            if signature is not None:
+                self.units.append(CodeUnit(path, name, start, end, signature))
+
+    def _overlaps(self, a: CodeUnit, b: CodeUnit) -> bool:
+        # Nested functions and overlapping windows in one file match themselves.
+        return a.path == b.path and a.start_line <= b.end_line and b.start_line <= a.end_line
+
+    def find(self) -> list[dict]:
+        """Return near-duplicate unit pairs, most similar first."""
+        if len(self.units) < 2:
+            return []
+
+        signatures = np.stack([unit.signature for unit in self.units])
+        candidates: set[tuple[int, int]] = set()
+        for band in range(LSH_BANDS):
+            buckets: dict[bytes, list[int]] = {}
+            rows = signatures[:, band * LSH_ROWS:(band + 1) * LSH_ROWS]
+            for i, row in enumerate(rows):
+                buckets.setdefault(row.tobytes(), []).append(i)
+            for members in buckets.values():
+                members = members[:MAX_BUCKET_SIZE]
+                for x in range(len(members)):
+                    for y in range(x + 1, len(members)):
+                        candidates.add((members[x], members[y]))
+
+        pairs = []
+        for i, j in candidates:
+            a, b = self.units[i], self.units[j]
+            if self._overlaps(a, b):
+                continue
+            similarity = float(np.mean(a.signature == b.signature))
+            if similarity >= self.threshold:
+                pairs.append({
+                    "similarity": round(similarity, 3),
+                    "first": a.location(),
+                    "second": b.location(),
+                })
+        pairs.sort(key=lambda pair: pair["similarity"], reverse=True)
+        return pairs
+
+
+def describe_duplicate(pair: dict) -> str:
+    """Human-readable issue text for a duplicate pair."""
+    first, second = pair["first"], pair["second"]
+    return (
+        f"Near-duplicate code ({pair['similarity']:.0%} similar): "
+        f"{first['path']}:{first['start_line']}-{first['end_line']} ({first['name']}) and "
+        f"{second['path']}:{second['start_line']}-{second['end_line']} ({second['name']})"
+    )
@@ -0,0 +1,344 @@
+"""Local bare mirrors of GitHub repositories, and stats computed from them.
+
+GitHub's /stats/contributors is slow, answers 202 until it has computed the
+stats, and stops at 100 contributors. Instead, a bare mirror clone of the
+repository is kept under DATA_DIR/mirrors and updated with an incremental
+fetch. Per-author stats are computed by streaming `git log --numstat`.
+
+Results are cached per HEAD SHA and use the same shape as the contributors
+endpoint. Any git URL works, including a local path, so a local repository can
+be used to check the results:
+
+    python3 -m server.git_mirror /path/to/repo
+"""
+
+import base64
+import fcntl
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+from urllib.parse import quote
+
+from server.config import DATA_DIR
+from server.github import check_repo_access
+from server.resilience import call_timeout
+from server.result_store import get_result, put_result
+
+GIT_CONTRIBUTORS_KIND = "git_contributors"
+# Bump when the shape of contributor stats changes, so cached ones are recomputed.
+CONTRIBUTOR_STATS_VERSION = 2
+# A mirror fetched less than this many seconds ago is used as is.
+MIRROR_REFRESH_SECONDS = 60
+# Upper bound on a single clone, fetch or log; requests are bounded by their
+# deadline as well.
+GIT_TIMEOUT_SECONDS = 300
+
+_SECONDS_PER_DAY = 86400
+_COMMIT_MARKER = "\x1e"
+_NOREPLY_RE = re.compile(r"^(?:\d+\+)?([A-Za-z0-9-]+)@users\.noreply\.github\.com$")
+
+
+class GitError(Exception):
+    """A git command failed."""
+
+
+def _git_env(token: str | None) -> dict:
+    env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+    if token:
+        # Passed through the environment so the token is neither written to
+        # the mirror's config nor visible in the process list.
+        credentials = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+        env.update(
+            GIT_CONFIG_COUNT="1",
+            GIT_CONFIG_KEY_0="http.extraHeader",
+            GIT_CONFIG_VALUE_0=f"Authorization: Basic {credentials}",
+        )
+    return env
+
+
+def run_git(path: str | None, *args: str, token: str | None = None) -> str:
+    """Run a git command (in the repository at path, if given) and return stdout."""
+    command = ["git", *(["-C", path] if path else []), *args]
+    try:
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            text=True,
+            env=_git_env(token),
+            timeout=call_timeout(GIT_TIMEOUT_SECONDS),
+        )
+    except subprocess.TimeoutExpired as e:
+        raise GitError(f"git {args[0]} timed out") from e
+    if result.returncode != 0:
+        raise GitError(f"git {args[0]} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def stream_git(path: str, *args: str) -> Iterator[str]:
+    """Run a git command in the repository at path, yielding stdout lines.
+
+    The command is killed if it outlives the timeout or the caller stops
+    iterating early.
+    """
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            ["git", "-C", path, *args],
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            env=_git_env(None),
+        )
+        killer = threading.Timer(call_timeout(GIT_TIMEOUT_SECONDS), process.kill)
+        killer.start()
+        try:
+            for line in process.stdout:
+                yield line.rstrip("\n")
+            process.wait()
+        finally:
+            killer.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+        if process.returncode != 0:
+            stderr.seek(0)
+            message = stderr.read().decode(errors="replace").strip() or "killed (timeout)"
+            raise GitError(f"git {args[0]} failed: {message}")
+
+
+class BlobReader:
+    """Reads blobs from a repository through one `git cat-file --batch` process.
+
+    Use as a context manager so the process is stopped when done.
+    """
+
+    def __init__(self, path: str):
+        self._process = subprocess.Popen(
+            ["git", "-C", path, "cat-file", "--batch"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=_git_env(None),
+        )
+
+    def read(self, sha: str) -> bytes:
+        self._process.stdin.write(f"{sha}\n".encode())
+        self._process.stdin.flush()
+        header = self._process.stdout.readline().split()
+        if len(header) != 3:
+            raise GitError(f"git cat-file: {sha} not found")
+        data = self._process.stdout.read(int(header[2]))
+        self._process.stdout.read(1)  # trailing newline
+        return data
+
+    def close(self):
+        # cat-file exits at the end of its input.
+        self._process.stdin.close()
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self._process.stdout.close()
+
+    def __enter__(self) -> "BlobReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def mirror_path(repo_owner: str, repo_name: str) -> str:
+    return os.path.join(DATA_DIR, "mirrors", f"{repo_owner}__{repo_name}.git")
+
+
+def has_mirror(repo_owner: str, repo_name: str) -> bool:
+    return os.path.isdir(mirror_path(repo_owner, repo_name))
+
+
+def github_remote(repo_owner: str, repo_name: str) -> str:
+    return f"https://github.com/{repo_owner}/{repo_name}.git"
+
+
+@contextmanager
+def path_lock(path: str):
+    """Serialize work on path (a mirror, say) across threads and processes."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Branches and tags only; see update_mirror.
+_FETCH_REFSPECS = ("+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*")
+
+
+def update_mirror(
+    url: str,
+    path: str,
+    token: str | None = None,
+    max_age: float = MIRROR_REFRESH_SECONDS,
+) -> str:
+    """Clone or fetch the mirror of url at path; return the SHA of its HEAD.
+
+    An existing mirror is fetched only if its last fetch is older than
+    max_age seconds.
+    """
+    stamp = os.path.join(path, "last-fetch")
+    with path_lock(path):
+        if not os.path.isdir(path):
+            # Clone next to the final location and move it into place, so an
+            # interrupted clone never leaves a half-written mirror behind.
+            staging = tempfile.mkdtemp(prefix=".clone-", dir=os.path.dirname(path))
+            try:
+                # Bare rather than --mirror: a mirror also copies GitHub's
+                # refs/pull/*, one or more refs per pull request ever opened.
+                run_git(None, "clone", "--bare", "--quiet", url, staging, token=token)
+                os.rename(staging, path)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        elif not os.path.exists(stamp) or time.time() - os.path.getmtime(stamp) >= max_age:
+            run_git(path, "fetch", "--prune", "--quiet", "origin", *_FETCH_REFSPECS, token=token)
+        else:
+            return run_git(path, "rev-parse", "HEAD").strip()
+        with open(stamp, "w"):
+            pass
+    return run_git(path, "rev-parse", "HEAD").strip()
+
+
+def iter_commit_numstat(
+    path: str, rev: str = "HEAD"
+) -> Iterator[tuple[str, str, str, int, int, int]]:
+    """Yield (sha, author name, author email, timestamp, additions, deletions) per commit.
+
+    Author names and emails go through .mailmap. Merge commits are skipped,
+    as in GitHub's contributor stats, and binary files count as zero lines.
+    """
+    current = None
+    additions = deletions = 0
+    log_format = f"--format={_COMMIT_MARKER}%H%x1f%aN%x1f%aE%x1f%at"
+    for line in stream_git(path, "log", "--no-merges", "--numstat", log_format, rev):
+        if line.startswith(_COMMIT_MARKER):
+            if current is not None:
+                yield (*current, additions, deletions)
+            sha, name, email, timestamp = line[1:].split("\x1f")
+            current = (sha, name, email, int(timestamp))
+            additions = deletions = 0
+        elif line:
+            added, deleted, _ = line.split("\t", 2)
+            if added != "-":
+                additions += int(added)
+                deletions += int(deleted)
+    if current is not None:
+        yield (*current, additions, deletions)
+
+
+def _github_login(email: str) -> str | None:
+    match = _NOREPLY_RE.match(email)
+    return match.group(1) if match else None
+
+
+def contributor_stats(path: str, rev: str = "HEAD") -> list[dict]:
+    """Per-author stats for the history of rev, most commits first.
+
+    Each entry has the keys of the contributors endpoint: login, avatar_url,
+    contributions, total_commits/additions/deletions and a weekly
+    commit_history (weeks start on Sunday, like GitHub's stats; weeks without
+    commits are left out), plus the git author name and email. login is only
+    known for GitHub noreply emails and is None otherwise.
+    """
+    authors: dict[str, dict] = {}
+    for _, name, email, timestamp, additions, deletions in iter_commit_numstat(path, rev):
+        key = email.lower() or name
+        author = authors.get(key)
+        if author is None:
+            author = authors[key] = {"name": name, "email": email, "weeks": {}}
+        day = timestamp // _SECONDS_PER_DAY
+        week = ((day + 4) // 7 * 7 - 4) * _SECONDS_PER_DAY
+        counts = author["weeks"].setdefault(week, [0, 0, 0])
+        counts[0] += 1
+        counts[1] += additions
+        counts[2] += deletions
+
+    contributors = []
+    for author in authors.values():
+        weeks = sorted(author["weeks"].items())
+        total_commits = sum(c for _, (c, _, _) in weeks)
+        login = _github_login(author["email"])
+        contributors.append({
+            "login": login,
+            "name": author["name"],
+            "email": author["email"],
+            "avatar_url": (
+                f"https://avatars.githubusercontent.com/{login}" if login
+                else f"https://avatars.githubusercontent.com/u/e?email={quote(author['email'])}"
+            ),
+            "contributions": total_commits,
+            "total_commits": total_commits,
+            "total_additions": sum(a for _, (_, a, _) in weeks),
+            "total_deletions": sum(d for _, (_, _, d) in weeks),
+            "commit_history": [
+                {
+                    "date": datetime.fromtimestamp(week).isoformat(),
+                    "commits": commits,
+                    "additions": additions,
+                    "deletions": deletions,
+                }
+                for week, (commits, additions, deletions) in weeks
+            ],
+        })
+    contributors.sort(key=lambda c: (-c["total_commits"], (c["login"] or c["name"]).lower()))
+    return contributors
+
+
+def get_contributor_stats(repo_owner: str, repo_name: str, token: str) -> list[dict]:
+    """Contributor stats for a GitHub repository's default branch, via its mirror.
+
+    Mirrors and results are shared between users, so token's access to the
+    repository is checked first (see github.check_repo_access). Cached per
+    HEAD SHA; must run inside an app context.
+    """
+    check_repo_access(repo_owner, repo_name, token)
+    path = mirror_path(repo_owner, repo_name)
+    head = update_mirror(github_remote(repo_owner, repo_name), path, token)
+    key = f"v{CONTRIBUTOR_STATS_VERSION}:{repo_owner}/{repo_name}@{head}"
+    stats = get_result(GIT_CONTRIBUTORS_KIND, key)
+    if stats is None:
+        stats = contributor_stats(path, head)
+        put_result(GIT_CONTRIBUTORS_KIND, key, stats)
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+
+    source = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "mirror.git")
+        start = time.perf_counter()
+        head = update_mirror(source, path)
+        cloned = time.perf_counter()
+        stats = contributor_stats(path, head)
+        done = time.perf_counter()
+        print(f"HEAD {head}: mirrored in {cloned - start:.2f}s, stats in {done - cloned:.2f}s")
+        for contributor in stats[:20]:
+            print(
+                f"{contributor['total_commits']:6d} commits  +{contributor['total_additions']:<8d}"
+                f" -{contributor['total_deletions']:<8d} {contributor['login'] or contributor['name']} <{contributor['email']}>"
+            )
+        # Cross-check the totals against git itself.
+        expected = int(run_git(path, "rev-list", "--count", "--no-merges", head))
+        counted = sum(c["total_commits"] for c in stats)
+        print(f"{counted} commits counted; git rev-list reports {expected}")
@@ -0,0 +1,256 @@
+"""Helpers for calling the GitHub REST and GraphQL APIs.
+
+Functions raise requests.exceptions.RequestException on failure; callers decide
+how to surface the error. All calls are bounded by the request deadline and go
+through the GitHub circuit breaker.
+"""
+
+import hashlib
+import re
+
+import requests
+
+from server.cache import get_cache
+from server.config import (
+    GITHUB_GRAPHQL_URL,
+    GITHUB_HEDGE_AFTER_SECONDS,
+    GITHUB_TIMEOUT_SECONDS,
+)
+from server.resilience import CircuitBreaker, DeadlineExceeded, bounded_call, hedged
+
+GITHUB_API_URL = "https://api.github.com"
+
+github_breaker = CircuitBreaker("GitHub")
+
+# Trees and blobs named by SHA never change, so they're cached for a day; a
+# tree at a branch name or HEAD only briefly.
+IMMUTABLE_TTL_SECONDS = 24 * 3600
+REF_TREE_TTL_SECONDS = 30
+_SHA_RE = re.compile(r"^[0-9a-f]{40}$")
+# How long a token's successful access check for a repository is reused.
+REPO_ACCESS_TTL_SECONDS = 300
+
+_trees = get_cache("github_trees", ttl=IMMUTABLE_TTL_SECONDS)
+_blobs = get_cache("github_blobs", ttl=IMMUTABLE_TTL_SECONDS)
+_comparisons = get_cache("github_comparisons", ttl=IMMUTABLE_TTL_SECONDS)
+_repo_access = get_cache("github_repo_access", ttl=REPO_ACCESS_TTL_SECONDS)
+
+
+class GraphQLError(requests.exceptions.RequestException):
+    """A GraphQL query returned errors and no data."""
+
+
+def github_headers(token: str, accept: str = "application/vnd.github.v3+json") -> dict:
+    """Build request headers for an authenticated GitHub API call."""
+    return {
+        "Accept": accept,
+        "Authorization": f"token {token}",
+    }
+
+
+def token_fingerprint(token: str) -> str:
+    """A short identifier of a token that doesn't reveal it, for cache keys."""
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def _cache_key(token: str, *parts: str) -> str:
+    # Scoped to the token, so a cached private repository is only served to
+    # callers who could fetch it themselves.
+    return "/".join((token_fingerprint(token), *parts))
+
+
+def _is_upstream_failure(response: requests.Response) -> bool:
+    # 4xx responses (bad ref, missing file, no access) say nothing about
+    # GitHub's health, and a 429 is one token's rate limit, not everyone's.
+    return response.status_code >= 500
+
+
+def github_get(
+    url: str,
+    headers: dict,
+    params: dict | None = None,
+    hedge: bool = True,
+) -> requests.Response:
+    """GET a GitHub URL within the current request deadline.
+
+    The response is returned whatever its status; raise_for_status is up to the
+    caller. When GITHUB_HEDGE_AFTER_SECONDS is set and hedge is true, a second
+    request is sent if the first is slow.
+    """
+
+    def send() -> requests.Response:
+        return bounded_call(
+            lambda timeout: requests.get(url, headers=headers, params=params, timeout=timeout),
+            GITHUB_TIMEOUT_SECONDS,
+            (requests.exceptions.Timeout,),
+        )
+
+    def attempt() -> requests.Response:
+        if hedge and GITHUB_HEDGE_AFTER_SECONDS is not None:
+            return hedged(send, GITHUB_HEDGE_AFTER_SECONDS)
+        return send()
+
+    return github_breaker.call(
+        attempt, is_failure=_is_upstream_failure, ignore=(DeadlineExceeded,)
+    )
+
+
+def github_graphql(query: str, variables: dict, token: str) -> dict:
+    """Run a GraphQL query and return the full response body.
+
+    The body is {"data": ..., "errors": [...]}. Errors for individual fields
+    (e.g. a repository that doesn't exist) come back alongside the rest of the
+    data and are left to the caller; GraphQLError is raised only when there
+    is no data at all.
+    """
+
+    def send() -> requests.Response:
+        return bounded_call(
+            lambda timeout: requests.post(
+                GITHUB_GRAPHQL_URL,
+                headers={"Authorization": f"bearer {token}"},
+                json={"query": query, "variables": variables},
+                timeout=timeout,
+            ),
+            GITHUB_TIMEOUT_SECONDS,
+            (requests.exceptions.Timeout,),
+        )
+
+    response = github_breaker.call(
+        send, is_failure=_is_upstream_failure, ignore=(DeadlineExceeded,)
+    )
+    response.raise_for_status()
+    body = response.json()
+    if body.get("data") is None:
+        messages = "; ".join(error.get("message", "") for error in body.get("errors", []))
+        raise GraphQLError(messages or "GraphQL query returned no data")
+    return body
+
+
+def check_repo_access(repo_owner: str, repo_name: str, token: str) -> dict:
+    """The repository's REST metadata, if token can read the repository.
+
+    Raises requests.exceptions.HTTPError (404 for a private repository the
+    token can't see) otherwise. Data computed once and shared between users,
+    such as mirrors and search indexes, is only served after this check.
+    Successful checks are cached per token for REPO_ACCESS_TTL_SECONDS.
+    """
+
+    def fetch() -> dict:
+        url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}"
+        response = github_get(url, github_headers(token))
+        response.raise_for_status()
+        return response.json()
+
+    return _repo_access.get_or_set(_cache_key(token, repo_owner, repo_name), fetch)
+
+
+def get_tree(repo_owner: str, repo_name: str, token: str, ref: str = "HEAD") -> dict:
+    """Fetch the full recursive tree of a repository at a ref.
+
+    Returns the GitHub tree object: {"sha": ..., "tree": [...], "truncated": ...}.
+    Each tree entry has "path", "type" ("blob" or "tree"), "sha" and, for blobs,
+    "size". Results are cached (see server/cache.py) and must not be modified.
+    """
+
+    def fetch() -> dict:
+        url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/git/trees/{ref}"
+        response = github_get(url, github_headers(token), params={"recursive": 1})
+        response.raise_for_status()
+        return response.json()
+
+    ttl = IMMUTABLE_TTL_SECONDS if _SHA_RE.match(ref) else REF_TREE_TTL_SECONDS
+    return _trees.get_or_set(_cache_key(token, repo_owner, repo_name, ref), fetch, ttl)
+
+
+def get_blob(repo_owner: str, repo_name: str, sha: str, token: str) -> bytes:
+    """Fetch the raw bytes of a blob by its SHA; cached like get_tree."""
+
+    def fetch() -> bytes:
+        url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/git/blobs/{sha}"
+        response = github_get(url, github_headers(token, accept="application/vnd.github.raw"))
+        response.raise_for_status()
+        return response.content
+
+    return _blobs.get_or_set(_cache_key(token, repo_owner, repo_name, sha), fetch)
+
+
+def get_file_content(
+    repo_owner: str, repo_name: str, path: str, token: str, ref: str | None = None
+) -> bytes:
+    """Fetch the raw content of a file, optionally at a specific ref."""
+    url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/contents/{path}"
+    response = github_get(
+        url,
+        github_headers(token, accept="application/vnd.github.v3.raw"),
+        params={"ref": ref} if ref else None,
+    )
+    response.raise_for_status()
+    return response.content
+
+
+def get_pull_request_diff(repo_owner: str, repo_name: str, number: int, token: str) -> str:
+    """Fetch the unified diff of a pull request."""
+    url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/pulls/{number}"
+    response = github_get(url, github_headers(token, accept="application/vnd.github.v3.diff"))
+    response.raise_for_status()
+    return response.text
+
+
+def compare_commits(repo_owner: str, repo_name: str, base: str, head: str, token: str) -> dict:
+    """Fetch the comparison of two refs, with the files changed between them.
+
+    Files are diffed against the merge base ("merge_base_commit"), like a pull
+    request, and GitHub lists at most 300 of them. Only the first commit of
+    the range is included ("total_commits" has the count). Comparisons of two
+    SHAs are cached.
+    """
+
+    def fetch() -> dict:
+        url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/compare/{base}...{head}"
+        # Asking for a page of one commit keeps the response small; the file
+        # list always covers the whole comparison.
+        response = github_get(url, github_headers(token), params={"per_page": 1})
+        response.raise_for_status()
+        return response.json()
+
+    if not (_SHA_RE.match(base) and _SHA_RE.match(head)):
+        return fetch()
+    return _comparisons.get_or_set(_cache_key(token, repo_owner, repo_name, f"{base}...{head}"), fetch)
+
+
+def list_commits(
+    repo_owner: str,
+    repo_name: str,
+    token: str,
+    since: str | None = None,
+    until: str | None = None,
+    page: int = 1,
+    per_page: int = 100,
+) -> list[dict]:
+    """Fetch one page of commits on the default branch, newest first.
+
+    since and until are ISO 8601 timestamps bounding the commit date.
+    """
+    url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/commits"
+    params: dict = {"page": page, "per_page": per_page}
+    if since:
+        params["since"] = since
+    if until:
+        params["until"] = until
+    response = github_get(url, github_headers(token), params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_code_frequency(repo_owner: str, repo_name: str, token: str) -> list[list[int]] | None:
+    """Fetch weekly [week_start, additions, deletions] rows for a repository.
+
+    Returns None while GitHub is still computing the statistics (HTTP 202).
+    """
+    url = f"{GITHUB_API_URL}/repos/{repo_owner}/{repo_name}/stats/code_frequency"
+    response = github_get(url, github_headers(token))
+    if response.status_code == 202:
+        return None
+    response.raise_for_status()
+    return response.json() or []
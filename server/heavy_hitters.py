@@ -0,0 +1,178 @@
+"""Bounded-memory counting of the most frequent issues in a large analysis.
+
+Folder analyses report issue and suggestion strings for every file. Instead of
+keeping all of them, IssueAggregator normalizes each string, so near-identical
+phrasings ("Function 'foo' is too long (line 12)" and "function 'bar' is too
+long") count as one issue, and tracks the most frequent ones with the
+Space-Saving algorithm. Memory is fixed by the capacity, however many files
+are analyzed. An optional Count-Min sketch tightens the counts of issues that
+were evicted and re-admitted.
+"""
+
+import hashlib
+import heapq
+import itertools
+import re
+
+# Distinct issues tracked at once. Any issue more frequent than
+# total / DEFAULT_CAPACITY is guaranteed to be tracked.
+DEFAULT_CAPACITY = 1000
+# Example file paths kept per issue.
+MAX_EXAMPLES = 3
+# Longest representative text kept per issue.
+MAX_TEXT_LENGTH = 300
+
+_LINE_REF_RE = re.compile(
+    r"\b(?:on |at |in )?(?:lines?|l)\s*\d+(?:\s*(?:-|–|to|and)\s*\d+)?", re.IGNORECASE
+)
+_QUOTED_RE = re.compile(r"`[^`]*`|'[^']*'|\"[^\"]*\"")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_NON_WORD_RE = re.compile(r"[^a-z0-9#<>]+")
+_STOPWORDS = frozenset({"a", "an", "the", "this", "that", "these", "those", "is", "are", "be"})
+
+
+def normalize_issue(text: str) -> str:
+    """Reduce an issue string to a key shared by rephrasings of the same issue.
+
+    Line references are dropped, quoted names and numbers are replaced with
+    placeholders, and case, punctuation and filler words are ignored.
+    """
+    text = _LINE_REF_RE.sub(" ", text)
+    text = _QUOTED_RE.sub(" <name> ", text)
+    text = _NUMBER_RE.sub("#", text.lower())
+    words = [word for word in _NON_WORD_RE.split(text) if word and word not in _STOPWORDS]
+    return " ".join(words)
+
+
+class CountMinSketch:
+    """Approximate counts in fixed memory; estimates never undercount.
+
+    With width w and depth d, an estimate exceeds the true count by more than
+    2 * total / w with probability at most 2 ** -d.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        # Plain lists: per-item NumPy indexing costs more than the update itself.
+        self.table = [[0] * width for _ in range(depth)]
+
+    def _columns(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=4 * self.depth).digest()
+        return [
+            int.from_bytes(digest[4 * i:4 * i + 4], "little") % self.width
+            for i in range(self.depth)
+        ]
+
+    def add(self, key: str, count: int = 1) -> int:
+        """Add count to key and return its new estimate."""
+        estimate = None
+        for row, column in zip(self.table, self._columns(key)):
+            row[column] += count
+            estimate = row[column] if estimate is None else min(estimate, row[column])
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[column] for row, column in zip(self.table, self._columns(key)))
+
+
+class SpaceSaving:
+    """Top-k frequent keys over a stream, tracking at most capacity keys.
+
+    Each tracked key has a count and an error bound: its true count is between
+    count - error and count. When a new key arrives and all slots are taken,
+    the key with the smallest count is replaced and the newcomer inherits that
+    count as its error.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        # key -> [count, error]
+        self.counters: dict[str, list[int]] = {}
+        # Lazily updated min-heap of (count, tiebreak, key); stale entries are
+        # skipped when popping.
+        self._heap: list[tuple[int, int, str]] = []
+        self._tiebreak = itertools.count()
+
+    def add(self, key: str, count: int = 1) -> str | None:
+        """Count key; returns the key evicted to make room for it, if any."""
+        evicted = None
+        counter = self.counters.get(key)
+        if counter is None:
+            if len(self.counters) < self.capacity:
+                counter = self.counters[key] = [0, 0]
+            else:
+                evicted, floor = self._pop_min()
+                counter = self.counters[key] = [floor, floor]
+        counter[0] += count
+        heapq.heappush(self._heap, (counter[0], next(self._tiebreak), key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, next(self._tiebreak), k) for k, (c, _) in self.counters.items()]
+            heapq.heapify(self._heap)
+        return evicted
+
+    def _pop_min(self) -> tuple[str, int]:
+        while True:
+            count, _, key = heapq.heappop(self._heap)
+            counter = self.counters.get(key)
+            if counter is not None and counter[0] == count:
+                del self.counters[key]
+                return key, count
+
+    def top(self, k: int) -> list[tuple[str, int, int]]:
+        """The k keys with the highest counts, as (key, count, error)."""
+        return heapq.nlargest(
+            k, ((key, c, e) for key, (c, e) in self.counters.items()), key=lambda item: item[1]
+        )
+
+
+class IssueAggregator:
+    """Counts issue strings from many files in bounded memory."""
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        max_examples: int = MAX_EXAMPLES,
+        count_min: bool = True,
+    ):
+        self.max_examples = max_examples
+        self.total = 0
+        self._space_saving = SpaceSaving(capacity)
+        self._sketch = CountMinSketch() if count_min else None
+        # Per tracked key: representative text and example paths.
+        self._details: dict[str, tuple[str, list[str]]] = {}
+
+    def add(self, text: str, path: str | None = None):
+        key = normalize_issue(text)
+        if not key:
+            return
+        self.total += 1
+        if self._sketch is not None:
+            self._sketch.add(key)
+        evicted = self._space_saving.add(key)
+        if evicted is not None:
+            self._details.pop(evicted, None)
+        _, examples = self._details.setdefault(key, (text[:MAX_TEXT_LENGTH], []))
+        if path is not None and path not in examples and len(examples) < self.max_examples:
+            examples.append(path)
+
+    def top(self, k: int) -> list[dict]:
+        """The k most frequent issues, most frequent first.
+
+        count is an upper bound on the true count, and max_overcount the most
+        it can exceed it by.
+        """
+        results = []
+        for key, count, error in self._space_saving.top(k):
+            floor = count - error
+            if self._sketch is not None:
+                count = min(count, self._sketch.estimate(key))
+            text, examples = self._details[key]
+            results.append({
+                "text": text,
+                "count": count,
+                "max_overcount": count - floor,
+                "files": list(examples),
+            })
+        results.sort(key=lambda item: -item["count"])
+        return results
@@ -0,0 +1,243 @@
+"""Durable Postgres-backed job queue.
+
+Handlers are registered per job kind with @job_handler. The web app enqueues
+jobs; worker processes (see worker.py) claim them with
+SELECT ... FOR UPDATE SKIP LOCKED, run them and store the result. Failed jobs are
+retried with exponential backoff, and jobs whose worker stopped heart-beating
+are reclaimed by other workers; a job whose worker stops on its last attempt
+is marked failed instead.
+"""
+
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from sqlalchemy import and_, or_, select, update
+
+from server.db import db
+from server.llm_scheduler import BULK, llm_context
+from server.models.Job import Job
+
+# Retry delay is RETRY_BASE_SECONDS * 2 ** (attempt - 1), plus jitter.
+RETRY_BASE_SECONDS = 10
+# A running job that hasn't reported progress for this long is assumed to
+# belong to a dead worker and may be claimed again.
+JOB_LEASE = timedelta(minutes=10)
+# Running jobs are heart-beated this often, whether or not they report progress.
+HEARTBEAT_INTERVAL = JOB_LEASE / 5
+
+ProgressCallback = Callable[[float, str], None]
+JobHandler = Callable[[Job, ProgressCallback], Any]
+PayloadValidator = Callable[[dict], dict]
+
+_handlers: dict[str, JobHandler] = {}
+_payload_validators: dict[str, PayloadValidator] = {}
+
+
+def job_handler(kind: str, validate_payload: PayloadValidator | None = None):
+    """Register a function as the handler for a job kind.
+
+    The handler receives the Job (use job.payload and job.user_id) and a
+    progress callback taking a fraction in [0, 1] and a message. Its return
+    value must be JSON serializable and is stored as the job result.
+
+    Only kinds registered with validate_payload may be submitted by users
+    (POST /api/jobs); it returns the cleaned payload or raises ValueError.
+    Other kinds are enqueued by server code only.
+    """
+
+    def decorator(fn: JobHandler) -> JobHandler:
+        _handlers[kind] = fn
+        if validate_payload is not None:
+            _payload_validators[kind] = validate_payload
+        return fn
+
+    return decorator
+
+
+def registered_kinds() -> list[str]:
+    return sorted(_handlers)
+
+
+def submittable_kinds() -> list[str]:
+    """Job kinds users may submit directly."""
+    return sorted(_payload_validators)
+
+
+def validate_submitted_payload(kind: str, payload: Any) -> dict:
+    """Check a user-submitted job; raises ValueError for internal kinds or bad payloads."""
+    validate = _payload_validators.get(kind)
+    if validate is None:
+        raise ValueError(f"Unknown job kind. Expected one of {submittable_kinds()}")
+    if not isinstance(payload, dict):
+        raise ValueError("payload must be an object")
+    return validate(payload)
+
+
+def enqueue(
+    kind: str, payload: dict, user_id: str | None = None, max_attempts: int = 3
+) -> Job:
+    """Add a job to the queue and commit."""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = Job(kind=kind, payload=payload, user_id=user_id, max_attempts=max_attempts)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def enqueue_once(kind: str, payload: dict, user_id: str | None = None) -> Job:
+    """Like enqueue, but returns the user's identical queued or running job if there is one."""
+    active = db.session.execute(
+        select(Job).where(
+            Job.kind == kind, Job.user_id == user_id, Job.status.in_(("queued", "running"))
+        )
+    ).scalars()
+    for job in active:
+        if job.payload == payload:
+            return job
+    return enqueue(kind, payload, user_id=user_id)
+
+
+def claim_next_job(worker_id: str) -> Job | None:
+    """Atomically claim the oldest runnable job, or return None."""
+    while True:
+        now = datetime.now()
+        job = db.session.execute(
+            select(Job)
+            .where(
+                or_(
+                    and_(Job.status == "queued", Job.run_after <= now),
+                    and_(Job.status == "running", Job.updated_at < now - JOB_LEASE),
+                )
+            )
+            .order_by(Job.run_after)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if job is None:
+            db.session.commit()
+            return None
+        if job.status == "queued" or job.attempts < job.max_attempts:
+            break
+        # Its worker died on the last attempt, perhaps because of the job.
+        job.status = "failed"
+        job.error = f"Worker {job.locked_by} stopped responding on attempt {job.attempts}"
+        job.locked_by = None
+        job.updated_at = now
+        db.session.commit()
+
+    job.status = "running"
+    job.locked_by = worker_id
+    job.attempts += 1
+    job.updated_at = now
+    db.session.commit()
+    return job
+
+
+@contextmanager
+def _heartbeat(job: Job):
+    """Keep a running job's lease fresh from a background thread.
+
+    Handlers that never report progress would otherwise lose their lease
+    after JOB_LEASE and be run a second time by another worker. The thread
+    uses its own connection and stops extending the lease if the job was
+    reclaimed.
+    """
+    engine = db.engine
+    job_id, worker_id = job.id, job.locked_by
+    stopped = threading.Event()
+
+    def beat():
+        while not stopped.wait(HEARTBEAT_INTERVAL.total_seconds()):
+            try:
+                with engine.begin() as connection:
+                    connection.execute(
+                        update(Job)
+                        .where(Job.id == job_id, Job.locked_by == worker_id, Job.status == "running")
+                        .values(updated_at=datetime.now())
+                    )
+            except Exception:
+                logging.exception(f"Heartbeat for job {job_id} failed")
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_job(job: Job):
+    """Run a claimed job and record its outcome."""
+
+    def report_progress(fraction: float, message: str = ""):
+        job.progress = max(0.0, min(1.0, fraction))
+        job.progress_message = message
+        job.updated_at = datetime.now()
+        db.session.commit()
+
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job kind {job.kind}")
+        # Background work yields to interactive LLM calls.
+        with llm_context(job.user_id, BULK), _heartbeat(job):
+            result = handler(job, report_progress)
+    except Exception as e:
+        logging.exception(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}")
+        db.session.rollback()
+        job.error = f"{type(e).__name__}: {e}"
+        job.locked_by = None
+        job.updated_at = datetime.now()
+        if job.attempts < job.max_attempts and handler is not None:
+            delay = RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+            job.status = "queued"
+            job.run_after = datetime.now() + timedelta(seconds=delay * random.uniform(1, 1.5))
+        else:
+            job.status = "failed"
+        db.session.commit()
+        return
+
+    job.status = "succeeded"
+    job.result = result
+    job.progress = 1.0
+    job.error = None
+    job.locked_by = None
+    job.updated_at = datetime.now()
+    db.session.commit()
+
+
+def run_worker(app, poll_interval: float = 1.0):
+    """Claim and run jobs until SIGTERM or SIGINT.
+
+    A signal lets the current job finish before the worker exits.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logging.info(f"Job worker {worker_id} started; handling {registered_kinds()}")
+    while not stopping:
+        with app.app_context():
+            job = claim_next_job(worker_id)
+            if job is not None:
+                logging.info(f"Worker {worker_id} running job {job.id} ({job.kind})")
+                run_job(job)
+                continue
+        time.sleep(poll_interval)
+    logging.info(f"Job worker {worker_id} stopped")
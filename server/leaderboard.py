@@ -0,0 +1,339 @@
+"""Incremental leaderboard scoring over Submission and PuzzleUser.
+
+record_submissions inserts a batch of submissions and, in the same
+transaction, folds them into the PuzzleUser rows they touch (earliest correct
+time, last submission time, solved flag, evan_adam_score) and into the
+LeaderboardEntry of each user concerned, then re-ranks. Nothing is recomputed
+from the submission table, so the cost of a batch does not grow with the
+number of submissions already stored.
+
+Users are ranked by puzzles solved, then evan_adam_score (higher first), then
+the time of their latest first solve (earlier first), then user id. Ranks are
+stored, so get_leaderboard reads a page with a range scan on the rank index.
+Re-ranking is one window-function UPDATE over the leaderboard table (a row per
+user, not per submission) that only writes the rows whose rank moved.
+
+rebuild_leaderboard recomputes everything from the submission table, for
+backfills and for submissions written by other means.
+"""
+
+from collections.abc import Iterable
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, func, or_, select, text, tuple_, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from server.db import db
+from server.models.Leaderboard import LeaderboardEntry
+from server.models.Puzzle import PuzzleUser
+from server.models.Submission import Submission
+
+# Evan and Adam's puzzle is scored: a correct submission's text is its score,
+# and a user's evan_adam_score is their best.
+EVAN_ADAM_PUZZLE = "evan_adam"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Rows per IN (...) list, well under SQLite's bound parameter limit.
+_CHUNK = 400
+# Arbitrary key for the Postgres advisory lock that serializes writers.
+_ADVISORY_LOCK_KEY = 0x6C6472
+
+_RANK_ORDER = (
+    LeaderboardEntry.solved_count.desc(),
+    func.coalesce(LeaderboardEntry.evan_adam_score, -(2**31)).desc(),
+    LeaderboardEntry.last_solve_time.asc(),
+    LeaderboardEntry.user_id.asc(),
+)
+
+
+def _chunks(items: list, size: int = _CHUNK) -> Iterable[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _parse_score(submission_text: str) -> int | None:
+    try:
+        return int(submission_text.strip())
+    except (AttributeError, ValueError):
+        return None
+
+
+class _Progress:
+    """What a batch of submissions says about one (user, puzzle) pair."""
+
+    __slots__ = ("earliest_correct_time", "last_submission_time", "evan_adam_score")
+
+    def __init__(self):
+        self.earliest_correct_time: datetime | None = None
+        self.last_submission_time: datetime | None = None
+        self.evan_adam_score: int | None = None
+
+    def add(self, puzzle_name: str, is_correct: bool, submission_text: str, submission_time: datetime):
+        if self.last_submission_time is None or submission_time > self.last_submission_time:
+            self.last_submission_time = submission_time
+        if not is_correct:
+            return
+        if self.earliest_correct_time is None or submission_time < self.earliest_correct_time:
+            self.earliest_correct_time = submission_time
+        if puzzle_name == EVAN_ADAM_PUZZLE:
+            score = _parse_score(submission_text)
+            if score is not None and (self.evan_adam_score is None or score > self.evan_adam_score):
+                self.evan_adam_score = score
+
+
+def _lock_writers():
+    """Serialize leaderboard writers for the rest of the transaction.
+
+    SQLite allows one writer at a time anyway; on Postgres, concurrent batches
+    would otherwise race to create the same PuzzleUser rows and interleave
+    their re-ranking.
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+
+
+def _merge_puzzle_users(progress: dict[tuple[str, str], _Progress]) -> set[str]:
+    """Fold progress into the PuzzleUser rows; returns users whose solves changed."""
+    changed_users = set()
+    existing: dict[tuple[str, str], PuzzleUser] = {}
+    for keys in _chunks(list(progress)):
+        rows = db.session.execute(
+            select(PuzzleUser).where(tuple_(PuzzleUser.user_id, PuzzleUser.puzzle_name).in_(keys))
+        ).scalars()
+        existing.update(((row.user_id, row.puzzle_name), row) for row in rows)
+
+    new_rows = []
+    for (user_id, puzzle_name), batch in progress.items():
+        row = existing.get((user_id, puzzle_name))
+        if row is None:
+            new_rows.append({
+                "puzzle_name": puzzle_name,
+                "user_id": user_id,
+                "earliest_correct_time": batch.earliest_correct_time,
+                "last_submission_time": batch.last_submission_time,
+                "is_solved": batch.earliest_correct_time is not None,
+                "evan_adam_score": batch.evan_adam_score,
+            })
+            if batch.earliest_correct_time is not None:
+                changed_users.add(user_id)
+            continue
+        if batch.last_submission_time is not None and (
+            row.last_submission_time is None or batch.last_submission_time > row.last_submission_time
+        ):
+            row.last_submission_time = batch.last_submission_time
+        if batch.earliest_correct_time is not None and (
+            row.earliest_correct_time is None or batch.earliest_correct_time < row.earliest_correct_time
+        ):
+            row.earliest_correct_time = batch.earliest_correct_time
+            row.is_solved = True
+            changed_users.add(user_id)
+        if batch.evan_adam_score is not None and (
+            row.evan_adam_score is None or batch.evan_adam_score > row.evan_adam_score
+        ):
+            row.evan_adam_score = batch.evan_adam_score
+            changed_users.add(user_id)
+    if new_rows:
+        db.session.execute(PuzzleUser.__table__.insert(), new_rows)
+    db.session.flush()
+    return changed_users
+
+
+def _refresh_entries(user_ids: Iterable[str] | None = None) -> bool:
+    """Recompute the LeaderboardEntry of the given users (all if None) from PuzzleUser.
+
+    Returns whether any entry changed.
+    """
+    standing = select(
+        PuzzleUser.user_id,
+        func.sum(case((PuzzleUser.is_solved, 1), else_=0)),
+        func.max(case((PuzzleUser.is_solved, PuzzleUser.earliest_correct_time))),
+        func.max(PuzzleUser.evan_adam_score),
+    ).group_by(PuzzleUser.user_id)
+    if user_ids is None:
+        batches = [db.session.execute(standing).all()]
+        existing = {entry.user_id: entry for entry in db.session.execute(select(LeaderboardEntry)).scalars()}
+    else:
+        batches, existing = [], {}
+        for users in _chunks(sorted(user_ids)):
+            batches.append(db.session.execute(standing.where(PuzzleUser.user_id.in_(users))).all())
+            existing.update(
+                (entry.user_id, entry)
+                for entry in db.session.execute(
+                    select(LeaderboardEntry).where(LeaderboardEntry.user_id.in_(users))
+                ).scalars()
+            )
+
+    changed = False
+    now = datetime.now()
+    new_entries = []
+    for rows in batches:
+        for user_id, solved_count, last_solve_time, evan_adam_score in rows:
+            values = (int(solved_count or 0), last_solve_time, evan_adam_score)
+            entry = existing.get(user_id)
+            if entry is None:
+                new_entries.append({
+                    "user_id": user_id,
+                    "solved_count": values[0],
+                    "last_solve_time": values[1],
+                    "evan_adam_score": values[2],
+                    "updated_at": now,
+                })
+            elif (entry.solved_count, entry.last_solve_time, entry.evan_adam_score) != values:
+                entry.solved_count, entry.last_solve_time, entry.evan_adam_score = values
+                entry.updated_at = now
+                changed = True
+    if new_entries:
+        db.session.execute(LeaderboardEntry.__table__.insert(), new_entries)
+        changed = True
+    db.session.flush()
+    return changed
+
+
+def _rerank():
+    """Set every entry's rank, writing only the rows whose rank changed."""
+    ranked = select(
+        LeaderboardEntry.user_id,
+        func.row_number().over(order_by=_RANK_ORDER).label("new_rank"),
+    ).subquery()
+    db.session.execute(
+        update(LeaderboardEntry)
+        .where(LeaderboardEntry.user_id == ranked.c.user_id)
+        .where(or_(LeaderboardEntry.rank.is_(None), LeaderboardEntry.rank != ranked.c.new_rank))
+        .values(rank=ranked.c.new_rank)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_submissions(submissions: Iterable[dict]) -> dict:
+    """Insert a batch of submissions and update the scores they affect.
+
+    Each submission is a dict with puzzle_name, user_id, is_correct,
+    submission_text and optionally submission_time (default now). Commits,
+    or rolls back everything if any part fails.
+    """
+    now = datetime.now()
+    rows = [
+        {
+            "puzzle_name": submission["puzzle_name"],
+            "user_id": submission["user_id"],
+            "is_correct": bool(submission["is_correct"]),
+            "submission_text": submission.get("submission_text") or "",
+            "submission_time": submission.get("submission_time") or now,
+        }
+        for submission in submissions
+    ]
+    if not rows:
+        return {"submissions": 0, "users_changed": 0}
+
+    progress: dict[tuple[str, str], _Progress] = {}
+    for row in rows:
+        key = (row["user_id"], row["puzzle_name"])
+        progress.setdefault(key, _Progress()).add(
+            row["puzzle_name"], row["is_correct"], row["submission_text"], row["submission_time"]
+        )
+
+    try:
+        _lock_writers()
+        db.session.execute(Submission.__table__.insert(), rows)
+        changed_users = _merge_puzzle_users(progress)
+        # Users seen for the first time get an entry even without a solve.
+        missing = set(user_id for user_id, _ in progress) - changed_users
+        if missing:
+            known = set()
+            for users in _chunks(sorted(missing)):
+                known.update(db.session.execute(
+                    select(LeaderboardEntry.user_id).where(LeaderboardEntry.user_id.in_(users))
+                ).scalars())
+            changed_users |= missing - known
+        if changed_users and _refresh_entries(changed_users):
+            _rerank()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"submissions": len(rows), "users_changed": len(changed_users)}
+
+
+def rebuild_leaderboard() -> dict:
+    """Recompute every PuzzleUser and LeaderboardEntry from the submission table."""
+    is_correct = Submission.is_correct.is_(True)
+    aggregates = db.session.execute(
+        select(
+            Submission.user_id,
+            Submission.puzzle_name,
+            func.min(case((is_correct, Submission.submission_time))),
+            func.max(Submission.submission_time),
+        ).group_by(Submission.user_id, Submission.puzzle_name)
+    ).all()
+    # Scores need parsing, but only for one puzzle's correct submissions.
+    best_scores: dict[str, int] = {}
+    for user_id, submission_text in db.session.execute(
+        select(Submission.user_id, Submission.submission_text).where(
+            Submission.puzzle_name == EVAN_ADAM_PUZZLE, is_correct
+        )
+    ):
+        score = _parse_score(submission_text)
+        if score is not None and score > best_scores.get(user_id, score - 1):
+            best_scores[user_id] = score
+
+    try:
+        _lock_writers()
+        db.session.execute(PuzzleUser.__table__.delete())
+        db.session.execute(LeaderboardEntry.__table__.delete())
+        rows = [
+            {
+                "puzzle_name": puzzle_name,
+                "user_id": user_id,
+                "earliest_correct_time": earliest_correct_time,
+                "last_submission_time": last_submission_time,
+                "is_solved": earliest_correct_time is not None,
+                "evan_adam_score": best_scores.get(user_id) if puzzle_name == EVAN_ADAM_PUZZLE else None,
+            }
+            for user_id, puzzle_name, earliest_correct_time, last_submission_time in aggregates
+        ]
+        for chunk in _chunks(rows, 5000):
+            db.session.execute(PuzzleUser.__table__.insert(), chunk)
+        _refresh_entries()
+        _rerank()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"puzzle_users": len(aggregates), "users": len({row[0] for row in aggregates})}
+
+
+def get_leaderboard(page: int = 1, page_size: int = DEFAULT_PAGE_SIZE) -> dict:
+    """One page of the ranked leaderboard (1-based pages)."""
+    page = max(1, page)
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    first = (page - 1) * page_size + 1
+    entries = db.session.execute(
+        select(LeaderboardEntry)
+        .where(LeaderboardEntry.rank.between(first, first + page_size - 1))
+        .order_by(LeaderboardEntry.rank)
+    ).scalars()
+    # Ranks are contiguous, so the highest is the number of ranked users.
+    total = db.session.execute(select(func.max(LeaderboardEntry.rank))).scalar() or 0
+    return {
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "entries": [entry.to_dict() for entry in entries],
+    }
+
+
+def create_missing_indexes(engine):
+    """Create the scoring indexes on tables that predate them.
+
+    db.create_all only creates indexes along with new tables. A failure (e.g.
+    duplicate PuzzleUser rows blocking the unique index) is logged rather than
+    stopping the app; rebuild_leaderboard removes duplicates.
+    """
+    for model in (Submission, PuzzleUser, LeaderboardEntry):
+        for index in model.__table__.indexes:
+            try:
+                index.create(engine, checkfirst=True)
+            except SQLAlchemyError as e:
+                current_app.logger.warning(f"Could not create index {index.name}: {e}")
@@ -0,0 +1,305 @@
+"""Admission control for LLM calls: per-user quotas and fair queuing.
+
+Every OpenAI call in ai_insights goes through the scheduler:
+
+1. The caller's user is charged against two token buckets, one for requests
+   per minute and one for model tokens per minute. A call that would exceed
+   either waits for the bucket to refill. If the wait would outlast the request
+   deadline, the call fails with LLMRateLimited instead.
+2. At most LLM_MAX_CONCURRENCY calls run at once. Waiting calls are
+   dispatched by weighted fair queuing over flows (lane, user). Interactive
+   work (clicks in the UI) outweighs bulk work (folder analyses, background
+   jobs), and within a lane users get equal shares, so one user's big job
+   can't starve everyone else.
+
+Who is calling is set with llm_context(), which API requests and jobs enter
+automatically. Quotas and queues are per process.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Callable, TypeVar
+
+from server.config import (
+    LLM_BULK_WEIGHT,
+    LLM_INTERACTIVE_WEIGHT,
+    LLM_MAX_CONCURRENCY,
+    LLM_USER_RPM,
+    LLM_USER_TPM,
+)
+from server.resilience import DeadlineExceeded, UpstreamUnavailable, remaining_time
+
+T = TypeVar("T")
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+ANONYMOUS = "anonymous"
+# Wait times kept per lane for the percentiles in metrics().
+_WAIT_SAMPLES = 1000
+
+_current_client: ContextVar[tuple[str, str]] = ContextVar(
+    "llm_client", default=(ANONYMOUS, INTERACTIVE)
+)
+
+
+class LLMRateLimited(UpstreamUnavailable):
+    """The user's LLM quota can't admit the call before its deadline."""
+
+    def __init__(self, user: str, retry_after: float):
+        super().__init__(f"LLM rate limit reached for {user}; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def start_llm_context(user: str | None = None, lane: str | None = None) -> Token:
+    """Attribute LLM calls in the current context to user and lane.
+
+    Either may be omitted to keep the current value. Pass the returned token to
+    end_llm_context.
+    """
+    current_user, current_lane = _current_client.get()
+    return _current_client.set((user or current_user, lane or current_lane))
+
+
+def end_llm_context(token: Token):
+    _current_client.reset(token)
+
+
+@contextmanager
+def llm_context(user: str | None = None, lane: str | None = None):
+    """Attribute LLM calls made inside the block to user and lane."""
+    token = start_llm_context(user, lane)
+    try:
+        yield
+    finally:
+        end_llm_context(token)
+
+
+def current_llm_client() -> tuple[str, str]:
+    """The (user, lane) LLM calls are currently attributed to."""
+    return _current_client.get()
+
+
+def propagate_llm_context(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap fn so it runs under the caller's LLM context, e.g. in a thread pool."""
+    client = _current_client.get()
+
+    def wrapper(*args, **kwargs):
+        token = _current_client.set(client)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_client.reset(token)
+
+    return wrapper
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 per second, up to per_minute.
+
+    Reservations may take the balance negative; the caller then waits until it
+    is back to zero.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.balance = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.balance = min(self.capacity, self.balance + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take amount and return how many seconds to wait before using it."""
+        self._refill(now)
+        self.balance -= amount
+        return max(0.0, -self.balance / self.rate)
+
+    def refund(self, amount: float, now: float):
+        self._refill(now)
+        self.balance = min(self.capacity, self.balance + amount)
+
+
+class _LaneStats:
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.dispatched = 0
+        self.rate_limited = 0
+        self.tokens = 0
+        self.waits: deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+    def to_dict(self) -> dict:
+        waits = sorted(self.waits)
+
+        def percentile(p: float) -> float | None:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 3) if waits else None
+
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "dispatched": self.dispatched,
+            "rate_limited": self.rate_limited,
+            "tokens": self.tokens,
+            "wait_seconds": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(waits[-1], 3) if waits else None,
+            },
+        }
+
+
+class Ticket:
+    """An admitted LLM call; release it when the call is done."""
+
+    def __init__(self, scheduler: "LLMScheduler", user: str, lane: str, estimated_tokens: int):
+        self._scheduler = scheduler
+        self.user = user
+        self.lane = lane
+        self.estimated_tokens = estimated_tokens
+        self._released = False
+
+    def release(self, used_tokens: int | None = None):
+        """Free the slot; used_tokens, when known, corrects the token quota."""
+        if not self._released:
+            self._released = True
+            self._scheduler._release(self, used_tokens)
+
+
+class LLMScheduler:
+    """Per-user token buckets in front of a weighted fair queue."""
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        requests_per_minute: float = LLM_USER_RPM,
+        tokens_per_minute: float = LLM_USER_TPM,
+        weights: dict[str, float] | None = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.weights = weights or {INTERACTIVE: LLM_INTERACTIVE_WEIGHT, BULK: LLM_BULK_WEIGHT}
+        self._cond = threading.Condition()
+        self._running = 0
+        # Heap of (finish tag, sequence, ticket) waiting for a slot.
+        self._queue: list[tuple[float, int, Ticket]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._flow_finish: dict[tuple[str, str], float] = {}
+        self._buckets: dict[str, tuple[TokenBucket, TokenBucket]] = {}
+        self._stats = {lane: _LaneStats() for lane in self.weights}
+
+    def _user_buckets(self, user: str) -> tuple[TokenBucket, TokenBucket]:
+        buckets = self._buckets.get(user)
+        if buckets is None:
+            buckets = self._buckets[user] = (
+                TokenBucket(self.requests_per_minute),
+                TokenBucket(self.tokens_per_minute),
+            )
+        return buckets
+
+    def _wait_for_quota(self, user: str, lane: str, tokens: int):
+        with self._cond:
+            now = time.monotonic()
+            requests, token_bucket = self._user_buckets(user)
+            wait = max(requests.reserve(1, now), token_bucket.reserve(tokens, now))
+            remaining = remaining_time()
+            if remaining is not None and wait >= remaining:
+                requests.refund(1, now)
+                token_bucket.refund(tokens, now)
+                self._stats[lane].rate_limited += 1
+                raise LLMRateLimited(user, wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    def acquire(self, estimated_tokens: int) -> Ticket:
+        """Wait for quota and a slot for a call of about estimated_tokens tokens."""
+        user, lane = current_llm_client()
+        if lane not in self.weights:
+            lane = BULK
+        self._wait_for_quota(user, lane, estimated_tokens)
+
+        ticket = Ticket(self, user, lane, estimated_tokens)
+        stats = self._stats[lane]
+        enqueued_at = time.monotonic()
+        with self._cond:
+            flow = (lane, user)
+            start = max(self._virtual_time, self._flow_finish.get(flow, 0.0))
+            finish = start + max(1, estimated_tokens) / self.weights[lane]
+            self._flow_finish[flow] = finish
+            entry = (finish, next(self._sequence), ticket)
+            heapq.heappush(self._queue, entry)
+            stats.queued += 1
+            try:
+                while self._running >= self.max_concurrency or self._queue[0][2] is not ticket:
+                    remaining = remaining_time()
+                    if remaining is not None and remaining <= 0:
+                        raise DeadlineExceeded("Request deadline exceeded waiting for the LLM")
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                # The call never ran; give back what _wait_for_quota reserved.
+                now = time.monotonic()
+                requests, token_bucket = self._user_buckets(user)
+                requests.refund(1, now)
+                token_bucket.refund(estimated_tokens, now)
+                self._cond.notify_all()
+                raise
+            finally:
+                stats.queued -= 1
+            heapq.heappop(self._queue)
+            self._running += 1
+            # Start-time fair queuing: virtual time follows the start tag of
+            # the call entering service.
+            self._virtual_time = max(self._virtual_time, start)
+            if len(self._flow_finish) > 1000:
+                self._flow_finish = {
+                    f: tag for f, tag in self._flow_finish.items() if tag > self._virtual_time
+                }
+            stats.running += 1
+            stats.dispatched += 1
+            stats.waits.append(time.monotonic() - enqueued_at)
+            # Another waiter may now be at the head with a free slot.
+            self._cond.notify_all()
+        return ticket
+
+    def _release(self, ticket: Ticket, used_tokens: int | None):
+        with self._cond:
+            self._running -= 1
+            stats = self._stats[ticket.lane]
+            stats.running -= 1
+            stats.tokens += used_tokens if used_tokens is not None else ticket.estimated_tokens
+            if used_tokens is not None:
+                now = time.monotonic()
+                _, token_bucket = self._user_buckets(ticket.user)
+                # Settle the difference between the estimate and actual usage.
+                token_bucket.refund(ticket.estimated_tokens - used_tokens, now)
+            self._cond.notify_all()
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "queued": len(self._queue),
+                "users": len(self._buckets),
+                "quota": {
+                    "requests_per_minute": self.requests_per_minute,
+                    "tokens_per_minute": self.tokens_per_minute,
+                },
+                "lanes": {
+                    lane: {"weight": self.weights[lane], **stats.to_dict()}
+                    for lane, stats in self._stats.items()
+                },
+            }
+
+
+scheduler = LLMScheduler()
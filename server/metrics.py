@@ -0,0 +1,177 @@
+"""Static code metrics computed locally, without the model.
+
+file_metrics gives lines of code, cyclomatic complexity, Halstead volume and
+maintainability index for a file. Python is measured from its syntax tree and
+tokens; other languages with a C-like syntax are measured from regular
+expressions, which is rougher but consistent between two versions of a file,
+and that's what comparisons need.
+
+Metrics depend only on a file's content and language, so blob_metrics caches
+them per git blob SHA.
+"""
+
+import ast
+import hashlib
+import io
+import keyword
+import math
+import os
+import re
+import tokenize
+from typing import Callable
+
+from server.cache import get_cache
+
+# Bump to invalidate cached metrics when the computation changes.
+METRICS_VERSION = 1
+
+_metrics_cache = get_cache("blob_metrics")
+
+_PYTHON_DECISIONS = (
+    ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler,
+    ast.Assert, ast.comprehension, ast.match_case,
+)
+_FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+_NON_CODE_TOKENS = {
+    tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT,
+    tokenize.ENDMARKER, tokenize.ENCODING,
+}
+
+_HASH_COMMENT_EXTENSIONS = {".rb", ".php"}
+_BLOCK_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+_LINE_COMMENT_RE = re.compile(r"//[^\n]*")
+_HASH_COMMENT_RE = re.compile(r"#[^\n]*")
+_STRING_RE = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`')
+_DECISION_RE = re.compile(
+    r"\b(?:if|elif|elsif|unless|for|foreach|while|until|case|catch|rescue)\b|&&|\|\|"
+)
+_TOKEN_RE = re.compile(r"[A-Za-z_$][\w$]*|\d[\w.]*|<<=|>>=|===|!==|[-+*/%&|^<>=!]=|&&|\|\||<<|>>|->|=>|::|\+\+|--|\S")
+_OPERAND_RE = re.compile(r"[A-Za-z_$\d]")
+_C_KEYWORDS = frozenset({
+    "if", "else", "for", "while", "do", "switch", "case", "default", "break", "continue",
+    "return", "try", "catch", "finally", "throw", "new", "function", "class", "def", "end",
+    "elsif", "unless", "until", "foreach", "func", "fn", "let", "const", "var", "match",
+})
+
+
+def git_blob_sha(content: bytes) -> str:
+    """The SHA git gives a blob with this content."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def maintainability_index(volume: float, complexity: int, lines_of_code: int) -> float:
+    """The maintainability index rescaled to 0-100, as in Visual Studio and radon."""
+    if lines_of_code == 0:
+        return 100.0
+    raw = 171 - 5.2 * math.log(max(volume, 1)) - 0.23 * complexity - 16.2 * math.log(lines_of_code)
+    return round(max(0.0, raw * 100 / 171), 2)
+
+
+def _halstead_volume(operators: list[str], operands: list[str]) -> float:
+    length = len(operators) + len(operands)
+    vocabulary = len(set(operators)) + len(set(operands))
+    return length * math.log2(vocabulary) if vocabulary > 1 else 0.0
+
+
+def _decisions(node: ast.AST) -> int:
+    if isinstance(node, ast.BoolOp):
+        return len(node.values) - 1
+    if isinstance(node, ast.comprehension):
+        return 1 + len(node.ifs)
+    return 1 if isinstance(node, _PYTHON_DECISIONS) else 0
+
+
+def _python_complexity(tree: ast.AST) -> tuple[int, int, int]:
+    """(total, max per function, number of functions) McCabe complexity.
+
+    Each function is 1 plus its decision points; code outside functions adds
+    its decision points to the total.
+    """
+    functions = []
+    outside = 0
+    stack: list[tuple[ast.AST, int | None]] = [(tree, None)]
+    while stack:
+        node, function = stack.pop()
+        if isinstance(node, _FUNCTIONS):
+            functions.append(1)
+            function = len(functions) - 1
+        else:
+            decisions = _decisions(node)
+            if function is None:
+                outside += decisions
+            else:
+                functions[function] += decisions
+        stack.extend((child, function) for child in ast.iter_child_nodes(node))
+    return sum(functions) + outside, max(functions, default=0), len(functions)
+
+
+def _python_metrics(content: str) -> dict:
+    tree = ast.parse(content)
+    code_lines = set()
+    operators, operands = [], []
+    for token in tokenize.generate_tokens(io.StringIO(content).readline):
+        if token.type in _NON_CODE_TOKENS:
+            continue
+        code_lines.update(range(token.start[0], token.end[0] + 1))
+        if token.type == tokenize.OP or (token.type == tokenize.NAME and keyword.iskeyword(token.string)):
+            operators.append(token.string)
+        elif token.type in (tokenize.NAME, tokenize.NUMBER, tokenize.STRING):
+            operands.append(token.string)
+    complexity, max_complexity, functions = _python_complexity(tree)
+    return _result(len(code_lines), complexity, max_complexity, functions, operators, operands)
+
+
+def _generic_metrics(content: str, extension: str) -> dict:
+    code = _STRING_RE.sub('""', content)
+    code = _BLOCK_COMMENT_RE.sub(lambda m: "\n" * m.group().count("\n"), code)
+    code = _LINE_COMMENT_RE.sub("", code)
+    if extension in _HASH_COMMENT_EXTENSIONS:
+        code = _HASH_COMMENT_RE.sub("", code)
+    lines_of_code = sum(1 for line in code.splitlines() if line.strip())
+    operators, operands = [], []
+    for token in _TOKEN_RE.findall(code):
+        if token in _C_KEYWORDS or not _OPERAND_RE.match(token):
+            operators.append(token)
+        else:
+            operands.append(token)
+    complexity = 1 + len(_DECISION_RE.findall(code))
+    return _result(lines_of_code, complexity, None, None, operators, operands)
+
+
+def _result(
+    lines_of_code: int,
+    complexity: int,
+    max_complexity: int | None,
+    functions: int | None,
+    operators: list[str],
+    operands: list[str],
+) -> dict:
+    volume = _halstead_volume(operators, operands)
+    return {
+        "lines_of_code": lines_of_code,
+        "cyclomatic_complexity": complexity,
+        "max_function_complexity": max_complexity,
+        "functions": functions,
+        "halstead_volume": round(volume, 2),
+        "maintainability_index": maintainability_index(volume, complexity, lines_of_code),
+    }
+
+
+def file_metrics(path: str, content: str) -> dict:
+    """Metrics of a file; the language is taken from the path's extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".py":
+        try:
+            return {"language": "python", **_python_metrics(content)}
+        except (SyntaxError, ValueError, tokenize.TokenError):
+            pass
+    return {"language": "generic", **_generic_metrics(content, extension)}
+
+
+def blob_metrics(path: str, sha: str, fetch: Callable[[], bytes]) -> dict:
+    """file_metrics of the blob sha at path, calling fetch for its bytes on a miss."""
+    extension = os.path.splitext(path)[1].lower()
+    key = f"v{METRICS_VERSION}:{sha}:{extension}"
+    return _metrics_cache.get_or_set(
+        key, lambda: file_metrics(path, fetch().decode("utf-8", errors="replace"))
+    )
@@ -0,0 +1,26 @@
+"""cached result table model."""
+
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import JSON, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from server import db
+
+
+class CachedResult(db.Model):
+    """Durable cache of expensive computed results (LLM output, stats, ...).
+
+    Rows are keyed by the kind of result and a content-derived key, such as the
+    hash of the input that produced it, so entries never go stale.
+    """
+
+    __tablename__ = "cached_result"
+
+    kind: Mapped[str] = mapped_column(primary_key=True)
+    key: Mapped[str] = mapped_column(primary_key=True)
+    value: Mapped[Any] = mapped_column(JSON)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default_factory=datetime.now
+    )
@@ -0,0 +1,62 @@
+"""background job table model."""
+
+import uuid
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import JSON, DateTime, Float, Index, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from server import db
+
+
+class Job(db.Model):
+    """Background job entity.
+
+    Jobs are claimed by worker processes with SELECT ... FOR UPDATE SKIP LOCKED,
+    so any number of workers can poll the table without blocking each other.
+    """
+
+    __tablename__ = "job"
+    __table_args__ = (Index("ix_job_status_run_after", "status", "run_after"),)
+
+    id: Mapped[str] = mapped_column(
+        primary_key=True,
+        init=False,
+        default=lambda: "jo_" + str(uuid.uuid4()),
+    )
+
+    kind: Mapped[str] = mapped_column()
+    payload: Mapped[Any] = mapped_column(JSON)
+    # GitHub username of the user who submitted the job, if any
+    user_id: Mapped[Optional[str]] = mapped_column(default=None, nullable=True)
+
+    # queued -> running -> succeeded | failed (or back to queued to retry)
+    status: Mapped[str] = mapped_column(default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3)
+    run_after: Mapped[datetime] = mapped_column(DateTime, default_factory=datetime.now)
+    locked_by: Mapped[Optional[str]] = mapped_column(default=None, nullable=True)
+
+    progress: Mapped[float] = mapped_column(Float, default=0.0)
+    progress_message: Mapped[Optional[str]] = mapped_column(default=None, nullable=True)
+    result: Mapped[Optional[Any]] = mapped_column(JSON, default=None, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(default=None, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default_factory=datetime.now)
+    # Refreshed on every progress report; doubles as the worker's heartbeat.
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default_factory=datetime.now)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "progress": self.progress,
+            "progress_message": self.progress_message,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
@@ -0,0 +1,43 @@
+"""leaderboard table model."""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Index, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from server import db
+
+
+class LeaderboardEntry(db.Model):
+    """A user's standing, precomputed from their PuzzleUser rows.
+
+    Maintained by server/leaderboard.py. rank is 1-based and contiguous, so a
+    page of the leaderboard is a range scan on ix_leaderboard_rank.
+    """
+
+    __tablename__ = "leaderboard"
+    __table_args__ = (Index("ix_leaderboard_rank", "rank"),)
+
+    user_id: Mapped[str] = mapped_column(primary_key=True)
+
+    solved_count: Mapped[int] = mapped_column(Integer, default=0)
+    # Time of the user's latest first solve; earlier wins ties.
+    last_solve_time: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, default=None, nullable=True
+    )
+    evan_adam_score: Mapped[Optional[int]] = mapped_column(
+        Integer, default=None, nullable=True
+    )
+    rank: Mapped[Optional[int]] = mapped_column(Integer, default=None, nullable=True)
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default_factory=datetime.now)
+
+    def to_dict(self) -> dict:
+        return {
+            "rank": self.rank,
+            "user_id": self.user_id,
+            "solved_count": self.solved_count,
+            "last_solve_time": self.last_solve_time.isoformat() if self.last_solve_time else None,
+            "evan_adam_score": self.evan_adam_score,
+        }
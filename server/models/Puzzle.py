@@ -4,7 +4,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, Integer
+from sqlalchemy import Boolean, DateTime, Index, Integer
 from sqlalchemy.orm import Mapped, mapped_column
 
 from server import db
@@ -14,6 +14,10 @@ class PuzzleUser(db.Model):
     """Puzzle User combined entity."""
 
     __tablename__ = "puzzle_user"
+    __table_args__ = (
+        # One row per (user, puzzle); see server/leaderboard.py.
+        Index("ix_puzzle_user_user_puzzle", "user_id", "puzzle_name", unique=True),
+    )
 
     id: Mapped[str] = mapped_column(
         primary_key=True,
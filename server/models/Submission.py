@@ -3,7 +3,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, DateTime
+from sqlalchemy import Boolean, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from server import db
@@ -13,6 +13,11 @@ class Submission(db.Model):
     """Submission entity."""
 
     __tablename__ = "submission"
+    __table_args__ = (
+        # A user's history on one puzzle, and everyone's on one puzzle, in time order.
+        Index("ix_submission_user_puzzle_time", "user_id", "puzzle_name", "submission_time"),
+        Index("ix_submission_puzzle_time", "puzzle_name", "submission_time"),
+    )
 
     id: Mapped[str] = mapped_column(
         primary_key=True,
@@ -25,4 +30,4 @@ class Submission(db.Model):
     is_correct: Mapped[bool] = mapped_column(Boolean)
     submission_text: Mapped[str] = mapped_column()
 
-    submission_time: Mapped[datetime] = mapped_column(DateTime, default=datetime.now())
+    submission_time: Mapped[datetime] = mapped_column(DateTime, default_factory=datetime.now)
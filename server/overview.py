@@ -0,0 +1,120 @@
+"""Repository overview stats shown on the dashboard's overview tab.
+
+Overviews come from GitHub's GraphQL API. Many repositories are fetched in one
+query, with an alias per repository, so a user's whole repository list costs
+one or two round trips. Results are cached per repository and token, since a
+private repository's overview must only be served to callers who can read it.
+
+server/overview_benchmark.py checks the batching against a local GraphQL stub.
+"""
+
+from datetime import timedelta
+
+from server.github import github_graphql, token_fingerprint
+from server.result_store import get_results, put_results
+
+OVERVIEW_KIND = "overview"
+# Cached overviews older than this are recomputed on the next request.
+OVERVIEW_MAX_AGE = timedelta(minutes=10)
+# Repositories per GraphQL query.
+OVERVIEW_BATCH_SIZE = 50
+
+# Code analysis stats aren't computed per repository yet; these are placeholders.
+_CODE_ANALYSIS = {
+    "average_complexity": 4.3/10,
+    "total_lines_of_code": 1442,
+}
+
+_OVERVIEW_FRAGMENT = """
+fragment OverviewFields on Repository {
+  name
+  description
+  stargazerCount
+  forkCount
+  issues(states: OPEN) { totalCount }
+  pullRequests(states: OPEN) { totalCount }
+  defaultBranchRef {
+    target {
+      ... on Commit { history { totalCount } }
+    }
+  }
+}
+"""
+
+
+def _batch_query(count: int) -> str:
+    """A query fetching count repositories, aliased r0..r{count-1}."""
+    params = ", ".join(f"$o{i}: String!, $n{i}: String!" for i in range(count))
+    fields = "\n".join(
+        f"  r{i}: repository(owner: $o{i}, name: $n{i}) {{ ...OverviewFields }}"
+        for i in range(count)
+    )
+    return f"query({params}) {{\n{fields}\n}}\n{_OVERVIEW_FRAGMENT}"
+
+
+def _overview_from_node(node: dict) -> dict:
+    target = (node.get("defaultBranchRef") or {}).get("target") or {}
+    return {
+        "name": node.get("name"),
+        "description": node.get("description"),
+        "stars": node.get("stargazerCount"),
+        "forks": node.get("forkCount"),
+        # The REST API's watchers_count, which this field used to come from,
+        # is the stargazer count; watchers { totalCount } is subscribers.
+        "watchers": node.get("stargazerCount"),
+        # Counted like the REST API's open_issues_count, which includes open PRs.
+        "open_issues": node["issues"]["totalCount"] + node["pullRequests"]["totalCount"],
+        # None for an empty repository.
+        "total_commits": (target.get("history") or {}).get("totalCount"),
+        **_CODE_ANALYSIS,
+    }
+
+
+def fetch_overviews(repos: list[str], token: str) -> dict[str, dict | None]:
+    """Fetch overviews for "owner/name" repositories from GitHub.
+
+    Makes one GraphQL query per OVERVIEW_BATCH_SIZE repositories. Repositories
+    that don't exist or aren't accessible map to None. Raises
+    requests.exceptions.RequestException if a query fails.
+    """
+    overviews: dict[str, dict | None] = {}
+    for start in range(0, len(repos), OVERVIEW_BATCH_SIZE):
+        batch = repos[start:start + OVERVIEW_BATCH_SIZE]
+        variables = {}
+        for i, full_name in enumerate(batch):
+            owner, name = full_name.split("/", 1)
+            variables[f"o{i}"] = owner
+            variables[f"n{i}"] = name
+        data = github_graphql(_batch_query(len(batch)), variables, token)["data"]
+        for i, full_name in enumerate(batch):
+            node = data.get(f"r{i}")
+            overviews[full_name] = _overview_from_node(node) if node else None
+    return overviews
+
+
+def fetch_overview(repo_owner: str, repo_name: str, token: str) -> dict | None:
+    """Fetch one repository's overview, or None if it can't be found."""
+    full_name = f"{repo_owner}/{repo_name}"
+    return fetch_overviews([full_name], token)[full_name]
+
+
+def overview_key(full_name: str, token: str) -> str:
+    """Result store key of the overview of "owner/name" as seen with token."""
+    return f"{token_fingerprint(token)}/{full_name}"
+
+
+def get_overviews(repos: list[str], token: str) -> dict[str, dict | None]:
+    """Overviews for "owner/name" repositories, fetching only stale ones.
+
+    Must run inside an app context.
+    """
+    repos = list(dict.fromkeys(repos))
+    keys = {repo: overview_key(repo, token) for repo in repos}
+    cached = get_results(OVERVIEW_KIND, list(keys.values()), max_age=OVERVIEW_MAX_AGE)
+    overviews: dict[str, dict | None] = {repo: cached[key] for repo, key in keys.items() if key in cached}
+    missing = [repo for repo in repos if repo not in overviews]
+    if missing:
+        fetched = fetch_overviews(missing, token)
+        put_results(OVERVIEW_KIND, {keys[repo]: o for repo, o in fetched.items() if o is not None})
+        overviews.update(fetched)
+    return {repo: overviews[repo] for repo in repos}
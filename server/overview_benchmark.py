@@ -0,0 +1,65 @@
+"""Check overview batching against a local GraphQL stub.
+
+Fetches 100 repositories, one of which doesn't exist, and reports the number
+of GraphQL round trips:
+
+    python3 -m server.overview_benchmark
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import server.github
+from server.overview import fetch_overviews
+
+
+class _StubGraphQLHandler(BaseHTTPRequestHandler):
+    """Answers overview queries with made-up data; names starting "missing" don't exist."""
+
+    requests_served = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests_served += 1
+        variables = body["variables"]
+        data, errors = {}, []
+        for i in range(len(variables) // 2):
+            owner, name = variables[f"o{i}"], variables[f"n{i}"]
+            if name.startswith("missing"):
+                data[f"r{i}"] = None
+                errors.append({"type": "NOT_FOUND", "path": [f"r{i}"],
+                               "message": f"Could not resolve to a Repository with the name '{owner}/{name}'."})
+                continue
+            data[f"r{i}"] = {
+                "name": name,
+                "description": f"Stub repository {i}",
+                "stargazerCount": i * 10,
+                "forkCount": i,
+                "issues": {"totalCount": 3},
+                "pullRequests": {"totalCount": 1},
+                "defaultBranchRef": {"target": {"history": {"totalCount": 100 + i}}},
+            }
+        response = json.dumps({"data": data, "errors": errors} if errors else {"data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    stub = HTTPServer(("127.0.0.1", 0), _StubGraphQLHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    server.github.GITHUB_GRAPHQL_URL = f"http://127.0.0.1:{stub.server_port}/graphql"
+
+    repos = [f"octocat/repo-{i}" for i in range(99)] + ["octocat/missing-repo"]
+    overviews = fetch_overviews(repos, token="stub")
+    found = [repo for repo, overview in overviews.items() if overview is not None]
+    print(f"{len(repos)} repositories in {_StubGraphQLHandler.requests_served} round trips")
+    print(f"{len(found)} found, missing: {[repo for repo in repos if overviews[repo] is None]}")
+    print(json.dumps(overviews["octocat/repo-7"], indent=2))
+    stub.shutdown()
@@ -0,0 +1,80 @@
+"""Incremental parsing of a streamed JSON object.
+
+JsonFieldStream is fed the text of a JSON object as it arrives and reports each
+top-level field as soon as its value is complete, without waiting for the
+closing brace. Each chunk is scanned once, so the cost is linear in the size of
+the object no matter how it is split.
+"""
+
+import json
+
+
+class JsonFieldStream:
+    """Emit the top-level (key, value) pairs of a JSON object as they complete."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._key: str | None = None
+        self._token_start: int | None = None
+        self._awaiting_value = False
+
+    def feed(self, text: str) -> list[tuple[str, object]]:
+        """Consume more text and return the fields completed by it."""
+        self._buffer += text
+        completed = []
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._awaiting_value:
+                        self._finish_value(completed, self._pos + 1)
+                    elif self._depth == 1:
+                        # End of a top-level key.
+                        self._key = json.loads(buffer[self._token_start:self._pos + 1])
+                        self._token_start = None
+                self._pos += 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._token_start is None:
+                    self._token_start = self._pos
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 2 and self._awaiting_value and self._token_start is None:
+                    self._token_start = self._pos
+            elif char in "}]":
+                if self._depth == 1:
+                    # Closing brace of the object itself ends a pending number.
+                    self._finish_value(completed, self._pos)
+                self._depth -= 1
+                if self._depth == 1 and self._awaiting_value:
+                    self._finish_value(completed, self._pos + 1)
+            elif self._depth == 1:
+                if char == ":":
+                    self._awaiting_value = True
+                elif char == ",":
+                    self._finish_value(completed, self._pos)
+                elif not char.isspace() and self._token_start is None and self._awaiting_value:
+                    # Start of a number, true, false or null.
+                    self._token_start = self._pos
+            self._pos += 1
+        return completed
+
+    def _finish_value(self, completed: list, end: int):
+        if self._awaiting_value and self._token_start is not None and self._key is not None:
+            completed.append((self._key, json.loads(self._buffer[self._token_start:end])))
+        self._key = None
+        self._token_start = None
+        self._awaiting_value = False
@@ -0,0 +1,186 @@
+"""Map-reduce summarization of pull request diffs.
+
+A diff is split into chunks of a file's consecutive hunks that are summarized
+concurrently with summarize_pr (map) and then merged with combine_pr_summaries
+(reduce). Chunk summaries are cached by a hash of the path and hunk bodies, so
+after a new push only chunks whose content changed are sent to the model again.
+Diffs needing more than MAX_DIFF_CHUNKS chunks are refused.
+"""
+
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from server.controllers.ai_insights import combine_pr_summaries, summarize_pr
+from server.llm_scheduler import propagate_llm_context
+from server.resilience import propagate_deadline
+from server.result_store import get_results, put_results
+
+HUNK_SUMMARY_KIND = "pr_hunk_summary"
+
+# Longer hunks are split so each chunk fits comfortably in one prompt.
+MAX_CHUNK_CHARS = 12000
+MAX_CONCURRENT_SUMMARIES = 8
+# How many partial summaries are merged per reduce call.
+REDUCE_FANOUT = 20
+# Diffs needing more chunks than this are refused rather than sent to the
+# model in one request.
+MAX_DIFF_CHUNKS = 60
+
+_HUNK_HEADER_RE = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+class DiffTooLarge(ValueError):
+    """A diff needs more than MAX_DIFF_CHUNKS chunks."""
+
+
+@dataclass
+class DiffChunk:
+    """Consecutive hunks (or part of a long hunk) of one file's diff."""
+
+    path: str
+    text: str
+    key: str
+
+
+def _chunk_key(path: str, body: str) -> str:
+    # The hunk header's line numbers shift whenever earlier hunks change, so
+    # only the path and body identify the hunk.
+    return hashlib.sha256(f"{path}\0{body}".encode("utf-8")).hexdigest()
+
+
+def _split_hunk(hunk: list[str]) -> list[tuple[str, str]]:
+    """(header, body) pieces of a hunk, long bodies split at MAX_CHUNK_CHARS."""
+    header_line, body_lines = hunk[0], hunk[1:]
+    pieces: list[list[str]] = [[]]
+    size = 0
+    for line in body_lines:
+        if size + len(line) > MAX_CHUNK_CHARS and pieces[-1]:
+            pieces.append([])
+            size = 0
+        pieces[-1].append(line)
+        size += len(line) + 1
+    return [(header_line, "\n".join(piece)) for piece in pieces]
+
+
+def _make_chunk(path: str, file_header: list[str], pieces: list[tuple[str, str]]) -> DiffChunk:
+    text = "\n".join(file_header + [line for piece in pieces for line in piece])
+    return DiffChunk(path, text, _chunk_key(path, "\0".join(body for _, body in pieces)))
+
+
+def _pack_file(path: str, file_header: list[str], hunks: list[list[str]]) -> list[DiffChunk]:
+    """Chunks of one file's diff; consecutive small hunks share a chunk."""
+    chunks = []
+    group: list[tuple[str, str]] = []
+    size = 0
+    for hunk in hunks:
+        for header_line, body in _split_hunk(hunk):
+            piece_size = len(header_line) + len(body) + 2
+            if group and size + piece_size > MAX_CHUNK_CHARS:
+                chunks.append(_make_chunk(path, file_header, group))
+                group, size = [], 0
+            group.append((header_line, body))
+            size += piece_size
+    if group:
+        chunks.append(_make_chunk(path, file_header, group))
+    return chunks
+
+
+def split_diff(diff: str) -> list[DiffChunk]:
+    """Split a unified git diff into chunks of one or more hunks of a file."""
+    chunks: list[DiffChunk] = []
+    path = ""
+    file_header: list[str] = []
+    hunks: list[list[str]] = []
+
+    def flush_file():
+        if hunks:
+            chunks.extend(_pack_file(path, file_header, hunks))
+            hunks.clear()
+
+    for line in diff.splitlines():
+        if line.startswith("diff --git "):
+            flush_file()
+            file_header = [line]
+            path = line.split(" b/", 1)[-1]
+        elif _HUNK_HEADER_RE.match(line):
+            hunks.append([line])
+        elif hunks:
+            hunks[-1].append(line)
+        else:
+            # "index", "---", "+++", rename and mode lines before the first hunk.
+            file_header.append(line)
+            if line.startswith("+++ b/"):
+                path = line[len("+++ b/"):]
+    flush_file()
+    return chunks
+
+
+def _reduce(summaries: list[dict]) -> dict:
+    while len(summaries) > 1:
+        groups = [
+            summaries[i:i + REDUCE_FANOUT]
+            for i in range(0, len(summaries), REDUCE_FANOUT)
+        ]
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SUMMARIES) as executor:
+            merged = list(executor.map(
+                propagate_deadline(propagate_llm_context(
+                    lambda group: group[0] if len(group) == 1 else combine_pr_summaries(group)
+                )),
+                groups,
+            ))
+        failed = [summary for summary in merged if "error" in summary]
+        if failed:
+            return failed[0]
+        summaries = merged
+    return summaries[0]
+
+
+def summarize_diff(diff: str) -> dict:
+    """Summarize a pull request diff of any size.
+
+    Returns the summarize_pr keys plus "chunks" and "cached_chunks" counts, or
+    {"error": ...} if any model call failed. Raises DiffTooLarge when the diff
+    needs more than MAX_DIFF_CHUNKS chunks. Must run inside an app context.
+    """
+    chunks = split_diff(diff)
+    if len(chunks) > MAX_DIFF_CHUNKS:
+        raise DiffTooLarge(
+            f"The diff is too large to summarize ({len(chunks)} chunks, at most {MAX_DIFF_CHUNKS})"
+        )
+    if not chunks:
+        return {
+            "key_changes": "No changes.",
+            "potential_impacts": [],
+            "improvement_suggestions": [],
+            "chunks": 0,
+            "cached_chunks": 0,
+        }
+
+    keys = list(dict.fromkeys(chunk.key for chunk in chunks))
+    cached = get_results(HUNK_SUMMARY_KIND, keys)
+    missing = [chunk for chunk in {c.key: c for c in chunks}.values() if chunk.key not in cached]
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SUMMARIES) as executor:
+        fresh = dict(zip(
+            (chunk.key for chunk in missing),
+            executor.map(
+                propagate_deadline(propagate_llm_context(lambda chunk: summarize_pr(chunk.text))),
+                missing,
+            ),
+        ))
+    succeeded = {key: summary for key, summary in fresh.items() if "error" not in summary}
+    put_results(HUNK_SUMMARY_KIND, succeeded)
+    if len(succeeded) < len(fresh):
+        return next(summary for summary in fresh.values() if "error" in summary)
+
+    summaries = {**cached, **succeeded}
+    result = _reduce([summaries[key] for key in keys])
+    if "error" in result:
+        return result
+    return {
+        **result,
+        "chunks": len(chunks),
+        "cached_chunks": sum(1 for chunk in chunks if chunk.key in cached),
+    }
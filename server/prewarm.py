@@ -0,0 +1,82 @@
+"""Pre-computation of dashboard data when a repository receives a push.
+
+The push webhook (see controllers/webhooks.py) hands the payload to
+enqueue_prewarm_jobs, which queues background jobs for the new head commit so
+that the first dashboard view after a push is served from cache.
+"""
+
+from sqlalchemy import select
+
+from server.config import CONTRIBUTORS_SOURCE
+from server.db import db
+from server.jobs import enqueue
+from server.models.Job import Job
+from server.models.User import User
+from server.search import has_index
+from server.trends import has_trend
+
+_NULL_SHA = "0" * 40
+
+
+def changed_paths(push: dict) -> list[str]:
+    """Paths added or modified by a push that still exist at its head commit."""
+    changed: dict[str, bool] = {}
+    for commit in push.get("commits", []):
+        for path in commit.get("added", []) + commit.get("modified", []):
+            changed[path] = True
+        for path in commit.get("removed", []):
+            changed[path] = False
+    return [path for path, exists in changed.items() if exists]
+
+
+def _token_owner(push: dict) -> str | None:
+    """Pick a signed-in user whose GitHub token can read the repository."""
+    candidates = [
+        (push.get("sender") or {}).get("login"),
+        (push.get("pusher") or {}).get("name"),
+        ((push.get("repository") or {}).get("owner") or {}).get("login"),
+    ]
+    for username in candidates:
+        if not username:
+            continue
+        user = db.session.execute(
+            select(User).where(User.github_username == username)
+        ).scalar_one_or_none()
+        if user is not None and user.github_access_token:
+            return username
+    return None
+
+
+def enqueue_prewarm_jobs(push: dict) -> tuple[list[Job], str]:
+    """Queue pre-computation for a push event.
+
+    Returns the queued jobs and a short reason when nothing was queued.
+    """
+    repository = push.get("repository") or {}
+    head_sha = push.get("after")
+    if not head_sha or head_sha == _NULL_SHA:
+        return [], "branch deleted"
+    default_branch = repository.get("default_branch")
+    if push.get("ref") != f"refs/heads/{default_branch}":
+        return [], "not the default branch"
+
+    user_id = _token_owner(push)
+    if user_id is None:
+        return [], "no signed-in user with access to the repository"
+
+    owner = (repository.get("owner") or {}).get("login")
+    repo = repository.get("name")
+    common = {"owner": owner, "repo": repo, "sha": head_sha}
+    jobs = [enqueue("prewarm_overview", common, user_id=user_id)]
+    if has_index(owner, repo):
+        jobs.append(enqueue("prewarm_search_index", common, user_id=user_id))
+    if CONTRIBUTORS_SOURCE == "git":
+        jobs.append(enqueue("git_contributors", common, user_id=user_id))
+    if has_trend(owner, repo):
+        # Only repositories whose trends were looked at; the first build is
+        # a full history walk.
+        jobs.append(enqueue("code_trends", common, user_id=user_id))
+    paths = changed_paths(push)
+    if paths:
+        jobs.append(enqueue("prewarm_files", {**common, "paths": paths}, user_id=user_id))
+    return jobs, ""
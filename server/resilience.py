@@ -0,0 +1,249 @@
+"""Deadlines, circuit breakers and hedged requests for upstream calls.
+
+Every API request gets a deadline (REQUEST_DEADLINE_SECONDS). Calls to GitHub,
+OpenAI and Postgres take their timeout from the time left, so a slow upstream
+can't hold a worker past the request's budget. Each upstream also has a
+circuit breaker that fails fast while its recent error rate is high.
+
+The errors raised here subclass requests.exceptions.RequestException, so code
+that already handles failed GitHub calls handles them too.
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, TypeVar
+
+import requests
+from sqlalchemy import event
+
+T = TypeVar("T")
+
+
+class UpstreamUnavailable(requests.exceptions.RequestException):
+    """An upstream call was not attempted or was cut short."""
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    """The request's time budget ran out."""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    """The upstream's circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """A point in time by which the current request must finish."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+_current_deadline: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+def start_deadline(seconds: float) -> contextvars.Token:
+    """Start a deadline for the current context; pass the token to end_deadline."""
+    return _current_deadline.set(Deadline(seconds))
+
+
+def end_deadline(token: contextvars.Token):
+    _current_deadline.reset(token)
+
+
+def current_deadline() -> Deadline | None:
+    return _current_deadline.get()
+
+
+def remaining_time() -> float | None:
+    """Seconds left in the current deadline, or None if there is none."""
+    deadline = _current_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def has_time_for(seconds: float) -> bool:
+    """Whether the current deadline leaves more than the given number of seconds."""
+    remaining = remaining_time()
+    return remaining is None or remaining > seconds
+
+
+def call_timeout(cap: float) -> float:
+    """Timeout for one upstream call: the time left, but at most cap.
+
+    Raises DeadlineExceeded if the deadline has already passed.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return cap
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(cap, remaining)
+
+
+def bounded_call(
+    fn: Callable[[float], T], cap: float, timeout_errors: tuple[type[BaseException], ...]
+) -> T:
+    """Call fn with the timeout from call_timeout(cap).
+
+    A timeout error from a call whose timeout the deadline cut below cap is
+    raised as DeadlineExceeded: it says the request ran out of time, not that
+    the upstream is slow, so circuit breakers don't count it.
+    """
+    timeout = call_timeout(cap)
+    try:
+        return fn(timeout)
+    except timeout_errors as e:
+        if timeout < cap:
+            raise DeadlineExceeded("Request deadline exceeded") from e
+        raise
+
+
+def propagate_deadline(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wrap fn so it runs under the caller's deadline, e.g. in a thread pool."""
+    deadline = _current_deadline.get()
+
+    def wrapper(*args, **kwargs):
+        token = _current_deadline.set(deadline)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_deadline.reset(token)
+
+    return wrapper
+
+
+class CircuitBreaker:
+    """Fails fast while an upstream's recent error rate is too high.
+
+    Outcomes from the last window_seconds are tracked. Once at least
+    min_calls were made and the failure ratio reaches failure_threshold, the
+    breaker opens for cooldown_seconds; then a single probe call is allowed,
+    which closes the breaker on success or re-opens it on failure.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: float = 0.5,
+        min_calls: int = 10,
+        window_seconds: float = 30,
+        cooldown_seconds: float = 15,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.cooldown_seconds:
+                return "open"
+            return "half-open"
+
+    def _before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited < self.cooldown_seconds or self._probing:
+                raise CircuitOpenError(self.name, max(0.0, self.cooldown_seconds - waited))
+            self._probing = True
+
+    def _record(self, success: bool):
+        now = time.monotonic()
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                self._opened_at = None if success else now
+                self._outcomes.clear()
+                return
+            self._outcomes.append((now, success))
+            while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+                self._outcomes.popleft()
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_threshold
+            ):
+                self._opened_at = now
+                self._outcomes.clear()
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        is_failure: Callable[[T], bool] = lambda _: False,
+        ignore: tuple[type[BaseException], ...] = (),
+    ) -> T:
+        """Run fn through the breaker.
+
+        Exceptions count as failures and are re-raised, except those in ignore
+        (errors caused by the request rather than the upstream). is_failure can
+        mark returned values, e.g. HTTP 5xx responses, as failures too.
+        """
+        self._before_call()
+        try:
+            result = fn()
+        except ignore:
+            self._record(True)
+            raise
+        except Exception:
+            self._record(False)
+            raise
+        self._record(not is_failure(result))
+        return result
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+def hedged(fn: Callable[[], T], hedge_after: float) -> T:
+    """Run fn, starting a second identical attempt if the first is slow.
+
+    Only use for idempotent calls. Returns the first successful result; if
+    both attempts fail, the first attempt's exception is raised.
+    """
+    first = _hedge_executor.submit(propagate_deadline(fn))
+    done, _ = wait([first], timeout=hedge_after)
+    if done:
+        return first.result()
+
+    second = _hedge_executor.submit(propagate_deadline(fn))
+    pending = {first, second}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+    return first.result()
+
+
+def install_db_deadline(engine):
+    """Bound every Postgres transaction by the remaining request deadline."""
+
+    @event.listens_for(engine, "begin")
+    def _set_statement_timeout(conn):
+        remaining = remaining_time()
+        if remaining is None or conn.dialect.name != "postgresql":
+            return
+        if remaining <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}")
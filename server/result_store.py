@@ -0,0 +1,64 @@
+"""Helpers for reading and writing CachedResult rows."""
+
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from server.db import db
+from server.models.CachedResult import CachedResult
+
+
+def get_results(
+    kind: str, keys: list[str], max_age: timedelta | None = None
+) -> dict[str, Any]:
+    """Look up many cached results of one kind in a single query.
+
+    Returns a dict containing only the keys that were found (and are younger
+    than max_age, when given).
+    """
+    if not keys:
+        return {}
+    query = select(CachedResult).where(
+        CachedResult.kind == kind, CachedResult.key.in_(keys)
+    )
+    if max_age is not None:
+        query = query.where(CachedResult.created_at >= datetime.now() - max_age)
+    return {row.key: row.value for row in db.session.execute(query).scalars()}
+
+
+def get_result(kind: str, key: str, max_age: timedelta | None = None) -> Any | None:
+    """Look up a single cached result, or None if missing."""
+    return get_results(kind, [key], max_age).get(key)
+
+
+def put_results(kind: str, values: dict[str, Any]):
+    """Insert or replace cached results and commit.
+
+    Uses INSERT ... ON CONFLICT DO UPDATE, so concurrent writers of the same
+    key (two viewers of one PR, a pre-warm job and a click) both succeed.
+    """
+    if not values:
+        return
+    dialect = sqlite if db.session.get_bind().dialect.name == "sqlite" else postgresql
+    statement = dialect.insert(CachedResult.__table__)
+    db.session.execute(
+        statement.on_conflict_do_update(
+            index_elements=["kind", "key"],
+            set_={
+                "value": statement.excluded.value,
+                "created_at": statement.excluded.created_at,
+            },
+        ),
+        [
+            {"kind": kind, "key": key, "value": value, "created_at": datetime.now()}
+            for key, value in values.items()
+        ],
+    )
+    db.session.commit()
+
+
+def put_result(kind: str, key: str, value: Any):
+    """Insert or replace a single cached result and commit."""
+    put_results(kind, {key: value})
@@ -0,0 +1,253 @@
+"""Full-text code search over repository snapshots.
+
+Each repository gets an inverted index ranked with BM25. The index is persisted
+under DATA_DIR and updated incrementally: files whose blob SHA is unchanged are
+never re-fetched or re-tokenized.
+"""
+
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from server.config import DATA_DIR
+from server.git_mirror import path_lock
+from server.resilience import propagate_deadline
+
+SEARCH_INDEX_DIR = os.path.join(DATA_DIR, "search")
+
+# Files larger than this are not indexed (usually data or generated code).
+MAX_INDEXED_FILE_SIZE = 512 * 1024
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+_SUBWORD_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase search terms.
+
+    Identifiers are indexed whole and also split on snake_case and camelCase
+    boundaries, so "getUserToken" matches queries for "get_user_token",
+    "user" and "token".
+    """
+    terms = []
+    for word in _WORD_RE.findall(text):
+        lowered = word.lower()
+        if len(lowered) > 1:
+            terms.append(lowered)
+        parts = [p for chunk in word.split("_") for p in _SUBWORD_RE.findall(chunk)]
+        if len(parts) > 1:
+            terms.extend(p.lower() for p in parts if len(p) > 1)
+    return terms
+
+
+class SearchIndex:
+    """BM25 inverted index over the files of one repository."""
+
+    def __init__(self):
+        # path -> (blob sha, document length in terms)
+        self.documents: dict[str, tuple[str, int]] = {}
+        # term -> {path: term frequency}
+        self.postings: dict[str, dict[str, int]] = {}
+        # path -> distinct terms, so a document can be removed without a scan
+        self.document_terms: dict[str, tuple[str, ...]] = {}
+        self.total_length = 0
+        self.tree_sha: str | None = None
+
+    def add_document(self, path: str, sha: str, text: str):
+        """Index (or re-index) the contents of a file."""
+        if path in self.documents:
+            self.remove_document(path)
+
+        terms = tokenize(path) + tokenize(text)
+        counts = Counter(terms)
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[path] = tf
+        self.documents[path] = (sha, len(terms))
+        self.document_terms[path] = tuple(counts)
+        self.total_length += len(terms)
+
+    def remove_document(self, path: str):
+        """Drop a file from the index."""
+        sha_and_length = self.documents.pop(path, None)
+        if sha_and_length is None:
+            return
+        self.total_length -= sha_and_length[1]
+        for term in self.document_terms.pop(path, ()):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(path, None)
+            if not posting:
+                del self.postings[term]
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        """Return the best matching files for a query, highest score first."""
+        n_docs = len(self.documents)
+        if n_docs == 0:
+            return []
+        avg_length = self.total_length / n_docs
+
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for path, tf in posting.items():
+                length = self.documents[path][1]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                scores[path] = scores.get(path, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            {"path": path, "sha": self.documents[path][0], "score": round(score, 4)}
+            for path, score in ranked
+        ]
+
+    def update_from_tree(
+        self, tree: dict, fetch_blob: Callable[[str], bytes], max_workers: int = 8
+    ) -> dict:
+        """Bring the index in line with a GitHub tree snapshot.
+
+        Only blobs whose SHA differs from the indexed one are fetched. Returns
+        counts of added/updated, removed and unchanged files.
+        """
+        wanted = {
+            entry["path"]: entry["sha"]
+            for entry in tree.get("tree", [])
+            if entry.get("type") == "blob"
+            and entry.get("size", 0) <= MAX_INDEXED_FILE_SIZE
+        }
+
+        removed = [path for path in self.documents if path not in wanted]
+        for path in removed:
+            self.remove_document(path)
+
+        changed = [
+            (path, sha)
+            for path, sha in wanted.items()
+            if self.documents.get(path, (None,))[0] != sha
+        ]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            contents = executor.map(propagate_deadline(lambda item: fetch_blob(item[1])), changed)
+            for (path, sha), data in zip(changed, contents):
+                if b"\0" in data[:8000]:
+                    # Binary file; remember the SHA so it isn't re-fetched.
+                    self.add_document(path, sha, "")
+                    continue
+                self.add_document(path, sha, data.decode("utf-8", errors="replace"))
+
+        self.tree_sha = tree.get("sha")
+        return {
+            "updated": len(changed),
+            "removed": len(removed),
+            "unchanged": len(wanted) - len(changed),
+            "documents": len(self.documents),
+        }
+
+    def save(self, file_path: str):
+        """Atomically write the index to disk."""
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str) -> "SearchIndex":
+        """Read an index previously written with save()."""
+        with open(file_path, "rb") as f:
+            return pickle.load(f)
+
+
+# Indexes kept loaded in each process; the least recently used is dropped first.
+MAX_LOADED_INDEXES = 16
+
+# Indexes loaded in this process, keyed by file path, with the file mtime they
+# were loaded at so that rebuilds by other workers are picked up.
+_loaded_indexes: OrderedDict[str, tuple[float, SearchIndex]] = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def index_path(repo_owner: str, repo_name: str) -> str:
+    """Location of a repository's persisted index."""
+    return os.path.join(SEARCH_INDEX_DIR, f"{repo_owner}__{repo_name}.pickle")
+
+
+def has_index(repo_owner: str, repo_name: str) -> bool:
+    """Whether a repository's index has been built, without loading it."""
+    return os.path.exists(index_path(repo_owner, repo_name))
+
+
+def get_index(repo_owner: str, repo_name: str) -> SearchIndex | None:
+    """Return the persisted index for a repository, or None if not built yet."""
+    file_path = index_path(repo_owner, repo_name)
+    try:
+        mtime = os.path.getmtime(file_path)
+    except OSError:
+        return None
+
+    with _index_lock:
+        loaded = _loaded_indexes.get(file_path)
+        if loaded is not None and loaded[0] == mtime:
+            _loaded_indexes.move_to_end(file_path)
+            return loaded[1]
+    # Unpickling a large index takes a while; searches of other repositories
+    # aren't held up by it.
+    index = SearchIndex.load(file_path)
+    _remember(file_path, mtime, index)
+    return index
+
+
+def _remember(file_path: str, mtime: float, index: SearchIndex):
+    with _index_lock:
+        loaded = _loaded_indexes.get(file_path)
+        if loaded is not None and loaded[0] > mtime:
+            # A newer version was loaded meanwhile.
+            return
+        _loaded_indexes[file_path] = (mtime, index)
+        _loaded_indexes.move_to_end(file_path)
+        while len(_loaded_indexes) > MAX_LOADED_INDEXES:
+            _loaded_indexes.popitem(last=False)
+
+
+def refresh_index(
+    repo_owner: str, repo_name: str, tree: dict, fetch_blob: Callable[[str], bytes]
+) -> dict:
+    """Update (or build) a repository's index from a tree snapshot and persist it.
+
+    The update runs on a private copy loaded from disk, so searches served from
+    the shared in-memory index are never blocked or see a half-updated index.
+    Refreshes of one repository are serialized across processes; refreshes of
+    different repositories run concurrently.
+    """
+    file_path = index_path(repo_owner, repo_name)
+    with path_lock(file_path):
+        if os.path.exists(file_path):
+            index = SearchIndex.load(file_path)
+        else:
+            index = SearchIndex()
+
+        if index.tree_sha == tree.get("sha"):
+            return {
+                "updated": 0,
+                "removed": 0,
+                "unchanged": len(index.documents),
+                "documents": len(index.documents),
+            }
+
+        stats = index.update_from_tree(tree, fetch_blob)
+        index.save(file_path)
+        mtime = os.path.getmtime(file_path)
+
+    _remember(file_path, mtime, index)
+    return stats
@@ -0,0 +1,163 @@
+"""Background job handlers.
+
+Importing this module registers the handlers with server.jobs, so both the web
+app (to validate submitted kinds) and worker processes import it. Kinds
+registered with a payload validator may be submitted by users; the rest are
+queued by the server (webhooks, the contributors endpoint) only.
+"""
+
+import os
+import re
+from functools import partial
+
+from sqlalchemy import select
+
+from server.analysis import analyze_file_cached, analyze_folder_path
+from server.db import db
+from server.duplicates import SOURCE_EXTENSIONS
+from server.git_mirror import get_contributor_stats
+from server.github import get_blob, get_file_content, get_tree
+from server.jobs import job_handler
+from server.leaderboard import rebuild_leaderboard
+from server.models.Job import Job
+from server.models.User import User
+from server.overview import OVERVIEW_KIND, fetch_overview, overview_key
+from server.result_store import put_result
+from server.search import refresh_index
+from server.trends import get_trend
+from server.triage import SKIP, TriageStats, triage_content, triage_path, triage_totals
+
+_NAME_RE = re.compile(r"[\w.-]+")
+_REF_RE = re.compile(r"[\w./-]+")
+
+
+def _repo_payload(payload: dict, ref_key: str | None = None) -> dict:
+    """Validate a submitted {"owner", "repo"} payload, plus an optional ref-like key."""
+    allowed = {"owner", "repo"} | ({ref_key} if ref_key else set())
+    unexpected = set(payload) - allowed
+    if unexpected:
+        raise ValueError(f"Unexpected payload keys: {sorted(unexpected)}")
+    for key in ("owner", "repo"):
+        if not isinstance(payload.get(key), str) or not _NAME_RE.fullmatch(payload[key]):
+            raise ValueError(f"payload.{key} must be a GitHub owner or repository name")
+    if ref_key and ref_key in payload and (
+        not isinstance(payload[ref_key], str) or not _REF_RE.fullmatch(payload[ref_key])
+    ):
+        raise ValueError(f"payload.{ref_key} must be a branch, tag or commit")
+    return {key: payload[key] for key in allowed if key in payload}
+
+
+def _github_token(job: Job) -> str:
+    user = db.session.execute(
+        select(User).where(User.github_username == job.user_id)
+    ).scalar_one_or_none()
+    if user is None or not user.github_access_token:
+        raise ValueError(f"No GitHub token for user {job.user_id}")
+    return user.github_access_token
+
+
+@job_handler("analyze_folder")
+def analyze_folder_job(job: Job, report_progress) -> dict:
+    """Payload: {"folder_path": ...}. Same result as POST /api/analyze/folder."""
+    folder_path = job.payload["folder_path"]
+    if not os.path.isdir(folder_path):
+        raise ValueError(f"Invalid folder path: {folder_path}")
+    return analyze_folder_path(folder_path, on_progress=report_progress)
+
+
+@job_handler("search_index", validate_payload=partial(_repo_payload, ref_key="ref"))
+def search_index_job(job: Job, report_progress) -> dict:
+    """Payload: {"owner": ..., "repo": ..., "ref": ...}. Refreshes the search index."""
+    owner, repo = job.payload["owner"], job.payload["repo"]
+    token = _github_token(job)
+    report_progress(0.0, "Fetching repository tree")
+    tree = get_tree(owner, repo, token, job.payload.get("ref", "HEAD"))
+    report_progress(0.1, f"Indexing {len(tree.get('tree', []))} tree entries")
+    return refresh_index(owner, repo, tree, lambda sha: get_blob(owner, repo, sha, token))
+
+
+@job_handler("prewarm_search_index")
+def prewarm_search_index_job(job: Job, report_progress) -> dict:
+    """Payload: {"owner", "repo", "sha"}. Brings a built search index up to the pushed commit."""
+    owner, repo, sha = job.payload["owner"], job.payload["repo"], job.payload["sha"]
+    token = _github_token(job)
+    tree = get_tree(owner, repo, token, sha)
+    report_progress(0.1, f"Indexing {len(tree.get('tree', []))} tree entries")
+    return refresh_index(owner, repo, tree, lambda blob_sha: get_blob(owner, repo, blob_sha, token))
+
+
+@job_handler("git_contributors", validate_payload=_repo_payload)
+def git_contributors_job(job: Job, report_progress) -> dict:
+    """Payload: {"owner", "repo"}. Fetches the mirror and caches contributor stats."""
+    owner, repo = job.payload["owner"], job.payload["repo"]
+    stats = get_contributor_stats(owner, repo, _github_token(job))
+    return {"contributors": len(stats)}
+
+
+@job_handler("code_trends", validate_payload=partial(_repo_payload, ref_key="branch"))
+def code_trends_job(job: Job, report_progress) -> dict:
+    """Payload: {"owner", "repo", "branch"?}. Extends the code trend table."""
+    owner, repo = job.payload["owner"], job.payload["repo"]
+    table, head, _ = get_trend(owner, repo, _github_token(job), job.payload.get("branch"))
+    return {"head": head, "commits": table.size}
+
+
+@job_handler("rebuild_leaderboard")
+def rebuild_leaderboard_job(job: Job, report_progress) -> dict:
+    """No payload. Recomputes puzzle scores and ranks from all submissions.
+
+    Deletes and rewrites every PuzzleUser and LeaderboardEntry row, so it is
+    queued by operators only, never through POST /api/jobs.
+    """
+    return rebuild_leaderboard()
+
+
+@job_handler("prewarm_overview")
+def prewarm_overview_job(job: Job, report_progress) -> dict:
+    """Payload: {"owner", "repo"}. Recomputes the job user's cached overview stats."""
+    owner, repo = job.payload["owner"], job.payload["repo"]
+    token = _github_token(job)
+    overview = fetch_overview(owner, repo, token)
+    if overview is None:
+        raise LookupError(f"Repository {owner}/{repo} not found")
+    # Only served to the same token; see overview.get_overviews.
+    put_result(OVERVIEW_KIND, overview_key(f"{owner}/{repo}", token), overview)
+    return overview
+
+
+@job_handler("prewarm_files")
+def prewarm_files_job(job: Job, report_progress) -> dict:
+    """Payload: {"owner", "repo", "sha", "paths"}. Analyzes changed source files.
+
+    Results land in the same content-hash cache that /api/analyze/file reads.
+    """
+    owner, repo, sha = job.payload["owner"], job.payload["repo"], job.payload["sha"]
+    token = _github_token(job)
+    paths = [
+        path for path in job.payload["paths"]
+        if os.path.splitext(path)[1] in SOURCE_EXTENSIONS
+    ]
+    triage = TriageStats(parent=triage_totals)
+    analyzed = failed = 0
+    for index, path in enumerate(paths):
+        report_progress(index / len(paths), f"Analyzing {path}")
+        by_path = triage_path(path)
+        if by_path.decision == SKIP:
+            triage.record(by_path)
+            continue
+        content = get_file_content(owner, repo, path, token, ref=sha)
+        verdict = triage_content(content)
+        if verdict.decision == SKIP:
+            triage.record(verdict, content)
+            continue
+        result = analyze_file_cached(content.decode("utf-8", errors="replace"))
+        if "error" in result:
+            failed += 1
+        else:
+            analyzed += 1
+    return {
+        "analyzed": analyzed,
+        "failed": failed,
+        "skipped": len(job.payload["paths"]) - len(paths),
+        "triage": triage.to_dict(),
+    }
@@ -0,0 +1,308 @@
+"""Code-quality trends over a branch's history, built incrementally.
+
+A TrendTable holds one row per commit on the branch's first-parent history,
+oldest first: lines of code, cyclomatic complexity and maintainability index
+summed over the repository's source files (see server/metrics.py). Rows are
+kept in NumPy columns and saved under DATA_DIR/trends along with the metrics
+of every file at the last commit.
+
+The history is read from the repository's mirror (see server/git_mirror.py)
+with `git log --raw`, which lists the blobs each commit changed. Only those
+blobs are measured, and blob metrics are cached by SHA, so building the table
+costs one pass over the history and extending it after a push costs only the
+files the new commits changed. If the branch was rewritten, the table is
+rebuilt.
+
+    python3 -m server.trends /path/to/repo
+"""
+
+import codecs
+import os
+import tempfile
+import time
+from urllib.parse import quote
+
+import numpy as np
+
+from server.config import DATA_DIR
+from server.duplicates import SOURCE_EXTENSIONS
+from server.git_mirror import (
+    BlobReader,
+    GitError,
+    github_remote,
+    mirror_path,
+    path_lock,
+    run_git,
+    stream_git,
+    update_mirror,
+)
+from server.github import check_repo_access
+from server.metrics import blob_metrics
+from server.resilience import has_time_for
+
+# A walk stops early (saving what it has) when the request deadline leaves
+# less than this many seconds; the next call picks up from there.
+SAVE_MARGIN_SECONDS = 5
+# Most points returned in a series; longer histories are sampled evenly.
+DEFAULT_POINTS = 500
+
+_COMMIT_MARKER = "\x1e"
+_FILE_MODES = {"100644", "100755"}
+_COLUMNS = {
+    "timestamp": np.int64,
+    "files": np.int32,
+    "lines_of_code": np.int64,
+    "cyclomatic_complexity": np.int64,
+    # Sum of maintainability index times lines of code, so the average can be
+    # weighted by file size.
+    "weighted_mi": np.float64,
+}
+
+
+def _unquote(path: str) -> str:
+    """Undo git's C-style quoting of unusual paths."""
+    if not path.startswith('"'):
+        return path
+    return codecs.escape_decode(path[1:-1])[0].decode("utf-8", errors="replace")
+
+
+class TrendTable:
+    """Per-commit repository totals, plus the per-file state to extend them."""
+
+    def __init__(self):
+        self.size = 0
+        self.shas = np.empty(0, dtype="S40")
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        # path -> (blob sha, lines of code, complexity, weighted MI) at the last row.
+        self.files: dict[str, tuple[str, int, int, float]] = {}
+        self._totals = [0, 0, 0.0]
+
+    @property
+    def last_sha(self) -> str | None:
+        return self.shas[self.size - 1].decode() if self.size else None
+
+    def update_file(self, path: str, sha: str | None, metrics: dict | None = None):
+        """Set a file's metrics for the next row; sha None removes the file."""
+        old = self.files.pop(path, None)
+        if old is not None:
+            self._totals[0] -= old[1]
+            self._totals[1] -= old[2]
+            self._totals[2] -= old[3]
+        if sha is not None:
+            lines = metrics["lines_of_code"]
+            entry = (sha, lines, metrics["cyclomatic_complexity"], metrics["maintainability_index"] * lines)
+            self.files[path] = entry
+            self._totals[0] += entry[1]
+            self._totals[1] += entry[2]
+            self._totals[2] += entry[3]
+
+    def append(self, sha: str, timestamp: int):
+        """Add a row for commit sha with the current file state."""
+        if self.size == len(self.shas):
+            capacity = max(64, 2 * self.size)
+            self.shas = np.resize(self.shas, capacity)
+            self.columns = {name: np.resize(column, capacity) for name, column in self.columns.items()}
+        row = self.size
+        self.shas[row] = sha.encode()
+        self.columns["timestamp"][row] = timestamp
+        self.columns["files"][row] = len(self.files)
+        self.columns["lines_of_code"][row] = self._totals[0]
+        self.columns["cyclomatic_complexity"][row] = self._totals[1]
+        self.columns["weighted_mi"][row] = self._totals[2]
+        self.size += 1
+
+    def series(self, points: int = DEFAULT_POINTS) -> dict:
+        """Columns for up to points commits, evenly spaced and always including the last."""
+        if self.size > points > 0:
+            rows = np.unique(np.linspace(0, self.size - 1, points).round().astype(np.int64))
+        else:
+            rows = np.arange(self.size)
+        lines = self.columns["lines_of_code"][rows]
+        weighted_mi = self.columns["weighted_mi"][rows]
+        return {
+            "sha": [sha.decode() for sha in self.shas[rows]],
+            "timestamp": self.columns["timestamp"][rows],
+            "files": self.columns["files"][rows],
+            "lines_of_code": lines,
+            "cyclomatic_complexity": self.columns["cyclomatic_complexity"][rows],
+            # NaN (null in JSON) while there is no code.
+            "maintainability_index": np.round(
+                np.divide(weighted_mi, lines, out=np.full(len(rows), np.nan), where=lines > 0), 2
+            ),
+        }
+
+    def save(self, path: str):
+        """Write the table to path atomically."""
+        paths = list(self.files)
+        state = np.array([self.files[p][1:] for p in paths], dtype=np.float64).reshape(-1, 3)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, staging = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    shas=self.shas[:self.size],
+                    **{name: column[:self.size] for name, column in self.columns.items()},
+                    file_paths=np.array(paths, dtype=np.str_),
+                    file_shas=np.array([self.files[p][0] for p in paths], dtype="S40"),
+                    file_metrics=state,
+                )
+            os.replace(staging, path)
+        except BaseException:
+            os.unlink(staging)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "TrendTable":
+        table = cls()
+        with np.load(path) as data:
+            table.shas = data["shas"]
+            table.size = len(table.shas)
+            table.columns = {name: data[name].astype(dtype) for name, dtype in _COLUMNS.items()}
+            for path_, sha, (lines, complexity, weighted_mi) in zip(
+                data["file_paths"], data["file_shas"], data["file_metrics"]
+            ):
+                table.files[str(path_)] = (sha.decode(), int(lines), int(complexity), float(weighted_mi))
+        table._totals = [
+            sum(f[1] for f in table.files.values()),
+            sum(f[2] for f in table.files.values()),
+            sum(f[3] for f in table.files.values()),
+        ]
+        return table
+
+
+def extend_trend(table: TrendTable, repo_path: str, rev: str) -> bool:
+    """Add rows for the first-parent commits after the table's last one, up to rev.
+
+    Returns whether rev was reached; False if the deadline cut the walk short.
+    """
+    log_range = f"{table.last_sha}..{rev}" if table.size else rev
+    log_format = f"--format={_COMMIT_MARKER}%H%x1f%ct"
+    commit = None
+    with BlobReader(repo_path) as blobs:
+        lines = stream_git(
+            repo_path, "log", "--reverse", "--first-parent", "--diff-merges=first-parent",
+            "--root", "--raw", "--no-renames", "--no-abbrev", log_format, log_range,
+        )
+        try:
+            for line in lines:
+                if line.startswith(_COMMIT_MARKER):
+                    if commit is not None:
+                        table.append(*commit)
+                        commit = None
+                        if not has_time_for(SAVE_MARGIN_SECONDS):
+                            return False
+                    sha, timestamp = line[1:].split("\x1f")
+                    commit = (sha, int(timestamp))
+                elif line.startswith(":"):
+                    meta, path = line[1:].split("\t", 1)
+                    _, new_mode, _, new_sha, status = meta.split(" ")
+                    path = _unquote(path)
+                    if os.path.splitext(path)[1] not in SOURCE_EXTENSIONS:
+                        continue
+                    if status == "D" or new_mode not in _FILE_MODES:
+                        table.update_file(path, None)
+                    else:
+                        metrics = blob_metrics(path, new_sha, lambda: blobs.read(new_sha))
+                        table.update_file(path, new_sha, metrics)
+        finally:
+            lines.close()
+    if commit is not None:
+        table.append(*commit)
+    return True
+
+
+def trend_path(repo_owner: str, repo_name: str, branch: str | None = None) -> str:
+    return os.path.join(
+        DATA_DIR, "trends", f"{repo_owner}__{repo_name}__{quote(branch or 'HEAD', safe='')}.npz"
+    )
+
+
+def has_trend(repo_owner: str, repo_name: str, branch: str | None = None) -> bool:
+    return os.path.exists(trend_path(repo_owner, repo_name, branch))
+
+
+def _is_ancestor(repo_path: str, ancestor: str, rev: str) -> bool:
+    try:
+        run_git(repo_path, "merge-base", "--is-ancestor", ancestor, rev)
+        return True
+    except GitError:
+        return False
+
+
+def update_trend(repo_path: str, rev: str, table_path: str) -> tuple[TrendTable, bool]:
+    """Bring the table saved at table_path up to rev in the repository at repo_path.
+
+    Returns the table and whether it reached rev.
+    """
+    with path_lock(table_path):
+        table = TrendTable.load(table_path) if os.path.exists(table_path) else TrendTable()
+        if table.last_sha == rev:
+            return table, True
+        if table.size and not _is_ancestor(repo_path, table.last_sha, rev):
+            # History was rewritten; start over.
+            table = TrendTable()
+        complete = extend_trend(table, repo_path, rev)
+        table.save(table_path)
+    return table, complete
+
+
+def get_trend(
+    repo_owner: str, repo_name: str, token: str, branch: str | None = None
+) -> tuple[TrendTable, str, bool]:
+    """The trend table of a GitHub repository's branch (default branch if None).
+
+    Returns the table, the branch's head SHA and whether the table reached it.
+    Raises LookupError for an unknown branch, GitError if git fails and
+    requests.exceptions.RequestException if token can't read the repository
+    (tables and mirrors are shared between users).
+    """
+    check_repo_access(repo_owner, repo_name, token)
+    path = mirror_path(repo_owner, repo_name)
+    head = update_mirror(github_remote(repo_owner, repo_name), path, token)
+    if branch is not None:
+        try:
+            head = run_git(path, "rev-parse", "--verify", f"refs/heads/{branch}^{{commit}}").strip()
+        except GitError:
+            raise LookupError(f"Unknown branch {branch}")
+    table, complete = update_trend(path, head, trend_path(repo_owner, repo_name, branch))
+    return table, head, complete
+
+
+if __name__ == "__main__":
+    import sys
+
+    source = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        repo_path = os.path.join(scratch, "mirror.git")
+        table_path = os.path.join(scratch, "trend.npz")
+        head = update_mirror(source, repo_path)
+        start = time.perf_counter()
+        table, _ = update_trend(repo_path, head, table_path)
+        built = time.perf_counter()
+        table, _ = update_trend(repo_path, head, table_path)
+        reloaded = time.perf_counter()
+        print(
+            f"{table.size} commits in {built - start:.2f}s; up-to-date check {reloaded - built:.3f}s;"
+            f" {len(table.files)} source files at HEAD"
+        )
+        series = table.series(10)
+        for i, sha in enumerate(series["sha"]):
+            print(
+                f"{sha[:10]} {time.strftime('%Y-%m-%d', time.gmtime(series['timestamp'][i]))}"
+                f" files={series['files'][i]} loc={series['lines_of_code'][i]}"
+                f" cc={series['cyclomatic_complexity'][i]} mi={series['maintainability_index'][i]}"
+            )
+        # Cross-check the incremental totals against measuring HEAD's tree directly.
+        lines = complexity = 0
+        with BlobReader(repo_path) as blobs:
+            for entry in run_git(repo_path, "ls-tree", "-r", "-z", head).split("\0"):
+                if not entry:
+                    continue
+                meta, path = entry.split("\t", 1)
+                mode, _, sha = meta.split(" ")
+                if mode in _FILE_MODES and os.path.splitext(path)[1] in SOURCE_EXTENSIONS:
+                    metrics = blob_metrics(path, sha, lambda: blobs.read(sha))
+                    lines += metrics["lines_of_code"]
+                    complexity += metrics["cyclomatic_complexity"]
+        print(f"HEAD tree: loc={lines} cc={complexity}")
@@ -0,0 +1,290 @@
+"""Cheap triage of files before they are sent to the model.
+
+Generated code, vendored dependencies, minified bundles and binary data cost
+as many tokens as real source code and tell us nothing about it. triage_file
+classifies a file from signals that are much cheaper than an LLM call:
+
+- its path: vendored or virtualenv directories, generated-file names such as
+  *_pb2.py or *.min.js, and migrations;
+- .gitattributes linguist hints (linguist-generated, linguist-vendored,
+  linguist-documentation), which override the path rules either way;
+- its first bytes: NUL bytes or undecodable data, and generated-code banners
+  such as Go's "Code generated ... DO NOT EDIT." comment;
+- line statistics: long lines on average or several very long lines
+  (minified code) and high-entropy content (embedded base64 or other encoded
+  data).
+
+The outcome is SKIP (not worth analyzing), LOW (analyze last, e.g.
+migrations) or ANALYZE. TriageStats counts what was skipped and roughly how
+many tokens that saved.
+"""
+
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import NamedTuple
+
+from server.compaction import count_tokens
+
+SKIP = "skip"
+LOW = "low"
+ANALYZE = "analyze"
+
+# Bytes examined when sniffing content.
+SNIFF_BYTES = 8192
+# Files larger than this are skipped outright.
+MAX_FILE_BYTES = 1024 * 1024
+# Minified code: lines this long on average, or several lines over
+# MAX_LINE_LENGTH. A single long line (a big SQL, regex or data literal in a
+# normal module) isn't enough; compaction shortens it instead.
+MAX_LINE_LENGTH = 1000
+MAX_AVERAGE_LINE_LENGTH = 200
+MIN_LONG_LINES = 3
+# ... which must also be at least this fraction of the lines sniffed.
+MIN_LONG_LINE_FRACTION = 0.05
+# Bits per byte above which long-lined content is encoded data, not code;
+# source code is typically around 4.5 to 5.
+MAX_ENTROPY = 5.8
+
+SKIPPED_DIRECTORIES = frozenset({
+    ".git", ".hg", ".svn", "node_modules", "bower_components", "third_party",
+    "third-party", "site-packages", "dist-packages", "__pycache__", ".venv", "venv",
+    ".tox", ".nox", ".mypy_cache", ".pytest_cache", ".eggs", ".next", ".nuxt",
+    "htmlcov", "Pods",
+})
+# Output and dependency directories whose names are also ordinary package
+# names (app/coverage/calc.py), so they're only skipped at the repository root.
+ROOT_SKIPPED_DIRECTORIES = frozenset({"build", "dist", "coverage", "vendor"})
+_GENERATED_NAME_RE = re.compile(
+    r"(_pb2(_grpc)?\.pyi?|\.pb\.(go|cc|h)|_pb\.(js|ts|d\.ts)|\.min\.(js|css)|\.bundle\.js"
+    r"|\.map|\.g\.dart|\.designer\.cs|_generated\.\w+|\.generated\.\w+"
+    r"|^(package-lock\.json|yarn\.lock|pnpm-lock\.yaml|poetry\.lock|Pipfile\.lock|Cargo\.lock|go\.sum))$"
+)
+_MIGRATION_RE = re.compile(r"(^|/)migrations/\d{4}_\w+\.py$|(^|/)alembic/versions/")
+# The conventional markers of generated code, in a comment at the start of a
+# line: Phabricator/Meta's tag, Go's "Code generated ... DO NOT EDIT." and
+# protoc's header. Prose that merely mentions generated code doesn't match.
+_GENERATED_BANNER_RE = re.compile(
+    rb"^[ \t]*(?:#|//|/\*|\*|--|;|<!--)[^\n]*?"
+    rb"(?:@generated\b|Code generated [^\n]*DO NOT EDIT|Generated by the protocol buffer compiler)",
+    re.MULTILINE,
+)
+# Banners only count in the first few lines.
+_BANNER_BYTES = 1024
+
+
+class Triage(NamedTuple):
+    decision: str
+    reason: str
+
+
+_ANALYZE = Triage(ANALYZE, "")
+
+
+class GitAttributes:
+    """The linguist attributes from a .gitattributes file.
+
+    Supports the pattern forms used in practice: names without a slash match
+    at any depth, patterns with a slash are relative to the file's directory,
+    "**" matches across directories, and later lines override earlier ones.
+    """
+
+    _LINGUIST = ("linguist-generated", "linguist-vendored", "linguist-documentation")
+
+    def __init__(self, text: str = ""):
+        # (compiled pattern, {attribute: bool})
+        self.rules: list[tuple[re.Pattern, dict[str, bool]]] = []
+        for line in text.splitlines():
+            parts = line.split()
+            if not parts or parts[0].startswith("#"):
+                continue
+            values = {}
+            for attribute in parts[1:]:
+                name, _, value = attribute.lstrip("-!").partition("=")
+                if name in self._LINGUIST:
+                    values[name] = not attribute.startswith(("-", "!")) and value.lower() not in ("false", "0")
+            if values:
+                self.rules.append((self._compile(parts[0]), values))
+
+    @staticmethod
+    def _compile(pattern: str) -> re.Pattern:
+        anchored = "/" in pattern.rstrip("/")
+        parts = []
+        for token in re.split(r"(\*\*/|/\*\*$|\*\*|\*|\?|\[[^]]*\])", pattern.strip("/")):
+            if token == "**/":
+                parts.append("(?:.*/)?")
+            elif token in ("/**", "**"):
+                parts.append("/.*" if token == "/**" else ".*")
+            elif token == "*":
+                parts.append("[^/]*")
+            elif token == "?":
+                parts.append("[^/]")
+            elif token.startswith("[") and token.endswith("]"):
+                parts.append(token.replace("[!", "[^", 1))
+            else:
+                parts.append(re.escape(token))
+        regex = "".join(parts) + r"\Z"
+        return re.compile(regex if anchored else r"(?:.*/)?" + regex)
+
+    @classmethod
+    def from_directory(cls, directory: str) -> "GitAttributes":
+        try:
+            with open(os.path.join(directory, ".gitattributes"), encoding="utf-8") as f:
+                return cls(f.read())
+        except OSError:
+            return cls()
+
+    def linguist(self, path: str) -> dict[str, bool]:
+        """The linguist attributes set for path, e.g. {"linguist-generated": True}."""
+        values: dict[str, bool] = {}
+        for pattern, attributes in self.rules:
+            if pattern.match(path):
+                values.update(attributes)
+        return values
+
+
+def is_skipped_directory(name: str, at_root: bool = False) -> bool:
+    """Whether a directory called name isn't worth walking; at_root if it's top-level."""
+    return (
+        name in SKIPPED_DIRECTORIES
+        or (at_root and name in ROOT_SKIPPED_DIRECTORIES)
+        or name.endswith(".egg-info")
+    )
+
+
+def triage_path(path: str, attributes: GitAttributes | None = None) -> Triage:
+    """Classify a file from its (repository-relative) path alone."""
+    path = path.replace(os.sep, "/").removeprefix("./")
+    linguist = attributes.linguist(path) if attributes is not None else {}
+    if linguist.get("linguist-generated"):
+        return Triage(SKIP, "marked linguist-generated")
+    if linguist.get("linguist-vendored"):
+        return Triage(SKIP, "marked linguist-vendored")
+    if linguist.get("linguist-documentation"):
+        return Triage(LOW, "marked linguist-documentation")
+    directories = path.split("/")[:-1]
+    # An explicit linguist-vendored=false or linguist-generated=false
+    # overrides the path rules below.
+    if linguist.get("linguist-vendored") is not False:
+        for depth, directory in enumerate(directories):
+            if is_skipped_directory(directory, at_root=depth == 0):
+                return Triage(SKIP, f"inside {directory}/")
+    if linguist.get("linguist-generated") is not False:
+        if _GENERATED_NAME_RE.search(path.rsplit("/", 1)[-1]):
+            return Triage(SKIP, "generated file name")
+        if _MIGRATION_RE.search(path):
+            return Triage(LOW, "database migration")
+    return _ANALYZE
+
+
+def entropy(data: bytes) -> float:
+    """Shannon entropy of data in bits per byte."""
+    if not data:
+        return 0.0
+    total = len(data)
+    return -sum(n / total * math.log2(n / total) for n in Counter(data).values())
+
+
+def triage_content(content: bytes | str) -> Triage:
+    """Classify a file from its content alone."""
+    if isinstance(content, str):
+        # Text decoded with errors="replace" carries binary data as U+FFFD.
+        head_text = content[:SNIFF_BYTES]
+        if "\x00" in head_text or head_text.count("�") > len(head_text) // 20:
+            return Triage(SKIP, "binary content")
+        data = content.encode("utf-8", errors="replace")
+    else:
+        data = content
+        if b"\x00" in data[:SNIFF_BYTES]:
+            return Triage(SKIP, "binary content")
+    if len(data) > MAX_FILE_BYTES:
+        return Triage(SKIP, f"larger than {MAX_FILE_BYTES // 1024} KiB")
+    head = data[:SNIFF_BYTES]
+    if _GENERATED_BANNER_RE.search(head[:_BANNER_BYTES]):
+        return Triage(SKIP, "generated-code banner")
+    lines = head.splitlines() or [b""]
+    long_lines = sum(1 for line in lines if len(line) > MAX_LINE_LENGTH)
+    average = len(head) / len(lines)
+    if average > MAX_AVERAGE_LINE_LENGTH or (
+        long_lines >= MIN_LONG_LINES and long_lines >= len(lines) * MIN_LONG_LINE_FRACTION
+    ):
+        if entropy(head) > MAX_ENTROPY:
+            return Triage(SKIP, "encoded data")
+        return Triage(SKIP, "minified")
+    return _ANALYZE
+
+
+def triage_file(
+    path: str | None, content: bytes | str, attributes: GitAttributes | None = None
+) -> Triage:
+    """Classify a file from its path (if known) and content.
+
+    Path-based SKIPs win, then content-based ones; a LOW from the path
+    stands if the content looks fine.
+    """
+    by_path = triage_path(path, attributes) if path else _ANALYZE
+    if by_path.decision == SKIP:
+        return by_path
+    by_content = triage_content(content)
+    return by_content if by_content.decision == SKIP else by_path
+
+
+def estimate_tokens(content: bytes | str) -> int:
+    """Tokens sending content to the model would have cost, roughly."""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+    return count_tokens(content)
+
+
+class TriageStats:
+    """What triage kept away from the model."""
+
+    def __init__(self, parent: "TriageStats | None" = None):
+        """Counts recorded here are also recorded in parent, if given."""
+        self.parent = parent
+        self.files_skipped = 0
+        self.files_deprioritized = 0
+        self.directories_pruned = 0
+        self.tokens_avoided = 0
+        self.reasons: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, triage: Triage, content: bytes | str | None = None) -> int:
+        """Count a triaged file; returns the tokens avoided if it was skipped."""
+        tokens = estimate_tokens(content) if triage.decision == SKIP and content is not None else 0
+        self._add(triage, tokens)
+        return tokens
+
+    def _add(self, triage: Triage, tokens: int):
+        with self._lock:
+            if triage.decision == SKIP:
+                self.files_skipped += 1
+                self.reasons[triage.reason] += 1
+                self.tokens_avoided += tokens
+            elif triage.decision == LOW:
+                self.files_deprioritized += 1
+        if self.parent is not None:
+            self.parent._add(triage, tokens)
+
+    def record_pruned_directory(self, name: str):
+        with self._lock:
+            self.directories_pruned += 1
+            self.reasons[f"inside {name}/"] += 1
+        if self.parent is not None:
+            self.parent.record_pruned_directory(name)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "files_skipped": self.files_skipped,
+                "files_deprioritized": self.files_deprioritized,
+                "directories_pruned": self.directories_pruned,
+                "tokens_avoided": self.tokens_avoided,
+                "reasons": dict(self.reasons.most_common()),
+            }
+
+
+# Totals for this process, across all requests and jobs.
+triage_totals = TriageStats()
@@ -0,0 +1,39 @@
+"""Shared fixtures: an app on a throwaway SQLite database with a signed-in user."""
+
+import os
+import tempfile
+
+_data_dir = tempfile.mkdtemp()
+# server/config.py requires every setting.
+for _name, _value in {
+    "FRONTEND_URL": "http://localhost:5173",
+    "BACKEND_URL": "http://localhost:2000",
+    "DATABASE_URL": f"sqlite:///{_data_dir}/test.db",
+    "DATA_DIR": _data_dir,
+    "GITHUB_CLIENT_ID": "test",
+    "GITHUB_CLIENT_SECRET": "test",
+    "OPENAI_API_KEY": "sk-test",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import pytest  # noqa: E402
+
+from server import create_app, db  # noqa: E402
+from server.models.User import User  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    with app.app_context():
+        db.session.add(User(github_username="alice", github_access_token="token"))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user"] = {"login": "alice"}
+    return client
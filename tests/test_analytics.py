@@ -0,0 +1,63 @@
+"""Commit series reads concurrent with backfills, and the per-process series LRU."""
+
+import threading
+
+from server import analytics
+from server.analytics import CommitSeries, get_series
+
+DAY = 86400
+
+
+def test_rollup_during_backfill_sees_consistent_arrays():
+    series = CommitSeries()
+    series.add_commits([(f"new{i}", 2000 * DAY + i * DAY, "alice") for i in range(100)])
+    errors = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                series.rollup("week", max_points=50)
+                series.totals()
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        # Each batch is older than the last, so first_day and every daily array change.
+        for batch in range(300):
+            day = 2000 - (batch + 1) * 3
+            series.add_commits([(f"old{batch}-{i}", (day + i) * DAY, f"author{batch}") for i in range(3)])
+    finally:
+        done.set()
+        reader.join()
+
+    assert errors == []
+    assert series.totals()["total_commits"] == 1000
+    assert sum(series.rollup("day")["series"]["commits"]) == 1000
+
+
+def test_rollup_counts_commits_authors_and_churn():
+    series = CommitSeries()
+    series.add_commits([("a", 10 * DAY, "alice"), ("b", 10 * DAY + 5, "bob"), ("c", 12 * DAY, "alice")])
+    series.set_weekly_churn([[10 * DAY, 7, -3]])
+    rollup = series.rollup("day")
+    assert rollup["series"]["commits"] == [2, 0, 1]
+    assert rollup["series"]["authors"] == [2, 0, 1]
+    assert rollup["series"]["additions"] == [7, 0, 0]
+    assert series.totals()["total_lines"] == 4
+
+
+def test_series_registry_drops_least_recently_viewed(monkeypatch):
+    monkeypatch.setattr(analytics, "MAX_CACHED_SERIES", 2)
+    monkeypatch.setattr(analytics, "_series", analytics.OrderedDict())
+
+    def no_commits(**kwargs):
+        return []
+
+    first = get_series("o/first", no_commits, lambda: None)
+    get_series("o/second", no_commits, lambda: None)
+    assert get_series("o/first", no_commits, lambda: None) is first
+    get_series("o/third", no_commits, lambda: None)
+    assert list(analytics._series) == ["o/first", "o/third"]
@@ -0,0 +1,18 @@
+"""Cache backends."""
+
+import pytest
+
+from server.cache import CacheBackend, MemoryLRU
+
+
+def test_backend_missing_a_method_fails_when_created():
+    class NoDelete(CacheBackend):
+        def get(self, key):
+            return None
+
+        def set(self, key, value, expires_at):
+            pass
+
+    with pytest.raises(TypeError, match="delete"):
+        NoDelete()
+    assert isinstance(MemoryLRU(4), CacheBackend)
@@ -0,0 +1,66 @@
+"""Line maps of compacted source and remapping of the model's line references."""
+
+from server.compaction import compact_source, remap_line_references
+
+SOURCE = '''\
+#!/usr/bin/env python3
+# Copyright (c) 2024 Example Corp.
+# Licensed under the Apache License, Version 2.0.
+# See LICENSE for details.
+
+import os
+
+
+def load(path):
+    """Load a file.
+
+    Longer explanation that the model
+    does not need to see.
+    """
+    return open(path).read()
+
+
+
+def main():
+    return load(os.environ["FILE"])
+'''
+
+
+def _original(source: str, line: int) -> str:
+    return source.splitlines()[line - 1]
+
+
+def test_every_compacted_line_maps_to_its_original():
+    compacted = compact_source(SOURCE)
+    lines = compacted.text.splitlines()
+    assert lines[1] == "# [license header omitted]"
+    assert '    """Load a file. [...]"""' in lines
+    assert compacted.removed == {"license_lines": 2, "doc_lines": 4, "blank_lines": 3}
+    for number, line in enumerate(lines, start=1):
+        original = compacted.original_line(number)
+        if "omitted" in line or "[...]" in line:
+            continue
+        assert _original(SOURCE, original) == line
+
+
+def test_line_references_are_remapped_after_dropped_lines():
+    compacted = compact_source(SOURCE)
+    lines = compacted.text.splitlines()
+    body = lines.index("    return open(path).read()") + 1
+    main = lines.index("def main():") + 1
+    text = f"Unclosed file on line {body}; see lines {body}-{main} and L{main}."
+    assert remap_line_references(text, compacted) == (
+        "Unclosed file on line 15; see lines 15-19 and L19."
+    )
+
+
+def test_references_outside_the_file_are_clamped():
+    compacted = compact_source(SOURCE)
+    assert remap_line_references("line 0 and line 999", compacted) == "line 1 and line 20"
+
+
+def test_uncompacted_source_keeps_its_numbering():
+    source = "a = 1\nb = 2\n"
+    compacted = compact_source(source)
+    assert compacted.line_map == [1, 2]
+    assert remap_line_references("line 2", compacted) == "line 2"
@@ -0,0 +1,15 @@
+"""Comment handling in duplicate-detection tokenization."""
+
+from server.duplicates import normalize_tokens
+
+
+def test_python_floor_division_is_not_a_comment():
+    assert normalize_tokens("x = a // b + c  # note", ".py") == ["ID", "=", "ID", "/", "/", "ID", "+", "ID"]
+
+
+def test_c_style_comments_are_dropped():
+    assert normalize_tokens("x = a; // note\n/* block */ y = b;", ".js") == ["ID", "=", "ID", ";", "ID", "=", "ID", ";"]
+
+
+def test_php_accepts_both_comment_styles():
+    assert normalize_tokens("$x = 1; # a\n// b\n/* c */", ".php") == ["ID", "=", "NUM", ";"]
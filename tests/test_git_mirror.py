@@ -0,0 +1,52 @@
+"""Mirror clones and contributor stats computed from them."""
+
+import os
+import subprocess
+
+from server.git_mirror import contributor_stats, update_mirror
+
+
+def _git(cwd, *args):
+    env = {**os.environ, "GIT_AUTHOR_DATE": "2024-01-02T00:00:00Z", "GIT_COMMITTER_DATE": "2024-01-02T00:00:00Z"}
+    return subprocess.run(["git", *args], cwd=cwd, env=env, check=True, capture_output=True, text=True).stdout
+
+
+def _commit(repo, name, email, filename):
+    with open(os.path.join(repo, filename), "w") as f:
+        f.write(f"{filename}\n")
+    _git(repo, "add", filename)
+    _git(repo, "-c", f"user.name={name}", "-c", f"user.email={email}", "commit", "-qm", filename)
+
+
+def test_mirror_keeps_branches_and_tags_but_not_pull_refs(tmp_path):
+    upstream = str(tmp_path / "upstream")
+    os.makedirs(upstream)
+    _git(upstream, "init", "-q", "-b", "main")
+    _commit(upstream, "Ann", "ann@example.com", "a.txt")
+    _git(upstream, "tag", "v1")
+    _git(upstream, "update-ref", "refs/pull/1/head", "HEAD")
+
+    path = str(tmp_path / "mirror.git")
+    update_mirror(upstream, path)
+    _commit(upstream, "Ann", "ann@example.com", "b.txt")
+    _git(upstream, "update-ref", "refs/pull/2/head", "HEAD")
+    head = update_mirror(upstream, path, max_age=0)
+
+    refs = _git(path, "for-each-ref", "--format=%(refname)").split()
+    assert sorted(refs) == ["refs/heads/main", "refs/tags/v1"]
+    assert head == _git(upstream, "rev-parse", "HEAD").strip()
+
+
+def test_login_is_only_set_for_noreply_emails(tmp_path):
+    repo = str(tmp_path / "repo")
+    os.makedirs(repo)
+    _git(repo, "init", "-q", "-b", "main")
+    _commit(repo, "Ann Example", "ann@example.com", "a.txt")
+    _commit(repo, "Bob", "123+bobgh@users.noreply.github.com", "b.txt")
+    _commit(repo, "Bob", "123+bobgh@users.noreply.github.com", "c.txt")
+
+    stats = contributor_stats(os.path.join(repo, ".git"))
+    assert [(c["login"], c["name"], c["total_commits"]) for c in stats] == [
+        ("bobgh", "Bob", 2),
+        (None, "Ann Example", 1),
+    ]
@@ -0,0 +1,81 @@
+"""Space-Saving counts, their error bounds and issue normalization."""
+
+import random
+from collections import Counter
+
+from server.heavy_hitters import CountMinSketch, IssueAggregator, SpaceSaving, normalize_issue
+
+
+def _zipf_stream(n: int, keys: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    return rng.choices([f"k{rank}" for rank in range(keys)], weights=weights, k=n)
+
+
+def test_space_saving_is_exact_within_capacity():
+    counter = SpaceSaving(capacity=10)
+    for key in "aababcabcd":
+        assert counter.add(key) is None
+    assert counter.top(2) == [("a", 4, 0), ("b", 3, 0)]
+
+
+def test_space_saving_counts_bound_the_true_counts():
+    stream = _zipf_stream(20000, 500)
+    truth = Counter(stream)
+    capacity = 50
+    counter = SpaceSaving(capacity)
+    for key in stream:
+        counter.add(key)
+
+    assert len(counter.counters) == capacity
+    for key, (count, error) in counter.counters.items():
+        assert count - error <= truth[key] <= count
+        # The newcomer inherits the minimum, which is at most total / capacity.
+        assert error <= len(stream) / capacity
+    # Every key more frequent than total / capacity is tracked.
+    for key, count in truth.items():
+        if count > len(stream) / capacity:
+            assert key in counter.counters
+    assert [key for key, _, _ in counter.top(3)] == ["k0", "k1", "k2"]
+
+
+def test_space_saving_reports_evictions():
+    counter = SpaceSaving(capacity=2)
+    counter.add("a", 5)
+    counter.add("b", 1)
+    assert counter.add("c") == "b"
+    assert counter.counters["c"] == [2, 1]
+
+
+def test_count_min_never_undercounts():
+    sketch = CountMinSketch(width=64, depth=4)
+    stream = _zipf_stream(5000, 300, seed=1)
+    for key in stream:
+        sketch.add(key)
+    for key, count in Counter(stream).items():
+        assert sketch.estimate(key) >= count
+
+
+def test_rephrasings_normalize_to_one_issue():
+    assert normalize_issue("Function 'foo' is too long (line 12)") == normalize_issue(
+        "function \"bar\" is too long"
+    )
+    assert normalize_issue("Magic number 42 on lines 3-5") == normalize_issue("magic number 7")
+    assert normalize_issue("Unused import") != normalize_issue("Unused variable")
+
+
+def test_aggregator_top_issues_with_examples():
+    aggregator = IssueAggregator(capacity=4, max_examples=2)
+    for i in range(10):
+        aggregator.add(f"Function 'f{i}' is too long (line {i})", f"file{i}.py")
+    for i in range(3):
+        aggregator.add("Missing docstring", f"doc{i}.py")
+    for i in range(20):
+        aggregator.add(f"Rare issue number {i} with unique word w{i}x{'y' * i}")
+
+    top = aggregator.top(2)
+    assert top[0]["text"] == "Function 'f0' is too long (line 0)"
+    assert top[0]["count"] >= 10
+    assert top[0]["count"] - top[0]["max_overcount"] <= 10
+    assert top[0]["files"] == ["file0.py", "file1.py"]
+    assert aggregator.total == 33
@@ -0,0 +1,41 @@
+"""Which jobs users may submit, and how their payloads are checked."""
+
+import pytest
+
+from server import db
+from server.models.Job import Job
+
+
+@pytest.mark.parametrize("kind, payload", [
+    ("rebuild_leaderboard", {}),
+    ("analyze_folder", {"folder_path": "/"}),
+    ("prewarm_overview", {"owner": "a", "repo": "b"}),
+    ("no_such_kind", {}),
+])
+def test_internal_kinds_are_rejected(client, kind, payload):
+    response = client.post("/api/jobs", json={"kind": kind, "payload": payload})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("payload", [
+    {"owner": "a"},
+    {"owner": "a", "repo": "../b"},
+    {"owner": "a", "repo": "b", "ref": ["main"]},
+    {"owner": "a", "repo": "b", "folder_path": "/etc"},
+])
+def test_invalid_payloads_are_rejected(client, payload):
+    response = client.post("/api/jobs", json={"kind": "search_index", "payload": payload})
+    assert response.status_code == 400
+
+
+def test_valid_job_is_queued_with_the_cleaned_payload(app, client):
+    response = client.post(
+        "/api/jobs",
+        json={"kind": "code_trends", "payload": {"owner": "a", "repo": "b", "branch": "release/1.x"}},
+    )
+    assert response.status_code == 202
+    assert response.get_json()["kind"] == "code_trends"
+    with app.app_context():
+        job = db.session.get(Job, response.get_json()["id"])
+        assert job.user_id == "alice"
+        assert job.payload == {"owner": "a", "repo": "b", "branch": "release/1.x"}
@@ -0,0 +1,103 @@
+"""Incremental leaderboard updates agree with a rebuild from all submissions."""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from server import db
+from server.leaderboard import EVAN_ADAM_PUZZLE, get_leaderboard, rebuild_leaderboard, record_submissions
+from server.models.Leaderboard import LeaderboardEntry
+from server.models.Puzzle import PuzzleUser
+from server.models.Submission import Submission
+
+START = datetime(2025, 3, 1, 12, 0)
+PUZZLES = ["maze", "cipher", "sudoku", EVAN_ADAM_PUZZLE]
+
+
+@pytest.fixture
+def tables(app):
+    with app.app_context():
+        for model in (Submission, PuzzleUser, LeaderboardEntry):
+            db.session.execute(model.__table__.delete())
+        db.session.commit()
+        yield
+        db.session.rollback()
+
+
+def _state() -> tuple[list, list]:
+    entries = [
+        (e.rank, e.user_id, e.solved_count, e.last_solve_time, e.evan_adam_score)
+        for e in db.session.execute(select(LeaderboardEntry).order_by(LeaderboardEntry.rank)).scalars()
+    ]
+    puzzle_users = sorted(
+        (p.user_id, p.puzzle_name, p.earliest_correct_time, p.last_submission_time, p.is_solved, p.evan_adam_score)
+        for p in db.session.execute(select(PuzzleUser)).scalars()
+    )
+    return entries, puzzle_users
+
+
+def _random_submissions(rng: random.Random, count: int) -> list[dict]:
+    submissions = []
+    for _ in range(count):
+        puzzle = rng.choice(PUZZLES)
+        text = str(rng.randint(-50, 100)) if puzzle == EVAN_ADAM_PUZZLE and rng.random() < 0.8 else "guess"
+        submissions.append({
+            "puzzle_name": puzzle,
+            "user_id": f"user{rng.randint(0, 24):02d}",
+            "is_correct": rng.random() < 0.4,
+            "submission_text": text,
+            # Whole minutes, so different users often tie on solve times.
+            "submission_time": START + timedelta(minutes=rng.randint(0, 30)),
+        })
+    return submissions
+
+
+def test_incremental_batches_match_a_rebuild(tables):
+    rng = random.Random(7)
+    for _ in range(12):
+        record_submissions(_random_submissions(rng, rng.randint(1, 60)))
+    incremental = _state()
+    assert [entry[0] for entry in incremental[0]] == list(range(1, len(incremental[0]) + 1))
+
+    rebuild_leaderboard()
+    assert _state() == incremental
+
+
+def test_ties_and_evan_adam_scores(tables):
+    at = START + timedelta(minutes=5)
+    record_submissions([
+        # Same solves at the same time: evan_adam_score decides, then user id.
+        {"puzzle_name": EVAN_ADAM_PUZZLE, "user_id": "bea", "is_correct": True, "submission_text": "40", "submission_time": at},
+        {"puzzle_name": EVAN_ADAM_PUZZLE, "user_id": "abe", "is_correct": True, "submission_text": "40", "submission_time": at},
+        {"puzzle_name": EVAN_ADAM_PUZZLE, "user_id": "cal", "is_correct": True, "submission_text": "55", "submission_time": at},
+        # Wrong answers never count towards the score.
+        {"puzzle_name": EVAN_ADAM_PUZZLE, "user_id": "abe", "is_correct": False, "submission_text": "99", "submission_time": at},
+        {"puzzle_name": "maze", "user_id": "dee", "is_correct": False, "submission_text": "x", "submission_time": at},
+        # Identical standings are ordered by user id.
+        {"puzzle_name": "maze", "user_id": "fay", "is_correct": True, "submission_text": "x", "submission_time": at},
+        {"puzzle_name": "maze", "user_id": "eve", "is_correct": True, "submission_text": "x", "submission_time": at},
+    ])
+    # A later, better score raises abe's best; a worse one is ignored.
+    record_submissions([
+        {"puzzle_name": EVAN_ADAM_PUZZLE, "user_id": "abe", "is_correct": True, "submission_text": "60", "submission_time": at + timedelta(minutes=1)},
+        {"puzzle_name": EVAN_ADAM_PUZZLE, "user_id": "cal", "is_correct": True, "submission_text": "10", "submission_time": at + timedelta(minutes=2)},
+    ])
+
+    page = get_leaderboard(1, 10)
+    assert [(e["rank"], e["user_id"], e["solved_count"], e["evan_adam_score"]) for e in page["entries"]] == [
+        (1, "abe", 1, 60),
+        (2, "cal", 1, 55),
+        (3, "bea", 1, 40),
+        (4, "eve", 1, None),
+        (5, "fay", 1, None),
+        (6, "dee", 0, None),
+    ]
+    assert page["total"] == 6
+    # The earliest correct submission is the solve time.
+    assert page["entries"][0]["last_solve_time"] == at.isoformat()
+
+    incremental = _state()
+    rebuild_leaderboard()
+    assert _state() == incremental
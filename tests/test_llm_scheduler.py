@@ -0,0 +1,24 @@
+"""LLM scheduler quota accounting."""
+
+import pytest
+
+from server.llm_scheduler import LLMScheduler, llm_context
+from server.resilience import DeadlineExceeded, end_deadline, start_deadline
+
+
+def test_calls_that_time_out_in_the_queue_are_refunded():
+    scheduler = LLMScheduler(max_concurrency=1, requests_per_minute=10, tokens_per_minute=1000)
+    with llm_context("alice"):
+        running = scheduler.acquire(100)
+        token = start_deadline(0.05)
+        try:
+            with pytest.raises(DeadlineExceeded):
+                scheduler.acquire(300)
+        finally:
+            end_deadline(token)
+        running.release(100)
+
+    requests, tokens = scheduler._buckets["alice"]
+    # Only the call that ran is charged.
+    assert requests.balance == pytest.approx(9, abs=0.1)
+    assert tokens.balance == pytest.approx(900, abs=5)
@@ -0,0 +1,23 @@
+"""Overview fields built from GitHub's GraphQL API."""
+
+from unittest import mock
+
+from server import overview
+
+
+def test_watchers_keep_the_rest_api_meaning():
+    node = {
+        "name": "repo",
+        "description": None,
+        "stargazerCount": 42,
+        "forkCount": 3,
+        "issues": {"totalCount": 2},
+        "pullRequests": {"totalCount": 1},
+        "defaultBranchRef": None,
+    }
+    with mock.patch.object(overview, "github_graphql", return_value={"data": {"r0": node}}) as graphql:
+        result = overview.fetch_overview("o", "repo", "token")
+    assert "watchers {" not in graphql.call_args.args[0]
+    assert result["watchers"] == result["stars"] == 42
+    assert result["open_issues"] == 3
+    assert result["total_commits"] is None
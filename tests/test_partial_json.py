@@ -0,0 +1,48 @@
+"""Top-level fields of a streamed JSON object, however the text is split."""
+
+import json
+
+import pytest
+
+from server.partial_json import JsonFieldStream
+
+OBJECT = {
+    "key_changes": "Adds a \"quoted\" word, a brace } and a comma, too",
+    "score": -12.5e1,
+    "potential_impacts": ["one", {"nested": [1, 2, {"deep": "]"}]}, "three"],
+    "flag": True,
+    "nothing": None,
+    "meta": {"a": "b", "c": [True, False]},
+    "escaped\\key": "back\\slash",
+    "count": 7,
+}
+TEXT = json.dumps(OBJECT, indent=2)
+
+
+def _feed_all(chunks):
+    stream = JsonFieldStream()
+    fields = []
+    for chunk in chunks:
+        fields.extend(stream.feed(chunk))
+    return fields
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(TEXT)])
+def test_fields_split_at_any_chunk_boundary(size):
+    chunks = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+    assert _feed_all(chunks) == list(OBJECT.items())
+
+
+def test_fields_are_reported_as_soon_as_they_complete():
+    stream = JsonFieldStream()
+    assert stream.feed('{"a": "x') == []
+    assert stream.feed('y", "b": [1, ') == [("a", "xy")]
+    assert stream.feed("2]") == [("b", [1, 2])]
+    # A number only ends at the next comma or the closing brace.
+    assert stream.feed(', "c": 12') == []
+    assert stream.feed("3}") == [("c", 123)]
+
+
+def test_compact_json_without_whitespace():
+    text = json.dumps(OBJECT, separators=(",", ":"))
+    assert _feed_all([text[:10], text[10:]]) == list(OBJECT.items())
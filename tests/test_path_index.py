@@ -0,0 +1,62 @@
+"""Fuzzy path matching and ranking."""
+
+from server import path_index
+from server.path_index import PathIndex, get_path_index
+
+PATHS = [
+    "client/src/components/FileTreeExplorer.jsx",
+    "client/src/components/FileTree.jsx",
+    "docs/filter_examples.md",
+    "server/filters/text_exporter.py",
+    "server/path_index.py",
+    "README.md",
+]
+
+
+def _index(paths=PATHS) -> PathIndex:
+    return PathIndex([(path, "blob") for path in paths] + [("client/src", "tree")], "sha1")
+
+
+def test_characters_must_appear_in_order():
+    paths = [result["path"] for result in _index().find("fltrex", limit=10)]
+    assert "client/src/components/FileTreeExplorer.jsx" in paths
+    assert "server/path_index.py" not in paths
+    assert _index().find("xq") == []
+
+
+def test_word_starts_in_the_file_name_rank_first():
+    results = _index().find("ftexp")
+    assert [r["path"] for r in results] == [
+        "client/src/components/FileTreeExplorer.jsx",
+        "server/filters/text_exporter.py",
+        "docs/filter_examples.md",
+    ]
+    path = results[0]["path"]
+    # F, T and Exp land on the camelCase word starts of the file name.
+    assert [path[p] for p in results[0]["positions"]] == list("FTExp")
+    assert results[0]["score"] > results[1]["score"] > results[2]["score"]
+
+
+def test_exact_file_names_beat_longer_ones():
+    results = _index().find("filetree")
+    assert [r["path"] for r in results[:2]] == [
+        "client/src/components/FileTree.jsx",
+        "client/src/components/FileTreeExplorer.jsx",
+    ]
+
+
+def test_matching_ignores_case_and_reports_types():
+    results = _index().find("README")
+    assert results[0] == {**results[0], "path": "README.md", "type": "blob"}
+    assert _index().find("clientsrc")[0]["type"] == "tree"
+
+
+def test_file_names_starting_with_the_query_are_found_past_the_scan_limit(monkeypatch):
+    monkeypatch.setattr(path_index, "MAX_SCANNED", 5)
+    paths = [f"a/b{i}.txt" for i in range(50)] + ["very/deep/nested/directory/tree/target_module.py"]
+    assert _index(paths).find("target")[0]["path"].endswith("target_module.py")
+
+
+def test_indexes_are_reused_per_tree_sha():
+    tree = {"sha": "reuse-sha", "tree": [{"path": "a.py", "type": "blob"}]}
+    assert get_path_index(tree) is get_path_index(dict(tree))
@@ -0,0 +1,87 @@
+"""Splitting pull request diffs into summary chunks."""
+
+import pytest
+
+from server import pr_summary
+from server.pr_summary import DiffTooLarge, split_diff, summarize_diff
+
+DIFF = """\
+diff --git a/app.py b/app.py
+index 1111111..2222222 100644
+--- a/app.py
++++ b/app.py
+@@ -1,3 +1,3 @@
+ import os
+-x = 1
++x = 2
+@@ -20,2 +20,3 @@ def main():
+     run()
++    stop()
+diff --git a/old.txt b/new.txt
+similarity index 90%
+rename from old.txt
+rename to new.txt
+--- a/old.txt
++++ b/new.txt
+@@ -1 +1 @@
+-hello
++hello world
+"""
+
+
+def test_hunks_of_one_file_share_a_chunk():
+    chunks = split_diff(DIFF)
+    assert [chunk.path for chunk in chunks] == ["app.py", "new.txt"]
+    first = chunks[0].text.splitlines()
+    assert first[0] == "diff --git a/app.py b/app.py"
+    assert "@@ -1,3 +1,3 @@" in first and "@@ -20,2 +20,3 @@ def main():" in first
+    assert "+    stop()" in first
+    assert "rename to new.txt" in chunks[1].text
+    assert chunks[1].text.endswith("+hello world")
+
+
+def test_chunk_keys_ignore_hunk_line_numbers():
+    shifted = DIFF.replace("@@ -20,2 +20,3 @@", "@@ -25,2 +25,3 @@")
+    assert [c.key for c in split_diff(shifted)] == [c.key for c in split_diff(DIFF)]
+    changed = DIFF.replace("+x = 2", "+x = 3")
+    assert split_diff(changed)[0].key != split_diff(DIFF)[0].key
+
+
+def test_large_hunks_are_split(monkeypatch):
+    monkeypatch.setattr(pr_summary, "MAX_CHUNK_CHARS", 40)
+    diff = "diff --git a/a.py b/a.py\n@@ -1,6 +1,6 @@\n" + "".join(f"+line number {i}\n" for i in range(6))
+    chunks = split_diff(diff)
+    assert len(chunks) == 3
+    assert all(chunk.text.startswith("diff --git a/a.py b/a.py\n@@ -1,6 +1,6 @@\n") for chunk in chunks)
+    assert sum(chunk.text.count("+line number") for chunk in chunks) == 6
+
+
+def test_diffs_over_the_chunk_cap_are_refused(monkeypatch):
+    monkeypatch.setattr(pr_summary, "MAX_DIFF_CHUNKS", 1)
+    with pytest.raises(DiffTooLarge):
+        summarize_diff(DIFF)
+
+
+def test_new_deleted_and_binary_files():
+    diff = """\
+diff --git a/added.py b/added.py
+new file mode 100644
+--- /dev/null
++++ b/added.py
+@@ -0,0 +1,2 @@
++a = 1
++b = 2
+diff --git a/logo.png b/logo.png
+Binary files a/logo.png and b/logo.png differ
+diff --git a/gone.py b/gone.py
+deleted file mode 100644
+--- a/gone.py
++++ /dev/null
+@@ -1 +0,0 @@
+-x = 1
+"""
+    chunks = split_diff(diff)
+    # The binary file has no hunks to summarize.
+    assert [chunk.path for chunk in chunks] == ["added.py", "gone.py"]
+    assert "new file mode 100644" in chunks[0].text
+    assert chunks[1].text.endswith("@@ -1 +0,0 @@\n-x = 1")
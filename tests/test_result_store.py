@@ -0,0 +1,36 @@
+"""Writes to the durable result store."""
+
+from sqlalchemy import event
+
+from server import db
+from server.result_store import get_result, put_result, put_results
+
+
+def test_put_result_replaces_an_existing_row(app):
+    with app.app_context():
+        put_result("test", "k", {"v": 1})
+        put_result("test", "k", {"v": 2})
+        assert get_result("test", "k") == {"v": 2}
+
+
+def test_racing_writers_of_one_key_both_succeed(app):
+    def insert_theirs_first(conn, cursor, statement, parameters, context, executemany):
+        # Another writer inserts the key between this writer's read and its insert.
+        if statement.startswith("INSERT INTO cached_result") and not inserted:
+            inserted.append(True)
+            with db.engine.begin() as other:
+                other.exec_driver_sql(
+                    "INSERT INTO cached_result (kind, key, value, created_at) "
+                    "VALUES ('test', 'race', '\"theirs\"', CURRENT_TIMESTAMP)"
+                )
+
+    inserted = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", insert_theirs_first)
+        try:
+            put_results("test", {"race": "ours", "other": 3})
+        finally:
+            event.remove(db.engine, "before_cursor_execute", insert_theirs_first)
+        assert inserted
+        assert get_result("test", "race") == "ours"
+        assert get_result("test", "other") == 3
@@ -0,0 +1,47 @@
+"""Search index refresh locking and the per-process index LRU."""
+
+import threading
+
+from server import search
+from server.search import get_index, refresh_index
+
+
+def _tree(sha: str, files: dict[str, str]) -> dict:
+    return {
+        "sha": sha,
+        "tree": [{"path": path, "type": "blob", "sha": blob, "size": 10} for path, blob in files.items()],
+    }
+
+
+def test_refresh_of_one_repository_does_not_block_another():
+    started, release = threading.Event(), threading.Event()
+
+    def slow_fetch(sha):
+        started.set()
+        release.wait(5)
+        return b"def slow(): pass"
+
+    slow = threading.Thread(
+        target=refresh_index, args=("lock", "slow", _tree("t1", {"a.py": "b1"}), slow_fetch)
+    )
+    slow.start()
+    try:
+        assert started.wait(5)
+        stats = refresh_index("lock", "fast", _tree("t2", {"b.py": "b2"}), lambda sha: b"def fast(): pass")
+        assert stats["documents"] == 1
+        assert slow.is_alive()
+    finally:
+        release.set()
+        slow.join()
+    assert get_index("lock", "slow").search("slow")[0]["path"] == "a.py"
+
+
+def test_loaded_indexes_are_bounded(monkeypatch):
+    monkeypatch.setattr(search, "MAX_LOADED_INDEXES", 2)
+    monkeypatch.setattr(search, "_loaded_indexes", search.OrderedDict())
+    for name in ("one", "two", "three"):
+        refresh_index("lru", name, _tree(name, {"x.py": name}), lambda sha: b"x = 1")
+    assert len(search._loaded_indexes) == 2
+    # An index dropped from memory is loaded from disk again.
+    assert get_index("lru", "one").tree_sha == "one"
+    assert list(search._loaded_indexes) == [search.index_path("lru", "three"), search.index_path("lru", "one")]
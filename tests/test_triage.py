@@ -0,0 +1,35 @@
+"""Content triage of minified and generated files."""
+
+import random
+import string
+
+from server.triage import ANALYZE, SKIP, triage_content
+
+
+def _module(extra_lines: list[str]) -> str:
+    body = [f"def function_{i}(value):\n    return value + {i}\n" for i in range(60)]
+    return "".join(body[:30] + [line + "\n" for line in extra_lines] + body[30:])
+
+
+def test_one_long_literal_does_not_make_a_module_minified():
+    query = "QUERY = '" + " UNION ".join(f"SELECT {i} FROM t{i}" for i in range(80)) + "'"
+    assert len(query) > 1000
+    assert triage_content(_module([query])).decision == ANALYZE
+
+
+def test_several_long_lines_are_minified():
+    chunk = "var a=function(b){return b+1};" * 40
+    verdict = triage_content("\n".join([chunk] * 5))
+    assert verdict == (SKIP, "minified")
+    assert triage_content(_module([chunk] * 6)).decision == SKIP
+
+
+def test_long_encoded_lines_are_data():
+    rng = random.Random(0)
+    blob = "".join(rng.choice(string.ascii_letters + string.digits + "+/") for _ in range(4000))
+    assert triage_content(f"DATA = '{blob}'\n").reason == "encoded data"
+
+
+def test_generated_banner_must_be_a_comment():
+    assert triage_content("// Code generated by protoc-gen-go. DO NOT EDIT.\npackage x\n").decision == SKIP
+    assert triage_content('"""Docs mention @generated files."""\nx = 1\n').decision == ANALYZE
@@ -0,0 +1,87 @@
+"""Upstream errors from LLM and GitHub calls reach the API error handler."""
+
+from unittest import mock
+
+import pytest
+import requests
+
+from server.controllers import ai_insights, api
+from server.llm_scheduler import LLMRateLimited
+from server.resilience import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    bounded_call,
+    end_deadline,
+    start_deadline,
+)
+
+
+def test_llm_rate_limit_returns_429(client):
+    with mock.patch.object(
+        ai_insights.llm_scheduler, "acquire", side_effect=LLMRateLimited("alice", 60)
+    ):
+        response = client.post("/api/analyze/file", json={"file_content": "x = 1  # rate limited\n"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+
+
+def test_llm_rate_limit_on_stream_returns_429(client):
+    with mock.patch.object(
+        ai_insights.llm_scheduler, "acquire", side_effect=LLMRateLimited("alice", 60)
+    ):
+        response = client.post(
+            "/api/analyze/file/stream", json={"file_content": "x = 2  # rate limited\n"}
+        )
+    assert response.status_code == 429
+
+
+def test_open_openai_breaker_returns_503(client):
+    with mock.patch.object(
+        ai_insights.openai_breaker, "_before_call", side_effect=CircuitOpenError("OpenAI", 15)
+    ):
+        response = client.post("/api/analyze/file", json={"file_content": "x = 3  # breaker open\n"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "15"
+
+
+def test_timeout_cut_short_by_deadline_is_deadline_exceeded():
+    def time_out(timeout):
+        raise requests.exceptions.Timeout()
+
+    token = start_deadline(1)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            bounded_call(time_out, 10, (requests.exceptions.Timeout,))
+    finally:
+        end_deadline(token)
+    # A timeout that ran to the full cap is the upstream's fault.
+    with pytest.raises(requests.exceptions.Timeout) as raised:
+        bounded_call(time_out, 10, (requests.exceptions.Timeout,))
+    assert not isinstance(raised.value, DeadlineExceeded)
+
+
+GITHUB_ROUTES = [
+    ("get", "/api/github/repositories", None, "github_get"),
+    ("get", "/api/commits/a/b", None, "github_get"),
+    ("get", "/api/overview/a/b", None, "get_overviews"),
+    ("post", "/api/overview/batch", {"repositories": ["a/b"]}, "get_overviews"),
+    ("get", "/api/analytics/a/b", None, "check_repo_access"),
+    ("get", "/api/github/find-path/a/b?q=x", None, "get_tree"),
+    ("post", "/api/search/a/b/index", {}, "get_tree"),
+    ("get", "/api/duplicates/a/b", None, "get_tree"),
+    ("get", "/api/compare-analysis/a/b?base=x&head=y", None, "compare_analysis"),
+    ("get", "/api/pr/a/b/1/summary", None, "get_pull_request_diff"),
+]
+
+
+@pytest.mark.parametrize("method, url, body, target", GITHUB_ROUTES)
+@pytest.mark.parametrize("error, status", [
+    (CircuitOpenError("GitHub", 15), 503),
+    (DeadlineExceeded("Request deadline exceeded"), 504),
+])
+def test_github_upstream_errors_reach_the_error_handler(client, method, url, body, target, error, status):
+    with mock.patch.object(api, target, side_effect=error):
+        response = getattr(client, method)(url, json=body)
+    assert response.status_code == status
+    if status == 503:
+        assert response.headers["Retry-After"] == "15"
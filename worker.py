@@ -0,0 +1,18 @@
+"""Entry-point for background job workers.
+
+Each process claims and runs queued jobs (see server/jobs.py). Run as many
+worker processes, on as many hosts, as the queue needs:
+
+    python3 worker.py
+"""
+
+import logging
+
+import server.tasks  # noqa: F401  (registers job handlers)
+from server import create_app
+from server.jobs import run_worker
+
+app = create_app()
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_worker(app)
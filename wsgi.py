@@ -2,6 +2,9 @@
 
 This file launches the backend server, which also serves the frontend client in
 production.
+
+Running this file directly starts the Flask development server. For production,
+use gunicorn (see gunicorn.conf.py).
 """
 
 from typing import cast